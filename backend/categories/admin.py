@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category
+from .models import Category, CategoryAlias
 
 
 @admin.register(Category)
@@ -8,3 +8,10 @@ class CategoryAdmin(admin.ModelAdmin):
     list_filter = ["category_type", "created_at"]
     search_fields = ["name", "description"]
     ordering = ["name"]
+
+
+@admin.register(CategoryAlias)
+class CategoryAliasAdmin(admin.ModelAdmin):
+    list_display = ["alias", "category", "created_at"]
+    search_fields = ["alias", "category__name"]
+    ordering = ["alias"]
@@ -0,0 +1,263 @@
+"""
+Canonical category names.
+
+Model output such as "Pizza", "pizza ", "ＰＩＺＺＡ" and "pizzas" must land in
+one category. Names are reduced to a match key (Unicode NFKC, casefolded,
+collapsed whitespace, trimmed punctuation, naive singular of the last word)
+that is stored on ``Category.normalized_name``. ``CategoryAlias`` maps extra
+keys, e.g. those left behind by ``merge_categories``, to their category.
+
+Each process keeps the key → category map in memory and reloads it when the
+shared version in the cache changes. A miss still checks the database before
+creating, so a stale map can cost a query but never creates a duplicate.
+Optional fuzzy matching (``CATEGORY_FUZZY_MATCH_CUTOFF``) folds near-misses
+such as typos into an existing category of the same type.
+"""
+
+import difflib
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "categories:alias_map:version"
+
+_WHITESPACE = re.compile(r"\s+")
+# Quotes, brackets and sentence punctuation models wrap names in
+_EDGE_PUNCTUATION = "\"'`“”‘’«»()[]{}.,;:!?*-–— "
+
+_lock = threading.Lock()
+# match key -> (category id, category type)
+_alias_map: Dict[str, Tuple[int, str]] = {}
+_loaded_version: Optional[int] = None
+
+
+def clean_name(name: str) -> str:
+    """Display form: NFKC with collapsed whitespace and trimmed punctuation, case kept"""
+    name = unicodedata.normalize("NFKC", name or "")
+    return _WHITESPACE.sub(" ", name).strip(_EDGE_PUNCTUATION)
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def match_key(name: str) -> str:
+    """Key under which spellings of the same category collide"""
+    words = clean_name(name).casefold().split(" ")
+    words[-1] = _singular(words[-1])
+    return " ".join(words)
+
+
+def _current_version() -> int:
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def _bump_version() -> int:
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        return 1
+
+
+def invalidate_alias_map() -> None:
+    """Make every process reload its alias map on next use"""
+    global _loaded_version
+    _bump_version()
+    with _lock:
+        _loaded_version = None
+
+
+def _publish_addition() -> None:
+    """Tell other processes about a key this process already added locally"""
+    global _loaded_version
+    version = _bump_version()
+    with _lock:
+        # Only skip our own reload if nobody else changed the map meanwhile
+        if _loaded_version is not None and version == _loaded_version + 1:
+            _loaded_version = version
+        else:
+            _loaded_version = None
+
+
+def _load_alias_map() -> Dict[str, Tuple[int, str]]:
+    global _alias_map, _loaded_version
+    version = _current_version()
+    if _loaded_version == version:
+        return _alias_map
+
+    from .models import Category, CategoryAlias
+
+    with _lock:
+        alias_map = {
+            key: (pk, category_type)
+            for key, pk, category_type in Category.objects.values_list("normalized_name", "id", "category_type")
+        }
+        for alias, pk, category_type in CategoryAlias.objects.values_list(
+            "alias", "category_id", "category__category_type"
+        ):
+            alias_map.setdefault(alias, (pk, category_type))
+        _alias_map = alias_map
+        _loaded_version = version
+    return alias_map
+
+
+def _fuzzy_match(alias_map, key: str, category_type: str) -> Optional[int]:
+    cutoff = getattr(settings, "CATEGORY_FUZZY_MATCH_CUTOFF", 0)
+    if not cutoff:
+        return None
+    candidates = [k for k, (_, ctype) in alias_map.items() if ctype == category_type]
+    matches = difflib.get_close_matches(key, candidates, n=1, cutoff=cutoff)
+    return alias_map[matches[0]][0] if matches else None
+
+
+def resolve_category_id(name: str, category_type: str = "other") -> int:
+    """Id of the canonical category for a raw name, creating it if needed"""
+    from .models import Category, CategoryAlias
+
+    key = match_key(name)
+    if not key:
+        key, name = "other", "Other"
+    alias_map = _load_alias_map()
+    hit = alias_map.get(key)
+    if hit is not None:
+        return hit[0]
+
+    category_id = _fuzzy_match(alias_map, key, category_type)
+    if category_id is not None:
+        # Remember the variant so the next lookup is exact
+        CategoryAlias.objects.get_or_create(alias=key, defaults={"category_id": category_id})
+        logger.info(f"Fuzzy-matched category '{name}' to category {category_id}")
+    else:
+        category = Category.objects.filter(normalized_name=key).order_by("id").first()
+        if category is None:
+            alias = CategoryAlias.objects.filter(alias=key).select_related("category").first()
+            category = alias.category if alias else None
+        if category is None:
+            try:
+                with transaction.atomic():
+                    category = Category.objects.create(name=clean_name(name)[:100], category_type=category_type)
+            except IntegrityError:
+                # Created concurrently, or an unnormalized name already exists
+                category = (
+                    Category.objects.filter(normalized_name=key).order_by("id").first()
+                    or Category.objects.get(name=clean_name(name)[:100])
+                )
+        category_id = category.id
+        category_type = category.category_type
+
+    def remember():
+        with _lock:
+            _alias_map[key] = (category_id, category_type)
+        _publish_addition()
+
+    # A rolled-back category must not linger in the map
+    transaction.on_commit(remember)
+    return category_id
+
+
+def reset() -> None:
+    """Forget the in-memory map (tests and after bulk changes)"""
+    global _alias_map, _loaded_version
+    with _lock:
+        _alias_map = {}
+        _loaded_version = None
+
+
+@transaction.atomic
+def merge_categories(target, duplicates) -> int:
+    """Fold duplicate categories into ``target``; returns the number of insights moved.
+
+    Insights are re-pointed (dropping any that would repeat a span the target
+    already has on the same entry), the duplicates' names become aliases of
+    the target, and the sentiment rollups of affected users are rebuilt. A
+    target without coordinates takes those of a located duplicate, and users'
+    hand-set place locations move over, keeping each user's latest one.
+    """
+    from django.db.models import Exists, OuterRef
+    from insights import rollups, vector_index
+    from insights.models import Insight, PlaceLocation
+    from .models import CategoryAlias
+
+    duplicates = [d for d in duplicates if d.pk != target.pk]
+    if not duplicates:
+        return 0
+    duplicate_ids = [d.pk for d in duplicates]
+    affected_users = set(
+        Insight.objects.filter(category_id__in=duplicate_ids)
+        .order_by()
+        .values_list("entry__user_id", flat=True)
+        .distinct()
+    )
+
+    moved = 0
+    for duplicate in duplicates:
+        same_span = Insight.objects.filter(
+            category=target,
+            entry=OuterRef("entry"),
+            start_position=OuterRef("start_position"),
+            end_position=OuterRef("end_position"),
+        )
+        repeated = Insight.objects.filter(category=duplicate).filter(Exists(same_span))
+        removed = {}
+        for insight_id, user_id in repeated.values_list("id", "entry__user_id"):
+            removed.setdefault(user_id, []).append(insight_id)
+        repeated.delete()
+        for user_id, insight_ids in removed.items():
+            vector_index.remove_on_commit(user_id, insight_ids=insight_ids)
+        moved += Insight.objects.filter(category=duplicate).update(category=target)
+
+    if target.latitude is None or target.longitude is None:
+        located = next(
+            (d for d in duplicates if d.latitude is not None and d.longitude is not None), None
+        )
+        if located is not None:
+            target.latitude = located.latitude
+            target.longitude = located.longitude
+            target.location_name = located.location_name
+            type(target).objects.filter(pk=target.pk).update(
+                latitude=located.latitude,
+                longitude=located.longitude,
+                location_name=located.location_name,
+            )
+
+    # One location per user and category: the latest one a user set on the
+    # target or any duplicate wins, the rest go with the duplicates
+    latest = {}
+    for location in PlaceLocation.objects.filter(
+        category_id__in=[target.pk, *duplicate_ids]
+    ).order_by("updated_at", "pk"):
+        latest[location.user_id] = location
+    for user_id, location in latest.items():
+        if location.category_id != target.pk:
+            PlaceLocation.objects.filter(user_id=user_id, category=target).delete()
+            PlaceLocation.objects.filter(pk=location.pk).update(category=target)
+
+    CategoryAlias.objects.filter(category_id__in=duplicate_ids).update(category=target)
+    for duplicate in duplicates:
+        if duplicate.normalized_name and duplicate.normalized_name != target.normalized_name:
+            CategoryAlias.objects.update_or_create(
+                alias=duplicate.normalized_name, defaults={"category": target}
+            )
+    type(target).objects.filter(pk__in=duplicate_ids).delete()
+
+    for user_id in affected_users:
+        rollups.rebuild(user_id)
+    transaction.on_commit(invalidate_alias_map)
+    return moved
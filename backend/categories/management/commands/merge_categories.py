@@ -0,0 +1,105 @@
+import difflib
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from categories.canonical import match_key, merge_categories
+from categories.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Merge duplicate categories (same canonical name, optionally fuzzy matches) and re-point their insights'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fuzzy',
+            type=float,
+            default=0,
+            help='Also merge names of the same type at least this similar (0-1, e.g. 0.9)',
+        )
+        parser.add_argument(
+            '--into',
+            type=int,
+            help='Merge the --from categories into this category id',
+        )
+        parser.add_argument(
+            '--from',
+            type=int,
+            nargs='+',
+            dest='from_ids',
+            help='Category ids to merge into --into',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only show what would be merged',
+        )
+
+    def handle(self, *args, **options):
+        categories = list(Category.objects.annotate(insight_count=Count('insights')).order_by('id'))
+
+        # Keep match keys current in case the normalization rules changed
+        stale = [c for c in categories if c.normalized_name != match_key(c.name)[:100]]
+        for category in stale:
+            category.normalized_name = match_key(category.name)[:100]
+        if stale and not options['dry_run']:
+            Category.objects.bulk_update(stale, ['normalized_name'])
+
+        if options['into'] or options['from_ids']:
+            groups = [self._manual_group(categories, options['into'], options['from_ids'])]
+        else:
+            groups = self._groups(categories, options['fuzzy'])
+
+        if not groups:
+            self.stdout.write(self.style.SUCCESS('No duplicate categories found'))
+            return
+
+        total_moved = 0
+        for target, duplicates in groups:
+            names = ", ".join(f"'{d.name}'" for d in duplicates)
+            self.stdout.write(f"Merging {names} into '{target.name}' (id {target.id})")
+            if not options['dry_run']:
+                total_moved += merge_categories(target, duplicates)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run: {len(groups)} merges not applied"))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Merged {len(groups)} groups, moved {total_moved} insights")
+            )
+
+    def _manual_group(self, categories, into, from_ids):
+        if not into or not from_ids:
+            raise CommandError('--into and --from must be used together')
+        by_id = {c.id: c for c in categories}
+        missing = [pk for pk in [into, *from_ids] if pk not in by_id]
+        if missing:
+            raise CommandError(f"Unknown category ids: {missing}")
+        return by_id[into], [by_id[pk] for pk in from_ids if pk != into]
+
+    def _groups(self, categories, fuzzy_cutoff):
+        """(target, duplicates) pairs; the target is the most used category"""
+        by_key = {}
+        for category in categories:
+            by_key.setdefault(category.normalized_name, []).append(category)
+        clusters = list(by_key.values())
+
+        if fuzzy_cutoff:
+            merged = []
+            representatives = {}  # category type -> {key: cluster index}
+            for cluster in clusters:
+                key = cluster[0].normalized_name
+                same_type = representatives.setdefault(cluster[0].category_type, {})
+                match = difflib.get_close_matches(key, list(same_type), n=1, cutoff=fuzzy_cutoff)
+                if match:
+                    merged[same_type[match[0]]].extend(cluster)
+                else:
+                    same_type[key] = len(merged)
+                    merged.append(list(cluster))
+            clusters = merged
+
+        groups = []
+        for cluster in clusters:
+            if len(cluster) < 2:
+                continue
+            target = max(cluster, key=lambda c: (c.insight_count, -c.id))
+            groups.append((target, [c for c in cluster if c.pk != target.pk]))
+        return groups
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:43
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of categories.canonical.match_key as of this migration
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = "\"'`“”‘’«»()[]{}.,;:!?*-–— "
+
+
+def _singular(word):
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def match_key(name):
+    name = unicodedata.normalize("NFKC", name or "")
+    words = _WHITESPACE.sub(" ", name).strip(_EDGE_PUNCTUATION).casefold().split(" ")
+    words[-1] = _singular(words[-1])
+    return " ".join(words)
+
+
+def fill_normalized_names(apps, schema_editor):
+    Category = apps.get_model('categories', 'Category')
+    categories = list(Category.objects.all())
+    for category in categories:
+        category.normalized_name = match_key(category.name)[:100]
+    Category.objects.bulk_update(categories, ['normalized_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='CategoryAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='categories.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Category aliases',
+                'ordering': ['alias'],
+            },
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+    ]
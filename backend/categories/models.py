@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.validators import MinValueValidator, MaxValueValidator
 
 
 class Category(models.Model):
@@ -17,10 +18,24 @@ class Category(models.Model):
     ]
 
     name = models.CharField(max_length=100, unique=True)
+    # Match key of the name (see categories.canonical), used to find duplicates
+    normalized_name = models.CharField(max_length=100, db_index=True, editable=False, default="")
     category_type = models.CharField(
         max_length=20, choices=CATEGORY_TYPES, default="other"
     )
     description = models.TextField(blank=True)
+    # Where a place category is, once geocoded; shared by every entry mentioning it
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90.0), MaxValueValidator(90.0)],
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180.0), MaxValueValidator(180.0)],
+    )
+    location_name = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -28,5 +43,26 @@ class Category(models.Model):
         verbose_name_plural = "Categories"
         ordering = ["name"]
 
+    def save(self, *args, **kwargs):
+        from .canonical import match_key
+
+        self.normalized_name = match_key(self.name)[:100]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.name} ({self.get_category_type_display()})"
+
+
+class CategoryAlias(models.Model):
+    """Extra match key resolving to a category, e.g. a merged duplicate's name"""
+
+    alias = models.CharField(max_length=100, unique=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="aliases")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Category aliases"
+        ordering = ["alias"]
+
+    def __str__(self):
+        return f"{self.alias} -> {self.category.name}"
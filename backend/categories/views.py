@@ -18,5 +18,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
         else:
             categories = self.queryset
 
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
         serializer = self.get_serializer(categories, many=True)
         return Response(serializer.data)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Entry, EntryDocument
+from .models import DocumentBlob, Entry, EntryDocument
 
 
 class EntryDocumentInline(admin.TabularInline):
@@ -21,3 +21,10 @@ class EntryDocumentAdmin(admin.ModelAdmin):
     list_display = ["entry", "filename", "file_size", "uploaded_at"]
     list_filter = ["uploaded_at"]
     search_fields = ["filename", "entry__title"]
+
+
+@admin.register(DocumentBlob)
+class DocumentBlobAdmin(admin.ModelAdmin):
+    list_display = ["sha256", "size", "content_type", "ref_count", "extracted_at", "created_at"]
+    search_fields = ["sha256"]
+    readonly_fields = ["sha256", "ref_count"]
@@ -0,0 +1,135 @@
+"""
+Content-addressed storage for document files.
+
+Each distinct file is stored once under ``document_blobs/<aa>/<sha256>`` (or
+a free name beside it) as a ``DocumentBlob``; every ``EntryDocument`` with the same content points at it
+and shares its file. ``ref_count`` tracks those documents and the blob and its
+file are removed when the last one goes. The blob also keeps the extracted
+text, so a repeated upload is ready without running extraction again, and
+only one of several uploads of the same new content runs the extraction.
+
+``rebuild_document_blobs`` recomputes counts and moves documents stored
+before blobs existed.
+"""
+
+import logging
+from typing import Iterable
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DocumentBlob, EntryDocument
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "document_blobs"
+
+
+def blob_name(sha256: str) -> str:
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}"
+
+
+def _delete_file(name: str) -> None:
+    try:
+        default_storage.delete(name)
+    except Exception as e:
+        logger.warning(f"Could not delete blob file {name}: {e}")
+
+
+def acquire(file, sha256: str, size: int, content_type: str = "") -> DocumentBlob:
+    """The blob for this content with one more reference, storing the file if new"""
+    with transaction.atomic():
+        updated = DocumentBlob.objects.filter(sha256=sha256).update(ref_count=F("ref_count") + 1)
+        if updated:
+            return DocumentBlob.objects.get(sha256=sha256)
+
+        # Always store a fresh copy: an existing file may be the one a concurrent
+        # release is about to delete, so storage picks a free name beside it
+        name = default_storage.save(blob_name(sha256), file)
+        try:
+            with transaction.atomic():
+                return DocumentBlob.objects.create(
+                    sha256=sha256, file=name, size=size, content_type=content_type, ref_count=1
+                )
+        except IntegrityError:
+            # Stored concurrently by another upload
+            _delete_file(name)
+            DocumentBlob.objects.filter(sha256=sha256).update(ref_count=F("ref_count") + 1)
+            return DocumentBlob.objects.get(sha256=sha256)
+
+
+def release(blob_ids: Iterable[int]) -> int:
+    """Drop one reference per id (repeat ids for several); returns blobs deleted"""
+    counts = {}
+    for blob_id in blob_ids:
+        if blob_id is not None:
+            counts[blob_id] = counts.get(blob_id, 0) + 1
+    if not counts:
+        return 0
+    with transaction.atomic():
+        locked = DocumentBlob.objects.select_for_update().filter(pk__in=counts).order_by("pk")
+        for blob_id, ref_count in locked.values_list("pk", "ref_count"):
+            DocumentBlob.objects.filter(pk=blob_id).update(ref_count=max(0, ref_count - counts[blob_id]))
+        return _delete_unreferenced(DocumentBlob.objects.filter(pk__in=counts))
+
+
+def _delete_unreferenced(queryset) -> int:
+    unreferenced = list(queryset.filter(ref_count=0, documents__isnull=True).values_list("pk", "file"))
+    if not unreferenced:
+        return 0
+    DocumentBlob.objects.filter(pk__in=[pk for pk, _ in unreferenced]).delete()
+    for _, name in unreferenced:
+        # Keep the file if the transaction rolls back
+        transaction.on_commit(lambda name=name: _delete_file(name))
+    return len(unreferenced)
+
+
+def claim_extraction(blob_id: int) -> bool:
+    """Whether a new upload of this blob should start text extraction.
+
+    Call inside the upload's transaction before creating its document. The
+    blob row stays locked until commit, so of concurrent uploads of the same
+    content only the first starts extraction; the others wait for its result.
+    """
+    blob = DocumentBlob.objects.select_for_update().get(pk=blob_id)
+    if blob.extracted_at is not None:
+        return False
+    in_flight = (EntryDocument.STATUS_PENDING, EntryDocument.STATUS_PROCESSING)
+    return not blob.documents.filter(extraction_status__in=in_flight).exists()
+
+
+def store_extraction(blob_id: int, text: str, extracted_at) -> None:
+    """Remember a document's extracted text for later uploads of the same content"""
+    if blob_id is not None:
+        DocumentBlob.objects.filter(pk=blob_id).update(extracted_text=text, extracted_at=extracted_at)
+
+
+def rebuild() -> dict:
+    """Attach legacy documents to blobs, fix reference counts and drop orphans"""
+    from .document_service import hash_file
+
+    moved = 0
+    for document in EntryDocument.objects.filter(blob__isnull=True).iterator():
+        old_name = document.file.name
+        try:
+            with document.file.open("rb") as file:
+                size, sha256 = hash_file(file)
+                blob = acquire(file, sha256, size, document.content_type)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping document {document.id}: {e}")
+            continue
+        EntryDocument.objects.filter(pk=document.pk).update(blob=blob, file=blob.file.name, sha256=sha256)
+        if old_name != blob.file.name:
+            _delete_file(old_name)
+        moved += 1
+
+    fixed = 0
+    with transaction.atomic():
+        for blob in DocumentBlob.objects.select_for_update().order_by("pk"):
+            actual = blob.documents.count()
+            if blob.ref_count != actual:
+                DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=actual)
+                fixed += 1
+        deleted = _delete_unreferenced(DocumentBlob.objects.all())
+    return {"moved": moved, "fixed": fixed, "deleted": deleted}
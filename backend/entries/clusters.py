@@ -0,0 +1,136 @@
+"""
+Map clusters of geotagged entries.
+
+Entries are grouped by a geohash prefix sized to the zoom level, so a
+cluster covers roughly ``ENTRY_CLUSTER_CELL_PIXELS`` on screen. The database
+does the grouping (count, centroid, average sentiment and a sample entry per
+cell) using the ``(user, geohash)`` index.
+
+Clusters are cached in tiles: geohash cells one level coarser than the
+clusters, so a tile holds up to 32 clusters and neighbouring viewports share
+tiles. A viewport is answered from its covering tiles, computing only the
+missing ones in a single query. Each user's tiles are versioned; saving an
+entry whose location or sentiment changed bumps the version. Anonymous
+requests see every entry and share one "all" version, bumped on any change.
+"""
+
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Q
+from django.db.models.functions import Substr
+
+from . import geo
+
+# Finest clusters served; at about 5m, entries from one place share a cell
+MAX_CLUSTER_PRECISION = 9
+MAX_ZOOM = 22
+
+
+def _scope(user_id: Optional[int]) -> str:
+    return "all" if user_id is None else str(user_id)
+
+
+def _version_key(user_id: Optional[int]) -> str:
+    return f"entry-clusters-version:{_scope(user_id)}"
+
+
+def _current_version(user_id: Optional[int]) -> int:
+    return cache.get_or_set(_version_key(user_id), 1, None)
+
+
+def invalidate(user_id: int) -> None:
+    """Drop every cached cluster tile of the user, and the shared ones"""
+    for key in (_version_key(user_id), _version_key(None)):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def precision_for_zoom(zoom: int) -> int:
+    """Finest geohash precision whose cells are still at least a cluster wide"""
+    cell_pixels = getattr(settings, "ENTRY_CLUSTER_CELL_PIXELS", 60)
+    degrees_per_pixel = 360.0 / (256 * 2**zoom)
+    precision = 1
+    for candidate in range(1, MAX_CLUSTER_PRECISION + 1):
+        if geo.cell_size(candidate)[1] < cell_pixels * degrees_per_pixel:
+            break
+        precision = candidate
+    return precision
+
+
+def _tiles(south, west, north, east, precision) -> List[str]:
+    tiles = set()
+    for box in geo.split_antimeridian(south, west, north, east):
+        tiles.update(geo.cover(*box, max_precision=max(1, precision - 1)))
+    return sorted(tiles)
+
+
+def _compute(queryset, tiles: List[str], precision: int) -> Dict[str, list]:
+    """Clusters of each tile, from one grouped query over all of them"""
+    ranges = Q()
+    for tile in tiles:
+        ranges |= Q(geohash__gte=tile, geohash__lt=tile + geo.RANGE_END)
+    rows = (
+        queryset.filter(ranges)
+        .annotate(cell=Substr("geohash", 1, precision))
+        .values("cell")
+        .annotate(
+            count=Count("id"),
+            latitude=Avg("latitude"),
+            longitude=Avg("longitude"),
+            avg_sentiment=Avg("overall_sentiment"),
+            sample_entry_id=Max("id"),
+        )
+        .order_by("cell")
+    )
+    by_tile = {tile: [] for tile in tiles}
+    for row in rows:
+        cluster = {
+            "geohash": row["cell"],
+            "count": row["count"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "avg_sentiment": row["avg_sentiment"],
+            "sample_entry_id": row["sample_entry_id"],
+        }
+        # Tiles of the two halves of an antimeridian box may nest
+        for tile in tiles:
+            if cluster["geohash"].startswith(tile):
+                by_tile[tile].append(cluster)
+    return by_tile
+
+
+def clusters(queryset, user_id: Optional[int], zoom: int, south, west, north, east) -> dict:
+    """Clusters of ``queryset`` (the user's entries, or all entries when
+    ``user_id`` is None) around a viewport.
+
+    Whole tiles are returned, so clusters slightly outside the box are
+    included; that keeps tiles shareable and panning smooth.
+    """
+    precision = precision_for_zoom(zoom)
+    tiles = _tiles(south, west, north, east, precision)
+    version = _current_version(user_id)
+    keys = {tile: f"entry-clusters:{_scope(user_id)}:{version}:{precision}:{tile}" for tile in tiles}
+    cached = cache.get_many(keys.values())
+    by_tile = {tile: cached[key] for tile, key in keys.items() if key in cached}
+
+    missing = [tile for tile in tiles if tile not in by_tile]
+    if missing:
+        computed = _compute(queryset, missing, precision)
+        cache.set_many(
+            {keys[tile]: value for tile, value in computed.items()},
+            getattr(settings, "ENTRY_CLUSTER_CACHE_SECONDS", 86400),
+        )
+        by_tile.update(computed)
+
+    seen = set()
+    result = []
+    for tile in tiles:
+        for cluster in by_tile[tile]:
+            if cluster["geohash"] not in seen:
+                seen.add(cluster["geohash"])
+                result.append(cluster)
+    return {"zoom": zoom, "precision": precision, "clusters": result}
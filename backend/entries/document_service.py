@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-import io
+import codecs
+import hashlib
 import mimetypes
-from typing import Optional
+import os
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
 
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 
 try:
@@ -16,10 +22,28 @@ try:
 except Exception:
     pytesseract = None
 
-try:
-    from pdfminer.high_level import extract_text as pdf_extract_text
-except Exception:
-    pdf_extract_text = None
+from . import page_extraction
+
+# Bytes read per step when streaming uploads and text files
+CHUNK_SIZE = 1024 * 1024
+
+TEXT_EXTENSIONS = (".txt", ".md", ".csv", ".log")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff")
+
+# Control characters that cause database issues (everything below 0x20 but tab/newline/CR)
+_CONTROL_CHARS = dict.fromkeys(c for c in range(0x20) if c not in (0x09, 0x0A, 0x0D))
+
+
+class DocumentTooLarge(ValueError):
+    """The upload exceeds ``DOCUMENT_MAX_UPLOAD_BYTES`` or another document limit"""
+
+
+def max_upload_bytes() -> int:
+    return getattr(settings, "DOCUMENT_MAX_UPLOAD_BYTES", 25 * 1024 * 1024)
+
+
+def max_text_chars() -> int:
+    return getattr(settings, "DOCUMENT_MAX_TEXT_CHARS", 500000)
 
 
 def detect_content_type(file: UploadedFile) -> str:
@@ -35,62 +59,190 @@ def clean_text(text: str) -> str:
     """Clean text by removing null bytes and other problematic characters."""
     if not text:
         return ""
-    # Remove null bytes and other control characters that can cause database issues
-    return text.replace('\x00', '').replace('\x01', '').replace('\x02', '').replace('\x03', '').replace('\x04', '').replace('\x05', '').replace('\x06', '').replace('\x07', '').replace('\x08', '').replace('\x0b', '').replace('\x0c', '').replace('\x0e', '').replace('\x0f', '').replace('\x10', '').replace('\x11', '').replace('\x12', '').replace('\x13', '').replace('\x14', '').replace('\x15', '').replace('\x16', '').replace('\x17', '').replace('\x18', '').replace('\x19', '').replace('\x1a', '').replace('\x1b', '').replace('\x1c', '').replace('\x1d', '').replace('\x1e', '').replace('\x1f', '').strip()
+    return text.translate(_CONTROL_CHARS).strip()
 
 
-def extract_text_from_file(file: UploadedFile) -> str:
-    """Extract text from uploaded file. Supports images (OCR), PDFs, and text files.
+@dataclass
+class SpooledFile:
+    """An upload on disk together with its size and SHA-256"""
 
-    Returns empty string if extraction is not possible.
-    """
-    try:
-        content_type = detect_content_type(file)
-        filename = getattr(file, "name", "")
+    path: str
+    size: int
+    sha256: str
 
-        # Read bytes once and reuse
-        file_bytes = file.read()
-        # Reset file pointer so Django can save it afterwards
+
+def iter_chunks(file) -> Iterator[bytes]:
+    """Read a Django or plain file object in bounded chunks from the start"""
+    if hasattr(file, "seek"):
         try:
             file.seek(0)
         except Exception:
             pass
+    if hasattr(file, "chunks"):
+        yield from file.chunks(CHUNK_SIZE)
+        return
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def hash_file(file, limit: Optional[int] = None) -> tuple:
+    """``(size, sha256 hex)`` of a file read in chunks, enforcing a size limit"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter_chunks(file):
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise DocumentTooLarge(f"Document exceeds {limit} bytes")
+        digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+@contextmanager
+def spooled(file) -> Iterator[SpooledFile]:
+    """Yield the file as a path on disk, hashing it on the way.
+
+    Files that already live on disk (large Django uploads, local storage) are
+    used in place; anything else is streamed chunk by chunk into a temporary
+    file that is removed afterwards. Memory use does not depend on file size.
+    """
+    limit = max_upload_bytes()
+    path = _existing_path(file)
+    if path is not None:
+        with open(path, "rb") as handle:
+            size, sha256 = hash_file(handle, limit)
+        yield SpooledFile(path, size, sha256)
+        return
+
+    digest = hashlib.sha256()
+    size = 0
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", delete=False)
+    try:
+        with handle:
+            for chunk in iter_chunks(file):
+                size += len(chunk)
+                if size > limit:
+                    raise DocumentTooLarge(f"Document exceeds {limit} bytes")
+                digest.update(chunk)
+                handle.write(chunk)
+        yield SpooledFile(handle.name, size, digest.hexdigest())
+    finally:
+        try:
+            os.unlink(handle.name)
+        except OSError:
+            pass
 
-        if not file_bytes:
-            return ""
-
-        # Handle simple text types
-        if content_type.startswith("text/") or filename.lower().endswith((".txt", ".md", ".csv", ".log")):
-            try:
-                return clean_text(file_bytes.decode("utf-8", errors="ignore"))
-            except Exception:
-                return ""
-
-        # Handle PDFs
-        if content_type == "application/pdf" or filename.lower().endswith(".pdf"):
-            if pdf_extract_text is None:
-                return ""
-            try:
-                return clean_text(pdf_extract_text(io.BytesIO(file_bytes)) or "")
-            except Exception:
-                return ""
-
-        # Handle common image types via OCR
-        if content_type.startswith("image/") or filename.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff")):
-            if Image is None or pytesseract is None:
-                return ""
-            try:
-                image = Image.open(io.BytesIO(file_bytes))
-                text = pytesseract.image_to_string(image)
-                return clean_text(text or "")
-            except Exception:
-                return ""
 
+def _existing_path(file) -> Optional[str]:
+    """Path of a file that is already on local disk, if any"""
+    if hasattr(file, "temporary_file_path"):
+        return file.temporary_file_path()
+    try:
+        path = getattr(file, "path", None)
+    except (NotImplementedError, ValueError):
+        # Remote storages have no local path
+        return None
+    if isinstance(path, str) and os.path.exists(path):
+        return path
+    return None
+
+
+def _is_text(content_type: str, filename: str) -> bool:
+    return content_type.startswith("text/") or filename.endswith(TEXT_EXTENSIONS)
+
+
+def _is_pdf(content_type: str, filename: str) -> bool:
+    return content_type == "application/pdf" or filename.endswith(".pdf")
+
+
+def _is_image(content_type: str, filename: str) -> bool:
+    return content_type.startswith("image/") or filename.endswith(IMAGE_EXTENSIONS)
+
+
+def _read_text(path: str) -> str:
+    """Decode a text file incrementally, stopping at the text cap"""
+    cap = max_text_chars()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+    length = 0
+    with open(path, "rb") as handle:
+        while length < cap:
+            chunk = handle.read(CHUNK_SIZE)
+            text = decoder.decode(chunk, final=not chunk)
+            parts.append(text)
+            length += len(text)
+            if not chunk:
+                break
+    return clean_text("".join(parts)[:cap])
+
+
+def _pdf_text(path: str) -> str:
+    if page_extraction.PDFPage is None:
+        return ""
+    result = page_extraction.extract_pdf(
+        path,
+        max_pages=getattr(settings, "DOCUMENT_MAX_PDF_PAGES", 200),
+        text_cap=max_text_chars(),
+        workers=getattr(settings, "DOCUMENT_EXTRACTION_WORKERS", 2),
+        page_timeout=getattr(settings, "DOCUMENT_PAGE_TIMEOUT_SECONDS", 30),
+        ocr_max_side=getattr(settings, "DOCUMENT_OCR_MAX_SIDE", 2000),
+    )
+    return clean_text(result.text)
+
+
+def _image_text(path: str) -> str:
+    if Image is None or pytesseract is None:
+        return ""
+    max_pixels = getattr(settings, "DOCUMENT_MAX_IMAGE_PIXELS", 40_000_000)
+    with Image.open(path) as image:
+        # Only the header has been read so far; refuse before decoding pixels
+        width, height = image.size
+        if width * height > max_pixels:
+            raise DocumentTooLarge(f"Image has {width * height} pixels, limit is {max_pixels}")
+        text = pytesseract.image_to_string(
+            page_extraction.prepare_for_ocr(image, getattr(settings, "DOCUMENT_OCR_MAX_SIDE", 2000))
+        )
+    return clean_text((text or "")[: max_text_chars()])
+
+
+def extract_text_from_path(path: str, content_type: str = "", filename: str = "") -> str:
+    """Extract text from a file on disk. Supports images (OCR), PDFs, and text files.
+
+    Returns empty string if extraction is not possible; raises
+    ``DocumentTooLarge`` when a size limit is exceeded.
+    """
+    if os.path.getsize(path) == 0:
+        return ""
+    content_type = content_type or mimetypes.guess_type(filename or path)[0] or ""
+    filename = (filename or path).lower()
+    try:
+        if _is_text(content_type, filename):
+            return _read_text(path)
+        if _is_pdf(content_type, filename):
+            return _pdf_text(path)
+        if _is_image(content_type, filename):
+            return _image_text(path)
         # Fallback: try to decode as text
-        try:
-            return clean_text(file_bytes.decode("utf-8", errors="ignore"))
-        except Exception:
-            return ""
+        return _read_text(path)
+    except DocumentTooLarge:
+        raise
     except Exception:
         return ""
 
+
+def extract_text_from_file(file, content_type: str = "", filename: str = "") -> str:
+    """Extract text from an uploaded or stored file without reading it into memory.
+
+    ``content_type`` and ``filename`` override the file's own, e.g. for
+    content-addressed blobs whose storage name has no extension. Returns
+    empty string if extraction is not possible; raises ``DocumentTooLarge``
+    when a size limit is exceeded.
+    """
+    with spooled(file) as spool:
+        return extract_text_from_path(
+            spool.path,
+            content_type or detect_content_type(file),
+            filename or getattr(file, "name", ""),
+        )
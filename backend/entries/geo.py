@@ -0,0 +1,177 @@
+"""
+Geohash indexing for entry coordinates.
+
+Every geotagged entry stores the geohash of its coordinates. Geohashes that
+share a prefix lie in the same cell, and the alphabet is in ASCII order, so
+a cell is the string range ``[prefix, prefix + "{")`` and the plain B-tree
+on ``Entry.geohash`` answers spatial queries on any database. A bounding
+box is covered by a handful of cells, fetched with range conditions and
+then filtered on the exact coordinates.
+"""
+
+import math
+from typing import List, Tuple
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 12
+# Sorts after every geohash character, closing the range of a prefix
+RANGE_END = "{"
+# A bounding box is covered by at most this many cells
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode(latitude: float, longitude: float, precision: int = PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a cell at ``precision``"""
+    total = 5 * precision
+    lon_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _cover_precision(south, west, north, east, max_cells, max_precision) -> int:
+    precision = 1
+    for candidate in range(1, max_precision + 1):
+        height, width = cell_size(candidate)
+        cells = (math.floor(north / height) - math.floor(south / height) + 1) * (
+            math.floor(east / width) - math.floor(west / width) + 1
+        )
+        if cells > max_cells:
+            break
+        precision = candidate
+    return precision
+
+
+def cover(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    max_cells: int = MAX_COVER_CELLS,
+    max_precision: int = PRECISION,
+) -> List[str]:
+    """Sorted geohash prefixes whose cells together contain the box (west <= east)"""
+    precision = _cover_precision(south, west, north, east, max_cells, max_precision)
+    height, width = cell_size(precision)
+    cells = set()
+    row = math.floor(south / height)
+    while row * height <= north:
+        column = math.floor(west / width)
+        while column * width <= east:
+            latitude = min(max((row + 0.5) * height, -90.0), 90.0)
+            longitude = min(max((column + 0.5) * width, -180.0), 180.0)
+            cells.add(encode(latitude, longitude, precision))
+            column += 1
+        row += 1
+    return sorted(cells)
+
+
+def split_antimeridian(south, west, north, east) -> List[Tuple[float, float, float, float]]:
+    """A box crossing the antimeridian (west > east) as two boxes"""
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def wrap_longitudes(west: float, east: float) -> Tuple[float, float]:
+    """Longitudes of a span into [-180, 180]; a span of 360° or more is the
+    whole world, and one wrapping past ±180 comes back with west > east"""
+    if east - west >= 360.0:
+        return -180.0, 180.0
+    span = max(east - west, 0.0)
+    west = (west + 180.0) % 360.0 - 180.0
+    east = west + span
+    if east > 180.0:
+        east -= 360.0
+    return west, east
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """``"west,south,east,north"`` (Leaflet's ``toBBoxString``) as (south, west, north, east).
+
+    Longitudes may be unwrapped, as Leaflet reports them for zoomed-out or
+    panned maps; they are brought back into range.
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be west,south,east,north")
+    if not (-90 <= south <= north <= 90 and math.isfinite(west) and math.isfinite(east)):
+        raise ValueError("bbox is out of range")
+    if west <= east:
+        west, east = wrap_longitudes(west, east)
+    elif not (-180 <= east < west <= 180):
+        # Already crossing the antimeridian, so it must be in range
+        raise ValueError("bbox is out of range")
+    return south, west, north, east
+
+
+def bbox_q(south: float, west: float, north: float, east: float, prefix: str = "") -> Q:
+    """Entries inside the box: geohash ranges for the index, exact coordinates to trim"""
+    if west <= east:
+        west, east = wrap_longitudes(west, east)
+    condition = Q()
+    for box in split_antimeridian(south, west, north, east):
+        cells = Q()
+        for cell in cover(*box):
+            cells |= Q(**{f"{prefix}geohash__gte": cell, f"{prefix}geohash__lt": cell + RANGE_END})
+        condition |= cells & Q(
+            **{
+                f"{prefix}latitude__gte": box[0],
+                f"{prefix}latitude__lte": box[2],
+                f"{prefix}longitude__gte": box[1],
+                f"{prefix}longitude__lte": box[3],
+            }
+        )
+    return condition
+
+
+def radius_bbox(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) enclosing a circle; the whole longitude range near the poles"""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    if south <= -90.0 or north >= 90.0:
+        return south, -180.0, north, 180.0
+    delta_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(max(abs(south), abs(north))))))
+    if delta_lon >= 180.0:
+        return south, -180.0, north, 180.0
+    west = (longitude - delta_lon + 540.0) % 360.0 - 180.0
+    east = (longitude + delta_lon + 540.0) % 360.0 - 180.0
+    return south, west, north, east
+
+
+def distance_km(latitude: float, longitude: float, prefix: str = ""):
+    """Haversine distance from a point to each row's coordinates, as an expression"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2 = Radians(F(f"{prefix}latitude"))
+    lon2 = Radians(F(f"{prefix}longitude"))
+    half_chord = Power(Sin((lat2 - lat1) / 2), 2) + math.cos(lat1) * Cos(lat2) * Power(Sin((lon2 - lon1) / 2), 2)
+    # Rounding can push the chord a hair above 1 for antipodal points
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(half_chord), Value(1.0)), output_field=FloatField())
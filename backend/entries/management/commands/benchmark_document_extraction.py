@@ -0,0 +1,113 @@
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from entries import page_extraction
+
+try:
+    from pdfminer.high_level import extract_text as pdf_extract_text
+except Exception:
+    pdf_extract_text = None
+
+
+def write_fixture_pdf(path, pages, lines_per_page=40):
+    """Write a plain multi-page PDF with a text layer on every page"""
+    objects = [b"<</Type/Catalog/Pages 2 0 R>>", None, b"<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>"]
+    kids = []
+    for page in range(pages):
+        lines = [
+            f"BT /F1 10 Tf 40 {800 - 18 * line} Td (Page {page + 1} line {line + 1}: "
+            f"a day out walking by the river and a museum visit) Tj ET"
+            for line in range(lines_per_page)
+        ]
+        stream = "\n".join(lines).encode()
+        objects.append(b"<</Length %d>>stream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 842]/Contents %d 0 R"
+            b"/Resources<</Font<</F1 3 0 R>>>>>>" % content_id
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<</Type/Pages/Kids[%s]/Count %d>>" % (b" ".join(kids), pages)
+
+    with open(path, "wb") as out:
+        out.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            out.write(b"%010d 00000 n \n" % offset)
+        out.write(b"trailer<</Size %d/Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+class Command(BaseCommand):
+    help = 'Compare whole-document PDF extraction with the per-page process pool on multi-page fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            nargs='+',
+            default=[10, 50, 200],
+            help='Page counts of the generated fixtures (default: 10 50 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Process pool size for the parallel run (default: CPU count)',
+        )
+        parser.add_argument(
+            '--text-cap',
+            type=int,
+            default=0,
+            help='Also time an early-exit run stopping at this many characters',
+        )
+        parser.add_argument(
+            '--file',
+            action='append',
+            default=[],
+            help='Benchmark this PDF as well (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        if pdf_extract_text is None or page_extraction.PDFPage is None:
+            raise CommandError('pdfminer.six is not installed')
+
+        with tempfile.TemporaryDirectory(prefix="pdf-benchmark-") as directory:
+            paths = list(options['file'])
+            for pages in options['pages']:
+                path = os.path.join(directory, f"fixture-{pages}p.pdf")
+                write_fixture_pdf(path, pages)
+                paths.append(path)
+
+            try:
+                for path in paths:
+                    self._benchmark(path, options['workers'], options['text_cap'])
+            finally:
+                page_extraction.shutdown_pool()
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def _benchmark(self, path, workers, text_cap):
+        name = os.path.basename(path)
+        started = time.perf_counter()
+        whole = pdf_extract_text(path) or ""
+        baseline = time.perf_counter() - started
+        self.stdout.write(f"{name}: whole document {baseline:.2f}s, {len(whole)} chars")
+
+        runs = [("1 worker", 1, 0), (f"{workers} workers", workers, 0)]
+        if text_cap:
+            runs.append((f"{workers} workers, cap {text_cap}", workers, text_cap))
+        for label, run_workers, cap in runs:
+            # Start the pool outside the timing
+            page_extraction.extract_pdf(path, max_pages=1, workers=run_workers)
+            started = time.perf_counter()
+            result = page_extraction.extract_pdf(path, text_cap=cap, workers=run_workers)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {label}: {elapsed:.2f}s ({baseline / elapsed:.1f}x), {result.pages_done}/{result.page_count} pages, "
+                f"{len(result.text)} chars, {result.failed_pages} failed, {result.ocr_pages} OCR"
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from entries.blobs import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Move documents into content-addressed blobs, recount blob references and delete unused blobs'
+
+    def handle(self, *args, **options):
+        result = rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Moved {result['moved']} documents, fixed {result['fixed']} reference counts, "
+                f"deleted {result['deleted']} unused blobs"
+            )
+        )
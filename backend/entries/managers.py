@@ -0,0 +1,54 @@
+"""
+Managers that leave large columns out of ordinary queries.
+
+Models list their bulky fields (document text, embeddings) in
+``DEFERRED_FIELDS``; the default manager defers them, so lists, prefetches
+and nested serializers never transfer them. Code that needs them opts in
+with ``with_large_fields()``; touching a deferred field on an instance
+still works but costs one query per object.
+"""
+
+from django.db import models
+from django.db.models import BooleanField, Case, Value, When
+from django.db.models.functions import Left, Length
+
+
+class LargeFieldsQuerySet(models.QuerySet):
+    def with_large_fields(self):
+        """Load the fields the default manager defers, keeping other deferrals"""
+        fields, defer = self.query.deferred_loading
+        if not defer:
+            # only() in effect: add the large fields to the loaded set
+            return self.only(*fields, *self.model.DEFERRED_FIELDS)
+        queryset = self.defer(None)
+        remaining = set(fields) - set(self.model.DEFERRED_FIELDS)
+        return queryset.defer(*remaining) if remaining else queryset
+
+
+class LargeFieldsManager(models.Manager.from_queryset(LargeFieldsQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().defer(*self.model.DEFERRED_FIELDS)
+
+
+class EntryQuerySet(LargeFieldsQuerySet):
+    def previews(self, length: int):
+        """Defer ``content`` and annotate its first ``length`` characters.
+
+        Adds ``content_preview``, ``content_length`` and ``content_truncated``,
+        computed by the database so the full text is never sent.
+        """
+        return (
+            self.defer("content")
+            .annotate(content_preview=Left("content", length), content_length=Length("content"))
+            .annotate(
+                content_truncated=Case(
+                    When(content_length__gt=length, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                )
+            )
+        )
+
+
+class EntryManager(LargeFieldsManager.from_queryset(EntryQuerySet)):
+    pass
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0004_entrydocument_content_type_extracted_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='title_pending',
+            field=models.BooleanField(default=False),
+        ),
+    ]
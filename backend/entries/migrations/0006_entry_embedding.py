@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0005_entry_title_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0006_entry_embedding'),
+    ]
+
+    operations = [
+        # Documents uploaded before this migration were extracted synchronously
+        migrations.AddField(
+            model_name='entrydocument',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='entrydocument',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='entrydocument',
+            name='extraction_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='entrydocument',
+            name='extracted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0007_entrydocument_extraction_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entrydocument',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
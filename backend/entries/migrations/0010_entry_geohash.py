@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:59
+
+from django.db import migrations, models
+
+
+# Frozen copy of entries.geo.encode as of this migration
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(latitude, longitude, precision=12):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def fill_geohashes(apps, schema_editor):
+    Entry = apps.get_model('entries', 'Entry')
+    batch = []
+    geotagged = Entry.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+    for entry in geotagged.iterator(chunk_size=2000):
+        entry.geohash = encode(entry.latitude, entry.longitude)
+        batch.append(entry)
+        if len(batch) >= 2000:
+            Entry.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    Entry.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0009_documentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['user', 'geohash'], name='entry_user_geohash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['geohash'], name='entry_geohash_idx'),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
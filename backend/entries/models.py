@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
+from .managers import EntryManager, LargeFieldsManager
 
 
 class Entry(models.Model):
@@ -9,6 +10,8 @@ class Entry(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="entries")
     title = models.CharField(max_length=200, blank=True)
+    # True while the title is a provisional one awaiting AI generation
+    title_pending = models.BooleanField(default=False)
     content = models.TextField()
     is_public = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -45,15 +48,77 @@ class Entry(models.Model):
         blank=True,
         help_text="Name of the main place mentioned in this entry",
     )
+    # Geohash of latitude/longitude for spatial queries, kept in sync by save()
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    # float32 embedding of title and content for semantic search
+    embedding = models.BinaryField(null=True, blank=True, editable=False)
+
+    DEFERRED_FIELDS = ("embedding",)
+    objects = EntryManager()
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name_plural = "Entries"
+        indexes = [
+            models.Index(fields=["user", "geohash"], name="entry_user_geohash_idx"),
+            models.Index(fields=["geohash"], name="entry_geohash_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_map_state = instance._map_state()
+        return instance
+
+    def _map_state(self):
+        """What the map clusters show of this entry (deferred fields read as None)"""
+        return self.__dict__.get("geohash"), self.__dict__.get("overall_sentiment")
+
+    def save(self, *args, **kwargs):
+        from . import clusters
+        from .geo import encode
+
+        has_coordinates = self.latitude is not None and self.longitude is not None
+        self.geohash = encode(self.latitude, self.longitude) if has_coordinates else ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        super().save(*args, **kwargs)
+
+        loaded = getattr(self, "_loaded_map_state", (None, None))
+        state = self._map_state()
+        if state != loaded and (self.geohash or loaded[0]):
+            # Geocoded, moved or re-scored: cached cluster tiles are stale
+            user_id = self.user_id
+            transaction.on_commit(lambda: clusters.invalidate(user_id))
+        self._loaded_map_state = state
 
     def __str__(self):
         return f"{self.user.username} - {self.title or self.content[:50]}..."
 
 
+class DocumentBlob(models.Model):
+    """A stored document file, shared by every upload with the same content"""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to="document_blobs/")
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    # Number of EntryDocuments using this blob; it is deleted at zero
+    ref_count = models.PositiveIntegerField(default=0)
+    # Extraction result reused by later uploads of the same content
+    extracted_text = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    DEFERRED_FIELDS = ("extracted_text",)
+    objects = LargeFieldsManager()
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class EntryDocument(models.Model):
     """Documents attached to entries"""
 
@@ -64,6 +129,32 @@ class EntryDocument(models.Model):
     content_type = models.CharField(max_length=100, blank=True)
     extracted_text = models.TextField(blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # SHA-256 of the file, computed while the upload streams in
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    blob = models.ForeignKey(
+        DocumentBlob, null=True, blank=True, on_delete=models.PROTECT, related_name="documents"
+    )
+
+    # Text extraction runs in a background task after upload
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    EXTRACTION_STATUSES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_READY, "Ready"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    extraction_status = models.CharField(
+        max_length=20, choices=EXTRACTION_STATUSES, default=STATUS_PENDING, db_index=True
+    )
+    extraction_error = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+
+    # Can be megabytes; the pipeline loads it with with_large_fields()
+    DEFERRED_FIELDS = ("extracted_text",)
+    objects = LargeFieldsManager()
 
     def __str__(self):
         return f"{self.entry} - {self.filename}"
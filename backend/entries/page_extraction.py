@@ -0,0 +1,299 @@
+"""
+Page-level PDF text extraction on a bounded process pool.
+
+Pages are laid out independently in worker processes, a few at a time, and
+joined in page order. Each page runs under a time limit (a signal timer, so
+pages are only extracted inline on a main thread), pages without a
+text layer fall back to OCR of their embedded images (downscaled and
+converted to grayscale first), and no further pages are started once the
+text cap is reached. Worker functions take plain arguments and never touch
+Django, so they can run in any process.
+"""
+
+import logging
+import os
+import signal
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None  # Pillow optional during tests
+
+try:
+    import pytesseract
+except Exception:
+    pytesseract = None
+
+try:
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.image import ImageWriter
+    from pdfminer.layout import LAParams, LTFigure, LTImage, LTTextContainer
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+except Exception:
+    PDFPage = None
+
+logger = logging.getLogger(__name__)
+
+# Pages with less text than this are treated as scans and OCRed
+MIN_TEXT_LAYER_CHARS = 20
+# Extra wait for a page beyond its own time limit before giving up on it
+RESULT_GRACE_SECONDS = 5
+
+_pool = None
+_pool_workers = 0
+# Set once this process turns out unable to start workers
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+
+
+class PageTimeout(Exception):
+    pass
+
+
+@dataclass
+class PdfExtraction:
+    text: str
+    page_count: int
+    pages_done: int
+    ocr_pages: int = 0
+    failed_pages: int = 0
+    truncated: bool = False
+
+
+def prepare_for_ocr(image, max_side: int):
+    """Grayscale copy no larger than ``max_side`` on its longest edge"""
+    if max_side and max(image.size) > max_side:
+        # JPEG can decode straight to a smaller size; a no-op for other formats
+        image.draft("L", (max_side, max_side))
+    image = image.convert("L")
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side))
+    return image
+
+
+def _can_time_limit() -> bool:
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Raise ``PageTimeout`` after ``seconds``; only possible on a main thread"""
+    if not (seconds and _can_time_limit()):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise PageTimeout(f"Page took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _images(layout):
+    for obj in layout:
+        if isinstance(obj, LTImage):
+            yield obj
+        elif isinstance(obj, LTFigure):
+            yield from _images(obj)
+
+
+def _ocr_images(layout, ocr_max_side: int) -> str:
+    texts = []
+    with tempfile.TemporaryDirectory(prefix="page-ocr-") as directory:
+        writer = ImageWriter(directory)
+        for image in _images(layout):
+            try:
+                name = writer.export_image(image)
+                with Image.open(os.path.join(directory, name)) as picture:
+                    texts.append(pytesseract.image_to_string(prepare_for_ocr(picture, ocr_max_side)))
+            except Exception as e:
+                # Unsupported image encodings are skipped
+                logger.debug(f"Could not OCR page image: {e}")
+    return "\n".join(t for t in texts if t)
+
+
+def extract_page(path: str, page_number: int, timeout: Optional[float], ocr_max_side: int) -> tuple:
+    """``(text, used_ocr)`` for one zero-based page; runs in a worker process"""
+    with _time_limit(timeout):
+        with open(path, "rb") as handle:
+            page = next(PDFPage.get_pages(handle, pagenos={page_number}), None)
+            if page is None:
+                return "", False
+            manager = PDFResourceManager()
+            device = PDFPageAggregator(manager, laparams=LAParams())
+            PDFPageInterpreter(manager, device).process_page(page)
+            layout = device.get_result()
+            text = "\n".join(obj.get_text() for obj in layout if isinstance(obj, LTTextContainer))
+            if len(text.strip()) >= MIN_TEXT_LAYER_CHARS or Image is None or pytesseract is None:
+                return text, False
+            ocr_text = _ocr_images(layout, ocr_max_side)
+            return (ocr_text, True) if ocr_text.strip() else (text, False)
+
+
+def count_pages(path: str, max_pages: int = 0) -> int:
+    with open(path, "rb") as handle:
+        return sum(1 for _ in PDFPage.get_pages(handle, maxpages=max_pages))
+
+
+def _get_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    global _pool, _pool_workers
+    if _pool_unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes (they are started again on demand)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Shut down a broken pool; the shared one is only dropped if it is still
+    ``pool``, so a replacement another thread already started keeps running"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_safely(path, page_number, page_timeout, ocr_max_side) -> tuple:
+    try:
+        return (*extract_page(path, page_number, page_timeout, ocr_max_side), False)
+    except Exception as e:
+        logger.warning(f"Page {page_number + 1} of {path} failed: {e}")
+        return "", False, True
+
+
+def _run_pages(path, page_count, workers, page_timeout, ocr_max_side):
+    """Yield ``(text, used_ocr, failed)`` per page in order.
+
+    Pages go to the process pool when there are several to share between
+    workers, or when a time limit is set that this thread cannot enforce
+    (e.g. in a ``--pool threads`` Celery worker). They run inline only
+    otherwise, or when no worker process can be started at all, which
+    happens inside daemonic prefork workers whose tasks run on a main thread.
+    """
+    global _pool_unavailable
+    workers = max(1, workers)
+    use_pool = (workers > 1 and page_count > 1) or (page_timeout and not _can_time_limit())
+    wait = page_timeout + RESULT_GRACE_SECONDS if page_timeout else None
+
+    page_number = 0
+    while use_pool and page_number < page_count:
+        try:
+            pool = _get_pool(workers)
+        except Exception as e:
+            logger.warning(f"Extracting pages inline, process pool unavailable: {e}")
+            pool = None
+        if pool is None:
+            break
+
+        in_flight = {}
+        next_page = page_number
+        try:
+            while page_number < page_count:
+                # Keep a bounded window of pages queued ahead of the one awaited
+                try:
+                    try:
+                        while next_page < page_count and len(in_flight) < workers * 2:
+                            in_flight[next_page] = pool.submit(
+                                extract_page, path, next_page, page_timeout, ocr_max_side
+                            )
+                            next_page += 1
+                    except RuntimeError as e:
+                        # Another thread shut this pool down (it broke or was
+                        # resized); resubmit the pages not done to the current one
+                        logger.info(f"Process pool was replaced, resubmitting pages of {path}: {e}")
+                        _discard_pool(pool)
+                        break
+                    outcome = (*in_flight.pop(page_number).result(timeout=wait), False)
+                except AssertionError as e:
+                    # Workers cannot start at all (inside a daemonic process)
+                    logger.warning(f"Process pool unavailable, extracting the remaining pages inline: {e}")
+                    with _pool_lock:
+                        _pool_unavailable = True
+                    _discard_pool(pool)
+                    use_pool = False
+                    break
+                except BrokenProcessPool as e:
+                    # A worker died, most likely on the page awaited; carry on with a new pool
+                    logger.warning(f"Process pool broke on page {page_number + 1} of {path}: {e}")
+                    _discard_pool(pool)
+                    yield "", False, True
+                    page_number += 1
+                    break
+                except Exception as e:
+                    logger.warning(f"Page {page_number + 1} of {path} failed: {e}")
+                    outcome = ("", False, True)
+                yield outcome
+                page_number += 1
+        finally:
+            # Reached the text cap, failed or restarting: drop the pages not started yet
+            for future in in_flight.values():
+                future.cancel()
+
+    for number in range(page_number, page_count):
+        yield _extract_safely(path, number, page_timeout, ocr_max_side)
+
+
+def extract_pdf(
+    path: str,
+    max_pages: int = 0,
+    text_cap: int = 0,
+    workers: int = 1,
+    page_timeout: Optional[float] = None,
+    ocr_max_side: int = 2000,
+) -> PdfExtraction:
+    """Extract a PDF page by page, in parallel when ``workers`` > 1.
+
+    ``max_pages`` and ``text_cap`` of 0 mean no limit. A page that fails or
+    times out contributes no text; the rest of the document is kept.
+    """
+    if PDFPage is None:
+        return PdfExtraction("", 0, 0)
+    page_count = count_pages(path, max_pages)
+    result = PdfExtraction("", page_count, 0)
+    parts = []
+    length = 0
+
+    pages = _run_pages(path, page_count, workers, page_timeout, ocr_max_side)
+    try:
+        for text, used_ocr, failed in pages:
+            parts.append(text)
+            length += len(text)
+            result.pages_done += 1
+            result.ocr_pages += int(used_ocr)
+            result.failed_pages += int(failed)
+            if text_cap and length >= text_cap:
+                break
+    finally:
+        pages.close()
+
+    result.truncated = result.pages_done < page_count
+    text = "\n".join(parts)
+    result.text = text[:text_cap] if text_cap else text
+    return result
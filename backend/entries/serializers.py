@@ -9,8 +9,29 @@ from insights.serializers import InsightSerializer
 class EntryDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = EntryDocument
-        fields = ["id", "file", "filename", "file_size", "content_type", "uploaded_at"]
-        read_only_fields = ["id", "filename", "file_size", "content_type", "uploaded_at"]
+        fields = [
+            "id",
+            "file",
+            "filename",
+            "file_size",
+            "content_type",
+            "uploaded_at",
+            "extraction_status",
+            "extraction_error",
+            "extracted_at",
+            "sha256",
+        ]
+        read_only_fields = [
+            "id",
+            "filename",
+            "file_size",
+            "content_type",
+            "uploaded_at",
+            "extraction_status",
+            "extraction_error",
+            "extracted_at",
+            "sha256",
+        ]
 
 
 class EntrySerializer(serializers.ModelSerializer):
@@ -28,6 +49,7 @@ class EntrySerializer(serializers.ModelSerializer):
             "id",
             "user",
             "title",
+            "title_pending",
             "content",
             "is_public",
             "faces",
@@ -49,17 +71,36 @@ class EntrySerializer(serializers.ModelSerializer):
             "updated_at",
             "overall_sentiment",
             "insights_processed",
+            "title_pending",
         ]
 
 
+class EntryPreviewSerializer(EntrySerializer):
+    """Entry in a list: ``content`` is cut to a preview computed by the database"""
+
+    content = serializers.CharField(source="content_preview", read_only=True)
+    content_truncated = serializers.BooleanField(read_only=True)
+    # Only set by radius queries
+    distance_km = serializers.FloatField(read_only=True, required=False)
+
+    class Meta(EntrySerializer.Meta):
+        fields = EntrySerializer.Meta.fields + ["content_truncated", "distance_km"]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not hasattr(instance, "distance_km"):
+            data.pop("distance_km", None)
+        return data
+
+
 class EntryCreateSerializer(serializers.ModelSerializer):
     face_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Face.objects.all(), write_only=True, required=False, source="faces"
     )
     class Meta:
         model = Entry
-        fields = ["id", "title", "content", "is_public", "face_ids"]
-        read_only_fields = ["id"]
+        fields = ["id", "title", "title_pending", "content", "is_public", "face_ids"]
+        read_only_fields = ["id", "title_pending"]
 
 
 class PublicEntrySerializer(serializers.ModelSerializer):
@@ -80,3 +121,12 @@ class PublicEntrySerializer(serializers.ModelSerializer):
             "insights",
         ]
         read_only_fields = ["id", "user", "created_at", "overall_sentiment"]
+
+
+class CategoryMatchEntrySerializer(EntrySerializer):
+    """Entry with the number of its insights that matched a category filter"""
+
+    matched_insight_count = serializers.IntegerField(read_only=True)
+
+    class Meta(EntrySerializer.Meta):
+        fields = EntrySerializer.Meta.fields + ["matched_insight_count"]
@@ -0,0 +1,37 @@
+"""
+Signal handlers for entry documents.
+
+Blobs are released when a document row is deleted, whichever way that
+happens: the API, the admin, an entry or user cascade, or the shell.
+"""
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import blobs
+from .models import EntryDocument
+
+
+@receiver(post_delete, sender=EntryDocument, dispatch_uid="entries.release_document_blob")
+def release_document_blob(sender, instance, **kwargs):
+    """Drop the document's blob reference and hand its extraction on"""
+    if instance.blob_id is None:
+        return
+    if not blobs.release([instance.blob_id]) and instance.extraction_status in (
+        EntryDocument.STATUS_PENDING,
+        EntryDocument.STATUS_PROCESSING,
+    ):
+        # Uploads of the same content may be waiting on this document's
+        # extraction; start it for one of them instead
+        from .tasks import enqueue_document_extraction
+
+        waiting = (
+            EntryDocument.objects.filter(
+                blob_id=instance.blob_id, extraction_status=EntryDocument.STATUS_PENDING
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if waiting is not None:
+            enqueue_document_extraction(waiting)
@@ -0,0 +1,123 @@
+"""
+Background text extraction for uploaded documents.
+
+Uploads are stored immediately with ``extraction_status="pending"``; the text
+is extracted here on the ``documents`` queue and insight extraction for the
+entry is queued only once the text is ready. Uploads of the same content
+made while it is extracted stay pending and get the same result.
+"""
+
+try:
+    from celery import shared_task
+except ImportError:
+    # Celery not available, create a mock decorator
+    def shared_task(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+import logging
+from django.db import transaction
+from django.utils import timezone
+from insights.queues import DOCUMENTS_QUEUE, SOURCE_DOCUMENT
+from . import blobs
+from .document_service import extract_text_from_file
+from .models import DocumentBlob, EntryDocument
+
+logger = logging.getLogger(__name__)
+
+
+def extract_document_text(document_id: int) -> bool:
+    """Extract a document's text, store it and queue insight re-extraction"""
+    # A redelivered task (acks_late) may find the document already processing
+    claimed = EntryDocument.objects.filter(id=document_id).exclude(
+        extraction_status=EntryDocument.STATUS_READY
+    ).update(extraction_status=EntryDocument.STATUS_PROCESSING)
+    if not claimed:
+        # Deleted, or already extracted by another delivery
+        return False
+
+    document = EntryDocument.objects.select_related("blob").get(id=document_id)
+    if document.blob and document.blob.extracted_at:
+        # Same content was extracted before
+        logger.info(f"Reusing extracted text of blob {document.blob.sha256[:12]} for document {document_id}")
+        return _store_text(document, document.blob.extracted_text)
+
+    try:
+        with document.file.open("rb") as file:
+            text = extract_text_from_file(file, document.content_type, document.filename)
+    except Exception as e:
+        logger.warning(f"Text extraction failed for document {document_id}: {e}")
+        with transaction.atomic():
+            _with_waiting_uploads(document).update(
+                extraction_status=EntryDocument.STATUS_FAILED, extraction_error=str(e)[:1000]
+            )
+        return False
+
+    logger.info(f"Extracted {len(text)} characters from document {document_id}")
+    return _store_text(document, text, extracted=True)
+
+
+def _with_waiting_uploads(document):
+    """The document plus pending uploads of its content waiting on its extraction.
+
+    Locks the blob first: an upload that took the lock before is committed
+    and included, one after it sees the blob's result and does not wait.
+    """
+    documents = EntryDocument.objects.filter(id=document.id)
+    if document.blob_id is None:
+        return documents
+    list(DocumentBlob.objects.select_for_update().filter(pk=document.blob_id).values_list("pk", flat=True))
+    waiting = EntryDocument.objects.filter(
+        blob_id=document.blob_id, extraction_status=EntryDocument.STATUS_PENDING
+    )
+    return documents | waiting
+
+
+def _store_text(document, text: str, extracted: bool = False) -> bool:
+    """Mark the document and the uploads waiting on it ready, and queue insight
+    re-extraction for their entries; freshly ``extracted`` text is also kept
+    on the blob"""
+    from insights.tasks import enqueue_extraction
+
+    with transaction.atomic():
+        if extracted:
+            blobs.store_extraction(document.blob_id, text, timezone.now())
+        documents = _with_waiting_uploads(document)
+        entry_ids = sorted(set(documents.values_list("entry_id", flat=True)))
+        documents.update(
+            extracted_text=text,
+            extraction_status=EntryDocument.STATUS_READY,
+            extraction_error="",
+            extracted_at=timezone.now(),
+        )
+    for entry_id in entry_ids:
+        enqueue_extraction(entry_id, SOURCE_DOCUMENT)
+    return True
+
+
+@shared_task(bind=True, acks_late=True)
+def extract_document_text_task(self, document_id: int) -> bool:
+    """Celery task running ``extract_document_text`` on the documents queue"""
+    return extract_document_text(document_id)
+
+
+def enqueue_document_extraction(document_id: int) -> None:
+    """Queue text extraction once the upload is committed.
+
+    Falls back to extracting inline when Celery is not installed or the
+    broker cannot be reached.
+    """
+
+    def send():
+        apply_async = getattr(extract_document_text_task, "apply_async", None)
+        if not callable(apply_async):
+            extract_document_text(document_id)
+            return
+        try:
+            apply_async(args=[document_id], queue=DOCUMENTS_QUEUE)
+        except Exception as e:
+            logger.warning(f"Could not queue text extraction for document {document_id}, running inline: {e}")
+            extract_document_text(document_id)
+
+    transaction.on_commit(send)
@@ -0,0 +1,40 @@
+"""
+Upload handler that hashes and size-checks files while Django receives them.
+
+It runs ahead of Django's memory/temporary-file handlers, so each chunk is
+hashed as it streams past and oversized files are dropped before they are
+buffered. Results are left on the request as ``upload_digests`` (field name
+→ sha256 hex) and ``upload_rejected`` (field names over the limit).
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from .document_service import max_upload_bytes
+
+
+class HashingUploadHandler(FileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.upload_digests = {}
+        self.request.upload_rejected = []
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.limit = max_upload_bytes()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.limit:
+            self.request.upload_rejected.append(self.field_name)
+            raise SkipFile()
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.request.upload_digests[self.field_name] = self.digest.hexdigest()
+        # Let the next handler build the file object
+        return None
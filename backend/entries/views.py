@@ -1,41 +1,110 @@
+import time
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.http import StreamingHttpResponse
 from django.db.models import Q
+from . import blobs, clusters, geo
 from .models import Entry, EntryDocument
-from .document_service import extract_text_from_file, detect_content_type
+from .document_service import DocumentTooLarge, detect_content_type, hash_file, max_upload_bytes
+from .tasks import enqueue_document_extraction
 from .serializers import (
     EntrySerializer,
     EntryCreateSerializer,
     PublicEntrySerializer,
     EntryDocumentSerializer,
+    EntryPreviewSerializer,
+)
+
+from insights import rollups, vector_index
+from insights.filters import filter_entries, parse_bool
+from insights.query_service import format_sse
+from insights.renderers import EventStreamRenderer
+from insights.queues import (
+    SOURCE_CREATE,
+    SOURCE_UPDATE,
+    SOURCE_DOCUMENT,
+    SOURCE_REPROCESS,
 )
 
 try:
-    from insights.tasks import extract_insights_task
+    from insights.tasks import enqueue_extraction
 except ImportError:
     # Celery not available, create a mock function
-    def extract_insights_task(entry_id):
+    def enqueue_extraction(entry_id, source=SOURCE_CREATE):
         pass
 
 
+# How often the document events stream re-reads the status
+DOCUMENT_EVENTS_POLL_SECONDS = 1
+
+
+def _provisional_title(content, max_words=5):
+    """Build a quick title from the first words of the content"""
+    words = content.split()
+    title = " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+    return title[:200]
+
+
 class EntryViewSet(viewsets.ModelViewSet):
     serializer_class = EntrySerializer
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        """Return entries for the authenticated user, or all entries if no user"""
+        """Return entries for the authenticated user, or all entries if no user.
+
+        Supports ``has_coordinates`` and ``category_type`` filters. The list
+        returns content previews unless ``full_content=true``.
+        """
         if self.request.user.is_authenticated:
-            return Entry.objects.filter(user=self.request.user)
+            queryset = Entry.objects.filter(user=self.request.user)
         else:
             # For demo purposes, return all entries when not authenticated
-            return Entry.objects.all()
+            queryset = Entry.objects.all()
+        if self._lists_previews():
+            queryset = queryset.previews(getattr(settings, "ENTRY_LIST_PREVIEW_CHARS", 300)).prefetch_related(
+                "documents", "insights__category", "faces"
+            ).select_related("user")
+        return filter_entries(queryset, self.request.query_params)
+
+    def _lists_previews(self):
+        return self.action in ("list", "within") and parse_bool(self.request.query_params.get("full_content")) is not True
 
     def get_serializer_class(self):
         if self.action == "create":
             return EntryCreateSerializer
+        if self._lists_previews():
+            return EntryPreviewSerializer
         return EntrySerializer
 
+    def _queue_extraction(self, entry, source):
+        """Queue insight extraction, falling back to synchronous processing"""
+        try:
+            enqueue_extraction(entry.id, source)
+        except Exception as e:
+            # Do not fail request if background processing isn't available
+            print(f"Skipping insight extraction: {e}")
+            # Try synchronous execution as fallback
+            try:
+                from insights.tasks import extract_insights_sync
+                result = extract_insights_sync(entry.id)
+                if result:
+                    print(f"Successfully processed entry {entry.id} synchronously")
+                else:
+                    print(f"Sync insight extraction failed for entry {entry.id}")
+            except Exception as sync_error:
+                print(f"Sync insight extraction also failed: {sync_error}")
+                # Mark as processed to avoid retry loops; updated in place so
+                # a title the sync run already stored is not overwritten
+                Entry.objects.filter(id=entry.id).update(insights_processed=True)
+            # No task will fill in the title now; keep whichever one it has
+            Entry.objects.filter(id=entry.id, title_pending=True).update(title_pending=False)
+            entry.refresh_from_db(fields=["title", "title_pending", "insights_processed"])
+
     def perform_create(self, serializer):
         """Create entry and trigger insight extraction"""
         # For demo purposes, create a default user if none exists
@@ -48,83 +117,43 @@ class EntryViewSet(viewsets.ModelViewSet):
         else:
             user = self.request.user
 
-        # Generate title if not provided
+        # Save right away with a provisional title; the AI title is filled in
+        # by the background pipeline
         data = serializer.validated_data
-        if not data.get("title"):
-            try:
-                from insights.ai_service import AIInsightExtractor
-
-                extractor = AIInsightExtractor()
-                title_result = extractor.generate_title(data["content"])
-                if title_result:
-                    data["title"] = title_result
-            except Exception as e:
-                print(f"Failed to generate title: {e}")
-                # Use first few words as fallback
-                words = data["content"].split()[:5]
-                data["title"] = " ".join(words) + (
-                    "..." if len(data["content"].split()) > 5 else ""
-                )
+        title_pending = not data.get("title")
+        if title_pending:
+            data["title"] = _provisional_title(data["content"])
 
-        entry = serializer.save(user=user)
+        entry = serializer.save(user=user, title_pending=title_pending)
         # Trigger async insight extraction (robust to missing Celery during CI)
-        try:
-            task = extract_insights_task
-            delay = getattr(task, "delay", None)
-            if callable(delay):
-                delay(entry.id)
-            else:
-                # Fallback to synchronous execution if Celery is not available
-                task(entry.id)
-        except Exception as e:
-            # Do not fail request if background processing isn't available
-            print(f"Skipping insight extraction: {e}")
-            # Try synchronous execution as fallback
-            try:
-                from insights.tasks import extract_insights_sync
-                result = extract_insights_sync(entry.id)
-                if result:
-                    print(f"Successfully processed entry {entry.id} synchronously")
-                else:
-                    print(f"Sync insight extraction failed for entry {entry.id}")
-            except Exception as sync_error:
-                print(f"Sync insight extraction also failed: {sync_error}")
-                # Mark as processed to avoid retry loops
-                entry.insights_processed = True
-                entry.save()
-                
+        self._queue_extraction(entry, SOURCE_CREATE)
         return entry
 
+    def perform_destroy(self, instance):
+        """Delete entry and drop its insights from the sentiment rollups and
+        vector indexes; its documents release their blobs on delete"""
+        with transaction.atomic():
+            removed = rollups.rollup_items(instance.insights.all())
+            insight_ids = list(instance.insights.values_list("id", flat=True))
+            entry_id = instance.id
+            instance.delete()
+            rollups.apply_changes(instance.user_id, removed=removed)
+            vector_index.remove_on_commit(instance.user_id, entry_ids=[entry_id], insight_ids=insight_ids)
+            if instance.geohash:
+                transaction.on_commit(lambda: clusters.invalidate(instance.user_id))
+
     def perform_update(self, serializer):
         """Update entry and re-extract insights if content changed"""
         old_entry = self.get_object()
-        entry = serializer.save()
+        if "title" in serializer.validated_data:
+            # A title set by the user replaces any pending AI title
+            entry = serializer.save(title_pending=False)
+        else:
+            entry = serializer.save()
 
         # Re-extract insights if content changed
         if old_entry.content != entry.content:
-            try:
-                task = extract_insights_task
-                delay = getattr(task, "delay", None)
-                if callable(delay):
-                    delay(entry.id)
-                else:
-                    # Fallback to synchronous execution if Celery is not available
-                    task(entry.id)
-            except Exception as e:
-                print(f"Skipping re-extraction: {e}")
-                # Try synchronous execution as fallback
-                try:
-                    from insights.tasks import extract_insights_sync
-                    result = extract_insights_sync(entry.id)
-                    if result:
-                        print(f"Successfully re-processed entry {entry.id} synchronously")
-                    else:
-                        print(f"Sync re-extraction failed for entry {entry.id}")
-                except Exception as sync_error:
-                    print(f"Sync re-extraction also failed: {sync_error}")
-                    # Mark as processed to avoid retry loops
-                    entry.insights_processed = True
-                    entry.save()
+            self._queue_extraction(entry, SOURCE_UPDATE)
 
     @action(detail=False, methods=["get"])
     def public(self, request):
@@ -174,58 +203,129 @@ class EntryViewSet(viewsets.ModelViewSet):
         serializer = PublicEntrySerializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def within(self, request):
+        """Geotagged entries in a bounding box or within a radius.
+
+        ``bbox=west,south,east,north`` (may cross the antimeridian), or
+        ``lat``, ``lng`` and ``radius_km``; radius results are nearest first
+        with ``distance_km``. The list filters apply as well.
+        """
+        params = request.query_params
+        queryset = self.get_queryset()
+        try:
+            if params.get("bbox"):
+                queryset = queryset.filter(geo.bbox_q(*geo.parse_bbox(params["bbox"])))
+            elif params.get("lat") and params.get("lng") and params.get("radius_km"):
+                latitude, longitude = float(params["lat"]), float(params["lng"])
+                radius_km = float(params["radius_km"])
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and radius_km > 0):
+                    raise ValueError("lat, lng or radius_km is out of range")
+                queryset = (
+                    queryset.filter(geo.bbox_q(*geo.radius_bbox(latitude, longitude, radius_km)))
+                    .annotate(distance_km=geo.distance_km(latitude, longitude))
+                    .filter(distance_km__lte=radius_km)
+                    .order_by("distance_km", "-created_at")
+                )
+            else:
+                raise ValueError("Provide bbox, or lat, lng and radius_km")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer_class = self.get_serializer_class()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        serializer = serializer_class(queryset, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["get"], url_path="clusters")
+    def map_clusters(self, request):
+        """Clusters of the user's geotagged entries (all entries when not
+        authenticated) for a map viewport.
+
+        Takes ``zoom`` and ``bbox=west,south,east,north``; each cluster has
+        its geohash cell, entry count, centroid, average sentiment and the
+        id of one of its entries.
+        """
+        try:
+            zoom = int(request.query_params.get("zoom", ""))
+            if not 0 <= zoom <= clusters.MAX_ZOOM:
+                raise ValueError(f"zoom must be between 0 and {clusters.MAX_ZOOM}")
+            box = geo.parse_bbox(request.query_params.get("bbox", ""))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.is_authenticated:
+            queryset, user_id = Entry.objects.filter(user=request.user), request.user.id
+        else:
+            # For demo purposes, like the list, show everyone's entries
+            queryset, user_id = Entry.objects.all(), None
+        return Response(clusters.clusters(queryset, user_id, zoom, *box))
+
     @action(detail=True, methods=["post"])
     def upload_document(self, request, pk=None):
         """Upload a document to an entry"""
         entry = self.get_object()
         file = request.FILES.get("file")
+        limit = max_upload_bytes()
 
+        if "file" in getattr(request, "upload_rejected", ()) or (file and file.size > limit):
+            return Response(
+                {"error": f"File is larger than {limit} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
         if not file:
             return Response(
                 {"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Extract text and detect type
+        sha256 = getattr(request, "upload_digests", {}).get("file")
+        if not sha256:
+            # Upload handler not installed; hash in chunks instead
+            try:
+                _, sha256 = hash_file(file, limit)
+            except DocumentTooLarge as e:
+                return Response({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # Identical content shares one stored file and its extracted text;
+        # otherwise extraction runs in the background and queues insight
+        # re-extraction once the text is ready. An upload of content that is
+        # already being extracted waits for that result.
         content_type = detect_content_type(file)
-        extracted_text = extract_text_from_file(file)
-
-        document = EntryDocument.objects.create(
-            entry=entry,
-            file=file,
-            filename=file.name,
-            file_size=file.size,
-            content_type=content_type,
-            extracted_text=extracted_text,
-        )
+        with transaction.atomic():
+            blob = blobs.acquire(file, sha256, file.size, content_type)
+            extract = blobs.claim_extraction(blob.pk)
+            blob.refresh_from_db(fields=["extracted_text", "extracted_at"])
+            cached = blob.extracted_at is not None
+            document = EntryDocument.objects.create(
+                entry=entry,
+                file=blob.file.name,
+                blob=blob,
+                filename=file.name,
+                file_size=file.size,
+                content_type=content_type,
+                sha256=sha256,
+                extracted_text=blob.extracted_text if cached else "",
+                extracted_at=timezone.now() if cached else None,
+                extraction_status=EntryDocument.STATUS_READY if cached else EntryDocument.STATUS_PENDING,
+            )
+        if cached:
+            self._queue_extraction(entry, SOURCE_DOCUMENT)
+        elif extract:
+            enqueue_document_extraction(document.id)
 
         serializer = EntryDocumentSerializer(document)
-        # Trigger re-analysis since documents changed
-        try:
-            task = extract_insights_task
-            delay = getattr(task, "delay", None)
-            if callable(delay):
-                delay(entry.id)
-            else:
-                # Fallback to synchronous execution if Celery is not available
-                task(entry.id)
-        except Exception as e:
-            print(f"Skipping re-extraction: {e}")
-            # Try synchronous execution as fallback
-            try:
-                from insights.tasks import extract_insights_sync
-                result = extract_insights_sync(entry.id)
-                if result:
-                    print(f"Successfully re-processed entry {entry.id} synchronously")
-                else:
-                    print(f"Sync re-extraction failed for entry {entry.id}")
-            except Exception as sync_error:
-                print(f"Sync re-extraction also failed: {sync_error}")
-                # Mark as processed to avoid retry loops
-                entry.insights_processed = True
-                entry.save()
-
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=["get"])
+    def documents(self, request, pk=None):
+        """List an entry's documents with their extraction status"""
+        entry = self.get_object()
+        serializer = EntryDocumentSerializer(entry.documents.all(), many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=["delete"], url_path="documents/(?P<doc_id>[^/.]+)")
     def delete_document(self, request, pk=None, doc_id=None):
         """Delete a document from an entry and re-run analysis"""
@@ -235,38 +335,66 @@ class EntryViewSet(viewsets.ModelViewSet):
         except EntryDocument.DoesNotExist:
             return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        # The post_delete signal releases the document's blob
         document.delete()
 
         # Trigger re-analysis
-        try:
-            task = extract_insights_task
-            delay = getattr(task, "delay", None)
-            if callable(delay):
-                delay(entry.id)
-            else:
-                # Fallback to synchronous execution if Celery is not available
-                task(entry.id)
-        except Exception as e:
-            print(f"Skipping re-extraction: {e}")
-            # Try synchronous execution as fallback
-            try:
-                from insights.tasks import extract_insights_sync
-                result = extract_insights_sync(entry.id)
-                if result:
-                    print(f"Successfully re-processed entry {entry.id} synchronously")
-                else:
-                    print(f"Sync re-extraction failed for entry {entry.id}")
-            except Exception as sync_error:
-                print(f"Sync re-extraction also failed: {sync_error}")
-                # Mark as processed to avoid retry loops
-                entry.insights_processed = True
-                entry.save()
+        self._queue_extraction(entry, SOURCE_DOCUMENT)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @delete_document.mapping.get
+    def document_status(self, request, pk=None, doc_id=None):
+        """Get a document, including its extraction status, for polling"""
+        entry = self.get_object()
+        try:
+            document = entry.documents.get(id=doc_id)
+        except EntryDocument.DoesNotExist:
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(EntryDocumentSerializer(document).data)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="documents/(?P<doc_id>[^/.]+)/events",
+        renderer_classes=[JSONRenderer, EventStreamRenderer],
+    )
+    def document_events(self, request, pk=None, doc_id=None):
+        """Server-Sent Events with a document's extraction status.
+
+        Sends a ``status`` event whenever the status changes and closes after
+        ``ready``/``failed`` or ``DOCUMENT_EVENTS_TIMEOUT_SECONDS``.
+        """
+        entry = self.get_object()
+        if not entry.documents.filter(id=doc_id).exists():
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        timeout = getattr(settings, "DOCUMENT_EVENTS_TIMEOUT_SECONDS", 120)
+        terminal = {EntryDocument.STATUS_READY, EntryDocument.STATUS_FAILED}
+
+        def events():
+            deadline = time.monotonic() + timeout
+            last_status = None
+            while True:
+                document = EntryDocument.objects.filter(id=doc_id).first()
+                if document is None:
+                    yield format_sse("error", {"error": "Document not found"})
+                    return
+                if document.extraction_status != last_status:
+                    last_status = document.extraction_status
+                    yield format_sse("status", EntryDocumentSerializer(document).data)
+                if last_status in terminal or time.monotonic() >= deadline:
+                    return
+                time.sleep(DOCUMENT_EVENTS_POLL_SECONDS)
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
     @action(detail=False, methods=["get"])
     def search(self, request):
-        """Search entries by content"""
+        """Search entries by content, or by meaning with ``mode=semantic``"""
         query = request.query_params.get("q", "")
         if not query:
             return Response(
@@ -274,9 +402,14 @@ class EntryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        queryset = self.get_queryset().filter(
-            Q(title__icontains=query) | Q(content__icontains=query)
-        )
+        if request.query_params.get("mode") == "semantic":
+            user_id = request.user.id if request.user.is_authenticated else None
+            hits = vector_index.search_text(vector_index.ENTRIES, user_id, query, k=vector_index.SEARCH_LIMIT)
+            queryset = vector_index.in_rank_order(self.get_queryset(), [pk for pk, _ in hits])
+        else:
+            queryset = self.get_queryset().filter(
+                Q(title__icontains=query) | Q(content__icontains=query)
+            )
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -348,21 +481,11 @@ class EntryViewSet(viewsets.ModelViewSet):
         
         # Trigger insight extraction
         try:
-            task = extract_insights_task
-            delay = getattr(task, "delay", None)
-            if callable(delay):
-                delay(entry.id)
-                return Response(
-                    {"message": "Reprocessing started", "entry_id": entry.id},
-                    status=status.HTTP_200_OK
-                )
-            else:
-                # Fallback to synchronous execution if Celery is not available
-                task(entry.id)
-                return Response(
-                    {"message": "Reprocessing completed synchronously", "entry_id": entry.id},
-                    status=status.HTTP_200_OK
-                )
+            enqueue_extraction(entry.id, SOURCE_REPROCESS)
+            return Response(
+                {"message": "Reprocessing started", "entry_id": entry.id},
+                status=status.HTTP_200_OK
+            )
         except Exception as e:
             # Try synchronous execution as fallback
             try:
@@ -21,11 +21,15 @@ class FaceViewSet(viewsets.ModelViewSet):
         user = request.user if request.user.is_authenticated else None
         if user is None:
             faces = Face.objects.all()
-            serializer = self.get_serializer(faces, many=True)
-            return Response(serializer.data)
+        else:
+            # Most recently subscribed first
+            faces = Face.objects.filter(subscriptions__user=user).order_by("-subscriptions__created_at")
+
+        page = self.paginate_queryset(faces)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
 
-        subs = UserFaceSubscription.objects.filter(user=user).select_related("face")
-        faces = [s.face for s in subs]
         serializer = self.get_serializer(faces, many=True)
         return Response(serializer.data)
 
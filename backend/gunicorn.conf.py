@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+"""
+
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "3"))
+# Threaded workers so long-lived responses (the ai_query event stream) hold a
+# thread rather than a whole worker process
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    """Build the AI clients once per worker process after forking"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mindjourney.settings")
+    try:
+        import django
+
+        django.setup()
+
+        from insights.clients import warm_up
+
+        warm_up()
+    except Exception as e:
+        server.log.warning(f"Could not warm up AI clients: {e}")
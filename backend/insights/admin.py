@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Insight
+from .models import CategorySentiment, Insight
 
 
 @admin.register(Insight)
@@ -15,3 +15,10 @@ class InsightAdmin(admin.ModelAdmin):
     list_filter = ["category", "is_manual_edit", "created_at"]
     search_fields = ["text_snippet", "entry__title", "entry__content"]
     ordering = ["-created_at"]
+
+
+@admin.register(CategorySentiment)
+class CategorySentimentAdmin(admin.ModelAdmin):
+    list_display = ["user", "category", "insight_count", "sentiment_sum", "first_seen", "last_seen"]
+    list_filter = ["user"]
+    search_fields = ["category__name"]
@@ -1,11 +1,12 @@
-import google.generativeai as genai
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from dataclasses import dataclass
-from google.api_core.exceptions import GoogleAPIError
 from django.conf import settings
 from pydantic import BaseModel, Field
+from .chunking import TextChunk, chunk_text
+from .span_resolver import resolve_spans
 
 
 class InsightData(BaseModel):
@@ -36,17 +37,36 @@ class AIInsightExtractor:
     """AI service for extracting insights from diary entries"""
 
     def __init__(self):
+        # Heavy SDK import; deferred until a client is actually built
+        import google.generativeai as genai
+
         # Configure Gemini client
         genai.configure(api_key=settings.GEMINI_API_KEY)
         # Use a strong default model; can be overridden later if needed
         self.model = genai.GenerativeModel("gemini-1.5-flash")
 
     def extract_insights(self, content: str) -> List[InsightData]:
-        """Extract insights from diary entry content"""
+        """Extract insights from diary entry content.
+
+        Long content is split into chunks along paragraph boundaries which are
+        analysed concurrently; positions are mapped back to ``content``.
+        """
         if not settings.GEMINI_API_KEY:
             raise RuntimeError("Gemini API key not configured")
 
-        prompt = self._build_prompt(content)
+        chunk_tokens = getattr(settings, "INSIGHTS_CHUNK_TOKENS", 4000)
+        chunks = chunk_text(content, chunk_tokens)
+        if len(chunks) == 1:
+            return self._merge_insights([self._extract_chunk(chunks[0])])
+
+        concurrency = getattr(settings, "INSIGHTS_CHUNK_CONCURRENCY", 4)
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+            results = list(pool.map(self._extract_chunk, chunks))
+        return self._merge_insights(results)
+
+    def _extract_chunk(self, chunk: TextChunk) -> List[InsightData]:
+        """Extract insights from one chunk, with positions in the full text"""
+        prompt = self._build_prompt(chunk.text)
         # Generate content with Gemini
         response = self.model.generate_content(prompt)
 
@@ -54,10 +74,47 @@ class AIInsightExtractor:
         insights_text = getattr(response, "text", None)
         if not insights_text:
             raise ValueError("Empty response from Gemini API")
-        insights_data = self._parse_insights(insights_text, content)
-
+        insights_data = self._parse_insights(insights_text, chunk.text)
+
+        if chunk.start:
+            insights_data = [
+                insight.model_copy(
+                    update={
+                        "start_position": insight.start_position + chunk.start,
+                        "end_position": insight.end_position + chunk.start,
+                    }
+                )
+                for insight in insights_data
+            ]
         return insights_data
 
+    def _merge_insights(self, results: List[List[InsightData]]) -> List[InsightData]:
+        """Merge per-chunk insights, dropping duplicate mentions.
+
+        An insight duplicates another when both name the same category and
+        either share the snippet with overlapping spans (one mention seen by
+        two chunks) or cover exactly the same span; the most confident one is
+        kept. Repeated mentions at separate offsets are all kept.
+        """
+        kept: List[InsightData] = []
+        candidates = [insight for insights in results for insight in insights]
+        for insight in sorted(candidates, key=lambda i: -i.confidence_score):
+            if not any(self._same_mention(insight, other) for other in kept):
+                kept.append(insight)
+        return sorted(kept, key=lambda i: (i.start_position, -i.confidence_score))
+
+    @staticmethod
+    def _same_mention(a: InsightData, b: InsightData) -> bool:
+        def normalize(text: str) -> str:
+            return " ".join(text.split()).casefold()
+
+        if normalize(a.category_name) != normalize(b.category_name):
+            return False
+        if (a.start_position, a.end_position) == (b.start_position, b.end_position):
+            return True
+        overlap = a.start_position < b.end_position and b.start_position < a.end_position
+        return overlap and normalize(a.text_snippet) == normalize(b.text_snippet)
+
     def generate_title(self, content: str) -> str:
         """Generate a title for diary entry content"""
         if not settings.GEMINI_API_KEY:
@@ -129,21 +186,38 @@ Only include insights that are meaningful and have a confidence score above 0.5.
                 return []
 
             insights_json = json.loads(json_match.group())
-            insights_data = []
+            candidates = []
 
             for insight_dict in insights_json:
                 try:
                     # Validate and create InsightData
-                    insight = InsightData(**insight_dict)
-
-                    # Validate that the text snippet exists in the original content
-                    if insight.text_snippet.lower() in original_content.lower():
-                        insights_data.append(insight)
-
+                    candidates.append(InsightData(**insight_dict))
                 except Exception as e:
                     # Skip invalid insights
                     continue
 
+            # Locate every snippet in one pass; the model's positions are hints
+            spans = resolve_spans(
+                original_content,
+                [(insight.text_snippet, insight.start_position) for insight in candidates],
+            )
+
+            insights_data = []
+            for insight, span in zip(candidates, spans):
+                # Drop snippets that do not exist in the original content
+                if span is None:
+                    continue
+                start, end = span
+                insights_data.append(
+                    insight.model_copy(
+                        update={
+                            "text_snippet": original_content[start:end],
+                            "start_position": start,
+                            "end_position": end,
+                        }
+                    )
+                )
+
             return insights_data
 
         except Exception as e:
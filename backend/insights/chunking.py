@@ -0,0 +1,97 @@
+"""
+Token-aware chunking of long texts along paragraph boundaries
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Rough average for English prose with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class TextChunk:
+    """A contiguous slice of a larger text"""
+
+    text: str
+    # Offset of the first character of ``text`` in the original text
+    start: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate without calling the model tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _split_spans(text: str, start: int, end: int, pattern: re.Pattern) -> List[Tuple[int, int]]:
+    """Split text[start:end] after each separator match, keeping every character"""
+    spans = []
+    position = start
+    for match in pattern.finditer(text, start, end):
+        if match.end() > position:
+            spans.append((position, match.end()))
+            position = match.end()
+    if position < end:
+        spans.append((position, end))
+    return spans
+
+
+def _pieces(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """Break text into spans no longer than max_chars, preferring paragraphs,
+    then sentences, then whitespace, then a hard cut."""
+    pieces = []
+    for start, end in _split_spans(text, 0, len(text), _PARAGRAPH_BREAK):
+        if end - start <= max_chars:
+            pieces.append((start, end))
+            continue
+        for s_start, s_end in _split_spans(text, start, end, _SENTENCE_END):
+            if s_end - s_start <= max_chars:
+                pieces.append((s_start, s_end))
+                continue
+            for w_start, w_end in _split_spans(text, s_start, s_end, _WHITESPACE):
+                while w_end - w_start > max_chars:
+                    pieces.append((w_start, w_start + max_chars))
+                    w_start += max_chars
+                pieces.append((w_start, w_end))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int) -> List[TextChunk]:
+    """Split text into chunks of at most ``max_tokens`` estimated tokens.
+
+    Chunks are contiguous and cover the whole text, so an offset inside a
+    chunk maps back to the original text by adding ``chunk.start``.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return [TextChunk(text=text, start=0)]
+
+    chunks: List[TextChunk] = []
+    chunk_start = chunk_end = 0
+    for start, end in _pieces(text, max_chars):
+        if end - chunk_start > max_chars and chunk_end > chunk_start:
+            chunks.append(TextChunk(text=text[chunk_start:chunk_end], start=chunk_start))
+            chunk_start = start
+        chunk_end = end
+    if chunk_end > chunk_start:
+        chunks.append(TextChunk(text=text[chunk_start:chunk_end], start=chunk_start))
+    return chunks
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, preferring to end on whitespace"""
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = cut.rfind(" ")
+    if boundary > max_chars // 2:
+        cut = cut[:boundary]
+    return cut.rstrip()
@@ -0,0 +1,117 @@
+"""
+Per-process registry of AI model clients.
+
+Building a client runs ``genai.configure`` and creates a ``GenerativeModel``;
+doing that once per process instead of once per call keeps the setup cost out
+of tasks and requests. Clients are rebuilt automatically after a fork, since
+gRPC channels must not be shared between processes.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_clients: Dict[str, object] = {}
+_timings: Dict[str, float] = {}
+_owner_pid = os.getpid()
+
+
+def _build_insight_extractor():
+    from .ai_service import AIInsightExtractor
+
+    return AIInsightExtractor()
+
+
+def _build_geocoding_service():
+    from .geocoding_service import AIGeocodingService
+
+    return AIGeocodingService()
+
+
+def _build_embedder():
+    from .embeddings import build_embedder
+
+    return build_embedder()
+
+
+_FACTORIES: Dict[str, Callable[[], object]] = {
+    "insight_extractor": _build_insight_extractor,
+    "geocoding_service": _build_geocoding_service,
+    "embedder": _build_embedder,
+}
+
+
+def _get(name: str):
+    global _owner_pid
+    client = _clients.get(name)
+    if client is not None and _owner_pid == os.getpid():
+        return client
+
+    with _lock:
+        if _owner_pid != os.getpid():
+            # Inherited from the parent process; build fresh clients here
+            _clients.clear()
+            _timings.clear()
+            _owner_pid = os.getpid()
+        client = _clients.get(name)
+        if client is None:
+            started = time.perf_counter()
+            client = _FACTORIES[name]()
+            _timings[name] = time.perf_counter() - started
+            _clients[name] = client
+        return client
+
+
+def get_insight_extractor():
+    """Shared ``AIInsightExtractor`` for this process"""
+    return _get("insight_extractor")
+
+
+def get_geocoding_service():
+    """Shared ``AIGeocodingService`` for this process"""
+    return _get("geocoding_service")
+
+
+def get_embedder():
+    """Shared text embedder for this process (None without NumPy)"""
+    return _get("embedder")
+
+
+def warm_up() -> Dict[str, float]:
+    """Import the SDK and build every client; returns seconds spent per step"""
+    started = time.perf_counter()
+    try:
+        import google.generativeai  # noqa: F401
+    except Exception as e:
+        logger.warning(f"Gemini SDK not available for warm-up: {e}")
+    import_seconds = time.perf_counter() - started
+
+    for name in _FACTORIES:
+        try:
+            _get(name)
+        except Exception as e:
+            logger.warning(f"Failed to warm up {name}: {e}")
+
+    timings = {"sdk_import": import_seconds, **client_timings()}
+    logger.info(
+        f"Warmed AI clients in process {os.getpid()}: "
+        + ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items())
+    )
+    return timings
+
+
+def client_timings() -> Dict[str, float]:
+    """Seconds it took to build each client in this process"""
+    return dict(_timings)
+
+
+def reset() -> None:
+    """Drop all clients so the next call rebuilds them"""
+    with _lock:
+        _clients.clear()
+        _timings.clear()
@@ -0,0 +1,118 @@
+"""
+Token-budgeted context for ai_query answers.
+
+Matched entries are split into passages, each passage is scored by keyword
+hits and by the insights whose spans fall inside it, and the best passages are
+packed into the budget. The selected passages are rendered compactly, grouped
+under a one-line header per entry in retrieval order.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+from django.conf import settings
+
+from .chunking import chunk_text, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Passage size when splitting entry content
+PASSAGE_TOKENS = 120
+KEYWORD_WEIGHT = 2.0
+INSIGHT_WEIGHT = 1.0
+# Small bonus for entries the retrieval step ranked higher
+RANK_WEIGHT = 0.5
+PASSAGE_SEPARATOR = " … "
+
+
+@dataclass
+class Passage:
+    entry_rank: int
+    start: int
+    text: str
+    score: float
+    tokens: int
+
+
+@dataclass
+class AnswerContext:
+    """Rendered context plus what went into it"""
+
+    text: str
+    tokens: int
+    passages: int
+    entries: int
+    truncated: bool = False
+    entry_ids: List[int] = field(default_factory=list)
+
+
+def _entry_header(number: int, entry) -> str:
+    parts = [f"[{number}] {entry.created_at:%Y-%m-%d}", entry.title or "Untitled Entry"]
+    if entry.overall_sentiment is not None:
+        parts.append(f"sentiment {entry.overall_sentiment:+.2f}")
+    if entry.location_name:
+        parts.append(entry.location_name)
+    return " | ".join(parts)
+
+
+def _passages(entry_rank: int, entry, keywords: Sequence[str], entry_count: int) -> List[Passage]:
+    content = entry.content or ""
+    spans = [(insight.start_position, insight.end_position) for insight in entry.insights.all()]
+    rank_bonus = RANK_WEIGHT * (entry_count - entry_rank) / max(entry_count, 1)
+
+    passages = []
+    for chunk in chunk_text(content, PASSAGE_TOKENS):
+        text = chunk.text.strip()
+        if not text:
+            continue
+        end = chunk.start + len(chunk.text)
+        lowered = text.lower()
+        keyword_hits = sum(lowered.count(keyword) for keyword in keywords)
+        insight_hits = sum(1 for start, stop in spans if start < end and stop > chunk.start)
+        score = keyword_hits * KEYWORD_WEIGHT + insight_hits * INSIGHT_WEIGHT + rank_bonus
+        passages.append(Passage(entry_rank, chunk.start, text, score, estimate_tokens(text)))
+    return passages
+
+
+def build_context(entries, keywords: Sequence[str] = (), token_budget: int = None) -> AnswerContext:
+    """Pack the most relevant passages of the entries into ``token_budget``"""
+    if token_budget is None:
+        token_budget = getattr(settings, "INSIGHTS_QUERY_CONTEXT_TOKENS", 3000)
+    entries = list(entries)
+    keywords = [str(keyword).lower() for keyword in keywords or [] if str(keyword).strip()]
+
+    headers = [_entry_header(number, entry) for number, entry in enumerate(entries, start=1)]
+    candidates = []
+    for rank, entry in enumerate(entries):
+        candidates.extend(_passages(rank, entry, keywords, len(entries)))
+    # Best score first; ties go to higher-ranked entries and earlier passages
+    candidates.sort(key=lambda p: (-p.score, p.entry_rank, p.start))
+
+    used = 0
+    selected = {}
+    truncated = False
+    for passage in candidates:
+        cost = passage.tokens
+        if passage.entry_rank not in selected:
+            cost += estimate_tokens(headers[passage.entry_rank]) + 1
+        if used + cost > token_budget:
+            truncated = True
+            continue
+        used += cost
+        selected.setdefault(passage.entry_rank, []).append(passage)
+
+    blocks = []
+    for rank in sorted(selected):
+        passages = sorted(selected[rank], key=lambda p: p.start)
+        blocks.append(headers[rank] + "\n" + PASSAGE_SEPARATOR.join(p.text for p in passages))
+    text = "\n\n".join(blocks)
+
+    return AnswerContext(
+        text=text,
+        tokens=estimate_tokens(text),
+        passages=sum(len(passages) for passages in selected.values()),
+        entries=len(selected),
+        truncated=truncated,
+        entry_ids=[entries[rank].pk for rank in sorted(selected)],
+    )
@@ -0,0 +1,110 @@
+"""
+Pluggable text embedders for semantic search.
+
+``INSIGHTS_EMBEDDER`` selects the implementation by dotted path. The default
+``HashingEmbedder`` runs locally without network access; ``GeminiEmbedder``
+uses the Gemini embedding API.
+"""
+
+import math
+import re
+import zlib
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Semantic search is disabled without NumPy
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class BaseEmbedder:
+    """Turns texts into L2-normalised float32 vectors"""
+
+    name = "base"
+    dimension = 0
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        raise NotImplementedError
+
+
+class HashingEmbedder(BaseEmbedder):
+    """Offline embedder hashing word unigrams and bigrams into a fixed space.
+
+    Term frequencies are log-scaled and the sign of each feature comes from the
+    hash, which keeps collisions from systematically inflating similarity.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _features(self, text: str) -> List[str]:
+        tokens = [token.casefold() for token in _TOKEN.findall(text or "")]
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                hashed = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                vectors[row, hashed % self.dimension] += sign * (1.0 + math.log(count))
+        return normalize(vectors)
+
+
+class GeminiEmbedder(BaseEmbedder):
+    """Embeddings from the Gemini API"""
+
+    name = "gemini"
+
+    def __init__(self, model: str = "models/text-embedding-004", dimension: int = 768):
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self._genai = genai
+        self.model = model
+        self.dimension = dimension
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        result = self._genai.embed_content(model=self.model, content=list(texts))
+        return normalize(np.asarray(result["embedding"], dtype=np.float32).reshape(len(texts), -1))
+
+
+def normalize(vectors: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def build_embedder() -> Optional[BaseEmbedder]:
+    """Instantiate the configured embedder, or None when NumPy is missing"""
+    if np is None:
+        return None
+    path = getattr(settings, "INSIGHTS_EMBEDDER", "insights.embeddings.HashingEmbedder")
+    return import_string(path)()
+
+
+def encode_vector(vector: "np.ndarray") -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_vector(data) -> Optional["np.ndarray"]:
+    if not data:
+        return None
+    return np.frombuffer(bytes(data), dtype=np.float32)
+
+
+def entry_text(entry) -> str:
+    """Text of an entry used for its embedding"""
+    return f"{entry.title}\n{entry.content}" if entry.title else entry.content
@@ -0,0 +1,72 @@
+"""
+Query-string filters shared by the insight and entry list endpoints
+"""
+
+from django.db.models import Exists, OuterRef, Q
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+def parse_bool(value):
+    """``True``/``False`` for recognised query-string values, otherwise None"""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return None
+
+
+def _coordinates_q(prefix=""):
+    return Q(**{f"{prefix}latitude__isnull": False, f"{prefix}longitude__isnull": False})
+
+
+def filter_insights(queryset, params):
+    """Apply ``category_type``, ``category_id`` and ``has_coordinates`` (of the entry)"""
+    category_type = params.get("category_type")
+    if category_type:
+        queryset = queryset.filter(category__category_type=category_type)
+    category_id = params.get("category_id")
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+    has_coordinates = parse_bool(params.get("has_coordinates"))
+    if has_coordinates is True:
+        queryset = queryset.filter(_coordinates_q("entry__"))
+    elif has_coordinates is False:
+        queryset = queryset.exclude(_coordinates_q("entry__"))
+    return queryset
+
+
+def filter_entries(queryset, params):
+    """Apply ``has_coordinates``, ``category_type`` (entries with such an insight),
+    ``without_category_type`` (entries with none) and ``min_sentiment``/``max_sentiment``"""
+    has_coordinates = parse_bool(params.get("has_coordinates"))
+    if has_coordinates is True:
+        queryset = queryset.filter(_coordinates_q())
+    elif has_coordinates is False:
+        queryset = queryset.exclude(_coordinates_q())
+    category_type = params.get("category_type")
+    if category_type:
+        from .models import Insight
+
+        queryset = queryset.filter(
+            Exists(Insight.objects.filter(entry=OuterRef("pk"), category__category_type=category_type))
+        )
+    without_category_type = params.get("without_category_type")
+    if without_category_type:
+        from .models import Insight
+
+        queryset = queryset.exclude(
+            Exists(Insight.objects.filter(entry=OuterRef("pk"), category__category_type=without_category_type))
+        )
+    for param, lookup in (("min_sentiment", "gte"), ("max_sentiment", "lte")):
+        value = params.get(param)
+        if value:
+            try:
+                queryset = queryset.filter(**{f"overall_sentiment__{lookup}": float(value)})
+            except ValueError:
+                pass
+    return queryset
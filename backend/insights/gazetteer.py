@@ -0,0 +1,283 @@
+"""
+Offline gazetteer: the first geocoding tier, ahead of the model.
+
+A GeoNames-style dump (``cities500.txt`` and similar, optionally with
+``countryInfo.txt`` and ``admin1CodesASCII.txt`` for country and region
+names) is loaded by ``load_gazetteer`` into a read-only SQLite file. Every place name and alternate name is stored under a normalized key
+(accents stripped, casefolded, punctuation removed); the B-tree on
+``(key, population)`` serves exact lookups and prefix ranges, ranked by
+population.
+
+A name resolves locally when it is unambiguous: a country or region in the
+query narrows the candidates, otherwise the most populous candidate must
+outnumber the next by ``GEOCODING_GAZETTEER_DOMINANCE``. Everything else
+(unknown names, several similar-sized places) is left to the model.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE places (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    country TEXT NOT NULL,
+    admin1 TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    population INTEGER NOT NULL
+);
+CREATE TABLE names (
+    key TEXT NOT NULL,
+    population INTEGER NOT NULL,
+    place_id INTEGER NOT NULL,
+    PRIMARY KEY (key, population, place_id)
+) WITHOUT ROWID;
+CREATE TABLE countries (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE qualifiers (
+    key TEXT NOT NULL,
+    country TEXT NOT NULL,
+    admin1 TEXT NOT NULL,
+    PRIMARY KEY (key, country, admin1)
+) WITHOUT ROWID;
+"""
+
+# Lookups kept per process; the cache is dropped when the file changes
+LOOKUP_CACHE_SIZE = 10000
+CANDIDATE_LIMIT = 20
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Key for a place name: no accents or punctuation, casefolded, single spaces"""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    stripped = _PUNCTUATION.sub(" ", stripped.casefold())
+    return _WHITESPACE.sub(" ", stripped).strip()
+
+
+@dataclass(frozen=True)
+class Place:
+    id: int
+    name: str
+    country: str
+    admin1: str
+    latitude: float
+    longitude: float
+    population: int
+
+    @property
+    def full_name(self) -> str:
+        return ", ".join(part for part in (self.name, self.country_name) if part)
+
+    @property
+    def country_name(self) -> str:
+        return _country_name(self.country)
+
+
+def gazetteer_path() -> str:
+    return getattr(settings, "GEOCODING_GAZETTEER_PATH", "")
+
+
+_local = threading.local()
+_state_lock = threading.Lock()
+_loaded_version: Optional[tuple] = None
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    """Read-only connection for this thread, reopened when the file is replaced"""
+    global _loaded_version
+    path = gazetteer_path()
+    try:
+        version = (path, os.stat(path).st_mtime_ns)
+    except (OSError, TypeError, ValueError):
+        return None
+    with _state_lock:
+        if _loaded_version != version:
+            _loaded_version = version
+            _lookup.cache_clear()
+            _country_name.cache_clear()
+    connection = getattr(_local, "connection", None)
+    if connection is None or getattr(_local, "version", None) != version:
+        if connection is not None:
+            connection.close()
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        _local.connection, _local.version = connection, version
+    return connection
+
+
+def available() -> bool:
+    return _connection() is not None
+
+
+@lru_cache(maxsize=512)
+def _country_name(code: str) -> str:
+    connection = _connection()
+    if connection is None or not code:
+        return code
+    row = connection.execute("SELECT name FROM countries WHERE code = ?", (code,)).fetchone()
+    return row[0] if row else code
+
+
+def _candidates(connection, key: str) -> List[Place]:
+    rows = connection.execute(
+        "SELECT p.id, p.name, p.country, p.admin1, p.latitude, p.longitude, p.population "
+        "FROM names n JOIN places p ON p.id = n.place_id "
+        "WHERE n.key = ? ORDER BY n.population DESC LIMIT ?",
+        (key, CANDIDATE_LIMIT),
+    ).fetchall()
+    seen = set()
+    places = []
+    for row in rows:
+        if row[0] not in seen:
+            seen.add(row[0])
+            places.append(Place(*row))
+    return places
+
+
+def _regions(connection, qualifiers: Iterable[str]) -> Optional[set]:
+    """``(country, admin1)`` pairs named by ``qualifiers`` (admin1 is "" for a
+    whole country), or None if any qualifier is not a known country or region"""
+    regions = set()
+    for qualifier in qualifiers:
+        key = normalize_name(qualifier)
+        if not key:
+            continue
+        rows = connection.execute("SELECT country, admin1 FROM qualifiers WHERE key = ?", (key,)).fetchall()
+        if not rows:
+            return None
+        regions.update(rows)
+    return regions
+
+
+def _in_regions(place: Place, regions: set) -> bool:
+    return (place.country, "") in regions or (place.country, place.admin1) in regions
+
+
+def _split(place_name: str, context: str) -> Tuple[str, List[str]]:
+    """``"Paris, France"`` → ``("paris", ["France"])``; context adds qualifiers"""
+    parts = [p.strip() for p in (place_name or "").split(",") if p.strip()]
+    if not parts:
+        return "", []
+    qualifiers = parts[1:] + [p.strip() for p in (context or "").split(",") if p.strip()]
+    return normalize_name(parts[0]), qualifiers
+
+
+@lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _lookup(key: str, qualifiers: Tuple[str, ...]) -> Optional[Place]:
+    connection = _connection()
+    if connection is None:
+        return None
+    candidates = _candidates(connection, key)
+    if not candidates:
+        return None
+
+    regions = _regions(connection, qualifiers)
+    if regions is None:
+        # e.g. "Paris, Texas" without region names loaded, or free-text context
+        return None
+    if regions:
+        # Context naming another country or region means none of these
+        candidates = [p for p in candidates if _in_regions(p, regions)]
+        if not candidates:
+            return None
+
+    top = candidates[0]
+    if len(candidates) == 1:
+        return top
+    dominance = getattr(settings, "GEOCODING_GAZETTEER_DOMINANCE", 10.0)
+    runner_up = max(candidates[1].population, 1)
+    return top if top.population >= dominance * runner_up else None
+
+
+def lookup(place_name: str, context: str = "") -> Optional[Place]:
+    """The place a name unambiguously refers to, or None to ask the model"""
+    key, qualifiers = _split(place_name, context)
+    if not key:
+        return None
+    try:
+        return _lookup(key, tuple(qualifiers))
+    except sqlite3.Error as e:
+        logger.warning(f"Gazetteer lookup failed for '{place_name}': {e}")
+        return None
+
+
+def suggest(prefix: str, limit: int = 10) -> List[Place]:
+    """Most populous places with a name starting with ``prefix``"""
+    connection = _connection()
+    key = normalize_name(prefix)
+    if connection is None or not key:
+        return []
+    # Range scan on the key index: every key in [prefix, prefix + U+10FFFF)
+    rows = connection.execute(
+        "SELECT p.id, p.name, p.country, p.admin1, p.latitude, p.longitude, p.population "
+        "FROM names n JOIN places p ON p.id = n.place_id "
+        "WHERE n.key >= ? AND n.key < ? GROUP BY p.id ORDER BY MAX(n.population) DESC LIMIT ?",
+        (key, key + "\U0010ffff", limit),
+    ).fetchall()
+    return [Place(*row) for row in rows]
+
+
+def build(path: str, places: Iterable[tuple], countries: Iterable[tuple] = (), regions: Iterable[tuple] = ()) -> int:
+    """Write a gazetteer file and return the number of places.
+
+    ``places`` are ``(id, name, alternate names, country, admin1, latitude,
+    longitude, population)``, ``countries`` are ``(code, name, alternate
+    names)`` and ``regions`` are ``(country, admin1, name)``.
+
+    The file is built next to ``path`` and moved into place, so readers
+    never see a partial gazetteer.
+    """
+    temporary = f"{path}.building"
+    if os.path.exists(temporary):
+        os.unlink(temporary)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(temporary)
+    count = 0
+    try:
+        connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+        for code, name, alternates in countries:
+            connection.execute("INSERT OR REPLACE INTO countries VALUES (?, ?)", (code, name))
+            for qualifier in {code, name, *alternates}:
+                key = normalize_name(qualifier)
+                if key:
+                    connection.execute("INSERT OR IGNORE INTO qualifiers VALUES (?, ?, '')", (key, code))
+        for country, admin1, name in regions:
+            key = normalize_name(name)
+            if key:
+                connection.execute("INSERT OR IGNORE INTO qualifiers VALUES (?, ?, ?)", (key, country, admin1))
+
+        batch_places, batch_names = [], []
+        for place_id, name, alternates, country, admin1, latitude, longitude, population in places:
+            batch_places.append((place_id, name, country, admin1, latitude, longitude, population))
+            keys = {normalize_name(n) for n in (name, *alternates)}
+            batch_names.extend((key, population, place_id) for key in keys if key)
+            count += 1
+            if len(batch_places) >= 10000:
+                connection.executemany("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?)", batch_places)
+                connection.executemany("INSERT OR IGNORE INTO names VALUES (?, ?, ?)", batch_names)
+                batch_places, batch_names = [], []
+        connection.executemany("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?)", batch_places)
+        connection.executemany("INSERT OR IGNORE INTO names VALUES (?, ?, ?)", batch_names)
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    os.replace(temporary, path)
+    return count
@@ -5,10 +5,13 @@ AI-powered geocoding service for converting place names to coordinates
 import json
 import re
 from typing import Optional, Tuple, List, Dict, Any
-import google.generativeai as genai
 from django.conf import settings
 
 import logging
+
+from . import gazetteer
+
+
 class AIGeocodingService:
     """AI service for geocoding place names to coordinates"""
 
@@ -19,6 +22,9 @@ class AIGeocodingService:
                 self.model = None
                 return
 
+            # Heavy SDK import; deferred until a client is actually built
+            import google.generativeai as genai
+
             genai.configure(api_key=settings.GEMINI_API_KEY)
             self.model = genai.GenerativeModel("gemini-1.5-flash")
         except Exception as e:
@@ -29,7 +35,10 @@ class AIGeocodingService:
         self, place_name: str, context: str = ""
     ) -> Tuple[float, float, str] | None:
         """
-        Convert a place name to latitude/longitude coordinates using AI
+        Convert a place name to latitude/longitude coordinates.
+
+        The offline gazetteer answers first; the model is only asked about
+        names it does not know or cannot resolve unambiguously.
 
         Args:
             place_name: The name of the place to geocode
@@ -39,6 +48,11 @@ class AIGeocodingService:
             Result containing (latitude, longitude, full_place_name) or error message
         """
         logger = logging.getLogger(__name__)
+        place = gazetteer.lookup(place_name, context)
+        if place is not None:
+            logger.debug("Gazetteer resolved %s to %s", place_name, place.full_name)
+            return (place.latitude, place.longitude, place.full_name)
+
         if not self.model:
             raise RuntimeError("Gemini API not configured for geocoding")
 
@@ -0,0 +1,135 @@
+import json
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from categories.models import Category
+from entries.models import Entry
+from insights import places
+from insights.models import Insight
+
+
+class Command(BaseCommand):
+    help = 'Geocode the place insights of entries without coordinates, resumably and without re-extracting insights'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Entries handled per batch and checkpoint (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Place names geocoded concurrently (default: 4)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Stop after this many entries (default: no limit)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.MEDIA_ROOT, 'geocoding_backfill.json'),
+            help='File recording the last entry handled, to resume from',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and start from the first entry',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint']
+        state = {'last_entry_id': 0, 'entries': 0, 'located': 0}
+        if not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                state.update(json.load(f))
+            self.stdout.write(f"Resuming after entry {state['last_entry_id']}")
+
+        place_insights = Insight.objects.filter(entry=OuterRef('pk'), category__category_type='place')
+        candidates = Entry.objects.filter(latitude__isnull=True).filter(Exists(place_insights)).order_by('id')
+        total = candidates.filter(id__gt=state['last_entry_id']).count()
+        if options['limit']:
+            total = min(total, options['limit'])
+        self.stdout.write(f"{total} entries with place insights and no coordinates")
+
+        done = located = 0
+        totals = {'located': 0, 'cached_misses': 0, 'misses': 0, 'errors': 0}
+        started = time.monotonic()
+        while done < total:
+            size = min(options['batch_size'], total - done)
+            ids = list(candidates.filter(id__gt=state['last_entry_id']).values_list('id', flat=True)[:size])
+            if not ids:
+                break
+
+            stats, batch_located = self._process(ids, options['workers'])
+            for key, value in stats.items():
+                totals[key] += value
+            done += len(ids)
+            located += batch_located
+            state['last_entry_id'] = ids[-1]
+            state['entries'] += len(ids)
+            state['located'] += batch_located
+            self._save_checkpoint(checkpoint_path, state)
+
+            rate = done / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f"{done}/{total} entries, {located} located; places geocoded {totals['located']}, "
+                f"unresolved {totals['misses']} (+{totals['cached_misses']} cached), errors {totals['errors']}; "
+                f"{rate:.1f} entries/s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Located {located} of {done} entries (checkpoint: {checkpoint_path})")
+        )
+        if totals['errors']:
+            self.stdout.write(
+                self.style.WARNING(f"{totals['errors']} place names failed; run again with --restart to retry their entries")
+            )
+
+    def _process(self, ids, workers):
+        """Geocode the batch's unlocated places, then give each entry its best located place"""
+        rows = list(
+            Insight.objects.filter(entry_id__in=ids, category__category_type='place')
+            .order_by('entry_id', '-confidence_score', 'start_position')
+            .values_list('entry_id', 'category_id', 'category__name', 'category__latitude')
+        )
+        unlocated = {category_id: name for _, category_id, name, latitude in rows if latitude is None}
+        stats = places.geocode_categories(unlocated, workers) if unlocated else {}
+
+        locations = {}
+        for category in Category.objects.filter(
+            pk__in={row[1] for row in rows}, latitude__isnull=False
+        ).only('id', 'latitude', 'longitude', 'location_name'):
+            locations[category.id] = category
+        best = {}
+        for entry_id, category_id, _, _ in rows:
+            if entry_id not in best and category_id in locations:
+                best[entry_id] = locations[category_id]
+
+        saved = 0
+        with transaction.atomic():
+            entries = Entry.objects.filter(id__in=best, latitude__isnull=True).only(
+                'id', 'user_id', 'latitude', 'longitude', 'location_name', 'geohash', 'overall_sentiment'
+            )
+            for entry in entries:
+                place = best[entry.id]
+                entry.latitude, entry.longitude = place.latitude, place.longitude
+                entry.location_name = place.location_name
+                # save() keeps the geohash and the map clusters in step
+                entry.save(update_fields=['latitude', 'longitude', 'location_name'])
+                saved += 1
+        return stats, saved
+
+    def _save_checkpoint(self, path, state):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+        os.replace(temporary, path)
@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand
+from insights import clients
+
+
+class Command(BaseCommand):
+    help = 'Measure SDK import, client construction and per-call setup cost with and without the client registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--calls',
+            type=int,
+            default=20,
+            help='Number of simulated calls to average over',
+        )
+
+    def handle(self, *args, **options):
+        calls = options['calls']
+
+        started = time.perf_counter()
+        import google.generativeai  # noqa: F401
+        self.stdout.write(f"google.generativeai import: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        from insights.ai_service import AIInsightExtractor
+        from insights.geocoding_service import AIGeocodingService
+
+        for name, factory, registry_getter in (
+            ("AIInsightExtractor", AIInsightExtractor, clients.get_insight_extractor),
+            ("AIGeocodingService", AIGeocodingService, clients.get_geocoding_service),
+        ):
+            try:
+                started = time.perf_counter()
+                for _ in range(calls):
+                    factory()
+                per_call_new = (time.perf_counter() - started) / calls
+
+                clients.reset()
+                registry_getter()
+                started = time.perf_counter()
+                for _ in range(calls):
+                    registry_getter()
+                per_call_registry = (time.perf_counter() - started) / calls
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{name}: {e}"))
+                continue
+
+            self.stdout.write(
+                f"{name}: new instance per call {per_call_new * 1000:.3f}ms, "
+                f"registry {per_call_registry * 1000:.3f}ms"
+            )
+
+        clients.reset()
+        timings = clients.warm_up()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Warm-up: " + ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items())
+            )
+        )
@@ -0,0 +1,131 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+from categories.models import Category
+from entries.models import Entry
+from insights.models import Insight
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _QueryCounter:
+    """Counts executed queries; unlike connection.queries it is not reset per request"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return self.count
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-insight entries_by_category loop with the paginated subquery version on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--insights',
+            type=int,
+            default=50000,
+            help='Insights to create for the benchmark user (default: 50000)',
+        )
+        parser.add_argument(
+            '--insights-per-entry',
+            type=int,
+            default=10,
+            help='Insights attached to each synthetic entry (default: 10)',
+        )
+        parser.add_argument(
+            '--skip-legacy',
+            action='store_true',
+            help='Do not time the old one-query-per-insight loop',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                # Never keep the synthetic data
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        total = options['insights']
+        per_entry = max(1, options['insights_per_entry'])
+
+        self.stdout.write(f"Creating {total} insights...")
+        user = User.objects.create(username=f"benchmark-{time.time_ns()}")
+        categories = [
+            Category.objects.get_or_create(name=f"Benchmark place {i}", category_type='place')[0]
+            for i in range(per_entry)
+        ]
+        entries = Entry.objects.bulk_create(
+            [
+                Entry(user=user, title=f"Benchmark {i}", content="Synthetic entry", insights_processed=True)
+                for i in range((total + per_entry - 1) // per_entry)
+            ],
+            batch_size=1000,
+        )
+        Insight.objects.bulk_create(
+            [
+                Insight(
+                    entry=entries[i // per_entry],
+                    category=categories[i % per_entry],
+                    text_snippet="Synthetic",
+                    sentiment_score=0.0,
+                    confidence_score=1.0,
+                    start_position=i % per_entry,
+                    end_position=i % per_entry + 1,
+                )
+                for i in range(total)
+            ],
+            batch_size=1000,
+        )
+
+        if not options['skip_legacy']:
+            queries = _QueryCounter()
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                matched = set()
+                for insight in Insight.objects.filter(
+                    entry__user=user, category__category_type='place'
+                ):
+                    matched.add(insight.entry)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Legacy loop: {len(matched)} entries, {len(queries)} queries, {elapsed * 1000:.0f}ms "
+                "(before serialization)"
+            )
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        url = '/api/insights/entries_by_category/'
+        queries = _QueryCounter()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            response = client.get(url, {'category_type': 'place'})
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            self.stdout.write(self.style.ERROR(f"Request failed: {response.status_code}"))
+            return
+        data = response.json()
+        self.stdout.write(
+            f"Subquery + cursor page: {len(data['results'])} entries, {len(queries)} queries, "
+            f"{elapsed * 1000:.0f}ms (serialized)"
+        )
+
+        queries = _QueryCounter()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            client.get(data['next'])
+            elapsed = time.perf_counter() - started
+        self.stdout.write(f"Next page: {len(queries)} queries, {elapsed * 1000:.0f}ms")
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (synthetic data rolled back)'))
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from entries.models import Entry
+from insights.models import Insight
+from insights import vector_index
+from insights.clients import get_embedder
+from insights.embeddings import encode_vector, entry_text
+
+
+class Command(BaseCommand):
+    help = 'Embed entries and insights missing vectors and rebuild the semantic search indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-embed everything, e.g. after changing INSIGHTS_EMBEDDER',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=64,
+            help='Texts embedded per batch (default: 64)',
+        )
+
+    def handle(self, *args, **options):
+        embedder = get_embedder()
+        if embedder is None:
+            self.stdout.write(self.style.ERROR('No embedder available (is NumPy installed?)'))
+            return
+
+        entries = Entry.objects.all()
+        insights = Insight.objects.all()
+        if not options['all']:
+            entries = entries.filter(embedding__isnull=True)
+            insights = insights.filter(embedding__isnull=True)
+
+        batch_size = options['batch_size']
+        embedded_entries = self._embed(
+            embedder, entries.only('id', 'title', 'content'), entry_text, Entry, batch_size
+        )
+        embedded_insights = self._embed(
+            embedder, insights.only('id', 'text_snippet'), lambda i: i.text_snippet, Insight, batch_size
+        )
+        self.stdout.write(f"Embedded {embedded_entries} entries and {embedded_insights} insights")
+
+        user_ids = Entry.objects.order_by().values_list('user_id', flat=True).distinct()
+        for user_id in user_ids:
+            for namespace in (vector_index.ENTRIES, vector_index.INSIGHTS):
+                vector_index.drop_index(namespace, user_id)
+                index = vector_index.get_index(namespace, user_id)
+                self.stdout.write(f"User {user_id} {namespace}: {len(index)} vectors")
+
+        # The index over every user is rebuilt by the first search that needs it
+        for namespace in (vector_index.ENTRIES, vector_index.INSIGHTS):
+            vector_index.drop_index(namespace, None)
+
+        self.stdout.write(self.style.SUCCESS('Vector indexes rebuilt'))
+
+    def _embed(self, embedder, queryset, text_of, model, batch_size):
+        count = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                count += self._flush(embedder, batch, text_of, model)
+                batch = []
+        if batch:
+            count += self._flush(embedder, batch, text_of, model)
+        return count
+
+    def _flush(self, embedder, batch, text_of, model):
+        vectors = embedder.embed([text_of(obj) for obj in batch])
+        for obj, vector in zip(batch, vectors):
+            obj.embedding = encode_vector(vector)
+        model.objects.bulk_update(batch, ['embedding'])
+        return len(batch)
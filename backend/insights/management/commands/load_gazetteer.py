@@ -0,0 +1,107 @@
+import io
+import os
+import time
+import zipfile
+from django.core.management.base import BaseCommand, CommandError
+from insights import gazetteer
+
+
+def _lines(path):
+    """Text lines of a GeoNames file, reading the first .txt member of a zip"""
+    if path.endswith('.zip'):
+        archive = zipfile.ZipFile(path)
+        member = next((n for n in archive.namelist() if n.endswith('.txt')), None)
+        if member is None:
+            raise CommandError(f"No .txt file in {path}")
+        with archive, archive.open(member) as raw:
+            yield from io.TextIOWrapper(raw, encoding='utf-8')
+        return
+    with open(path, encoding='utf-8') as handle:
+        yield from handle
+
+
+def _places(path, min_population):
+    for line in _lines(path):
+        columns = line.rstrip('\n').split('\t')
+        if len(columns) < 15 or line.startswith('#'):
+            continue
+        population = int(columns[14] or 0)
+        if population < min_population:
+            continue
+        alternates = [name for name in columns[3].split(',') if name] if columns[3] else []
+        yield (
+            int(columns[0]),
+            columns[1],
+            [columns[2], *alternates],
+            columns[8],
+            columns[10],
+            float(columns[4]),
+            float(columns[5]),
+            population,
+        )
+
+
+def _countries(path):
+    for line in _lines(path):
+        columns = line.rstrip('\n').split('\t')
+        if line.startswith('#') or len(columns) < 5:
+            continue
+        yield columns[0], columns[4], [columns[1]]
+
+
+def _regions(path):
+    for line in _lines(path):
+        columns = line.rstrip('\n').split('\t')
+        if len(columns) < 3 or '.' not in columns[0]:
+            continue
+        country, admin1 = columns[0].split('.', 1)
+        yield country, admin1, columns[1]
+        if columns[2] != columns[1]:
+            yield country, admin1, columns[2]
+
+
+class Command(BaseCommand):
+    help = 'Import a GeoNames cities dump (e.g. cities500.zip) into the offline gazetteer used before the geocoding model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cities', help='GeoNames cities file (.txt or .zip)')
+        parser.add_argument(
+            '--countries',
+            help='GeoNames countryInfo.txt, to resolve country names such as "Paris, France"',
+        )
+        parser.add_argument(
+            '--admin1',
+            help='GeoNames admin1CodesASCII.txt, to resolve region names such as "Springfield, Illinois"',
+        )
+        parser.add_argument(
+            '--min-population',
+            type=int,
+            default=0,
+            help='Skip places with fewer inhabitants (default: 0)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Gazetteer file to write (default: GEOCODING_GAZETTEER_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or gazetteer.gazetteer_path()
+        if not output:
+            raise CommandError('Set GEOCODING_GAZETTEER_PATH or pass --output')
+        for key in ('cities', 'countries', 'admin1'):
+            if options[key] and not os.path.exists(options[key]):
+                raise CommandError(f"File not found: {options[key]}")
+
+        started = time.perf_counter()
+        count = gazetteer.build(
+            output,
+            _places(options['cities'], options['min_population']),
+            _countries(options['countries']) if options['countries'] else (),
+            _regions(options['admin1']) if options['admin1'] else (),
+        )
+        size = os.path.getsize(output) / 1024 / 1024
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Loaded {count} places into {output} ({size:.1f} MB) in {time.perf_counter() - started:.1f}s"
+            )
+        )
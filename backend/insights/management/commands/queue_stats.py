@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from insights.queues import queue_depths, ALL_QUEUES
+
+
+class Command(BaseCommand):
+    help = 'Show the number of waiting tasks in each Celery queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue',
+            action='append',
+            dest='queues',
+            help='Queue to inspect (can be repeated, defaults to all queues)',
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or ALL_QUEUES
+        depths = queue_depths(queues)
+
+        for name, depth in depths.items():
+            if depth is None:
+                self.stdout.write(self.style.ERROR(f"{name}: unavailable"))
+            else:
+                self.stdout.write(f"{name}: {depth}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from insights.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user category sentiment rollups from the insights'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            dest='user_id',
+            help='Only rebuild the rollups of this user id',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} category sentiment rollups"))
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    Insight = apps.get_model('insights', 'Insight')
+    CategorySentiment = apps.get_model('insights', 'CategorySentiment')
+    rows = (
+        Insight.objects.order_by()
+        .values('entry__user_id', 'category_id')
+        .annotate(
+            count=models.Count('id'),
+            total=models.Sum('sentiment_score'),
+            first=models.Min('entry__created_at'),
+            last=models.Max('entry__created_at'),
+        )
+    )
+    CategorySentiment.objects.bulk_create(
+        [
+            CategorySentiment(
+                user_id=row['entry__user_id'],
+                category_id=row['category_id'],
+                insight_count=row['count'],
+                sentiment_sum=row['total'] or 0.0,
+                first_seen=row['first'],
+                last_seen=row['last'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('insights', '0002_insight_embedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySentiment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('insight_count', models.PositiveIntegerField(default=0)),
+                ('sentiment_sum', models.FloatField(default=0.0)),
+                ('first_seen', models.DateTimeField(blank=True, null=True)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sentiment_rollups', to='categories.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_sentiments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'category')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
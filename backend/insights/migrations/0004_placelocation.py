@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:28
+
+import re
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _name_key(name):
+    return " ".join(re.sub(r"[^\w\s]", " ", name or "").casefold().split())
+
+
+def seed_locations(apps, schema_editor):
+    """Give each user the coordinates of their own entries already geocoded
+    to a place category.
+
+    An entry's location is its main place, so it is only trusted for a
+    category when its location name is the category's name, or when the
+    category is the entry's only place. The user's most recent entry wins.
+    """
+    Insight = apps.get_model('insights', 'Insight')
+    PlaceLocation = apps.get_model('insights', 'PlaceLocation')
+
+    place_insights = Insight.objects.filter(category__category_type='place')
+    places_per_entry = {}
+    for entry_id, category_id in place_insights.values_list('entry_id', 'category_id').distinct().iterator():
+        places_per_entry[entry_id] = places_per_entry.get(entry_id, 0) + 1
+
+    located = place_insights.filter(entry__latitude__isnull=False, entry__longitude__isnull=False).order_by(
+        '-entry__created_at'
+    )
+    chosen, fallback = {}, {}
+    rows = located.values_list(
+        'entry__user_id', 'category_id', 'category__name', 'entry_id',
+        'entry__latitude', 'entry__longitude', 'entry__location_name',
+    )
+    for user_id, category_id, name, entry_id, latitude, longitude, location_name in rows.iterator():
+        key = (user_id, category_id)
+        location = (latitude, longitude, (location_name or name)[:255])
+        if key not in chosen and _name_key((location_name or '').split(',')[0]) == _name_key(name):
+            chosen[key] = location
+        elif places_per_entry.get(entry_id) == 1:
+            fallback.setdefault(key, location)
+
+    PlaceLocation.objects.bulk_create(
+        [
+            PlaceLocation(
+                user_id=user_id, category_id=category_id,
+                latitude=latitude, longitude=longitude, location_name=location_name,
+            )
+            for (user_id, category_id), (latitude, longitude, location_name) in {**fallback, **chosen}.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0003_category_location'),
+        ('entries', '0010_entry_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('insights', '0003_categorysentiment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField(validators=[django.core.validators.MinValueValidator(-90.0), django.core.validators.MaxValueValidator(90.0)])),
+                ('longitude', models.FloatField(validators=[django.core.validators.MinValueValidator(-180.0), django.core.validators.MaxValueValidator(180.0)])),
+                ('location_name', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_locations', to='categories.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='place_locations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'category')},
+            },
+        ),
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
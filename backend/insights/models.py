@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from entries.managers import LargeFieldsManager
 from entries.models import Entry
 from categories.models import Category
 
@@ -32,12 +34,72 @@ class Insight(models.Model):
     # Whether this insight was manually edited by the user
     is_manual_edit = models.BooleanField(default=False)
 
+    # float32 embedding of the snippet for semantic search
+    embedding = models.BinaryField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    DEFERRED_FIELDS = ("embedding",)
+    objects = LargeFieldsManager()
+
     class Meta:
         ordering = ["start_position"]
         unique_together = ["entry", "category", "start_position", "end_position"]
 
     def __str__(self):
         return f"{self.entry} - {self.category.name}: {self.text_snippet[:50]}..."
+
+
+class CategorySentiment(models.Model):
+    """Per-user rollup of insight counts and sentiment for each category"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="category_sentiments"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="sentiment_rollups"
+    )
+
+    insight_count = models.PositiveIntegerField(default=0)
+    sentiment_sum = models.FloatField(default=0.0)
+
+    # Creation dates of the earliest and latest entries mentioning the category
+    first_seen = models.DateTimeField(null=True, blank=True)
+    last_seen = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["user", "category"]
+
+    @property
+    def avg_sentiment(self):
+        return self.sentiment_sum / self.insight_count if self.insight_count else 0.0
+
+    def __str__(self):
+        return f"{self.user} - {self.category.name}: {self.insight_count}"
+
+
+class PlaceLocation(models.Model):
+    """A user's own coordinates for a place category, taking precedence for
+    that user over the shared geocoded ones on the category"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="place_locations"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="user_locations"
+    )
+
+    latitude = models.FloatField(validators=[MinValueValidator(-90.0), MaxValueValidator(90.0)])
+    longitude = models.FloatField(validators=[MinValueValidator(-180.0), MaxValueValidator(180.0)])
+    location_name = models.CharField(max_length=255, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["user", "category"]
+
+    def __str__(self):
+        return f"{self.user} - {self.category.name}: {self.latitude}, {self.longitude}"
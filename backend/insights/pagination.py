@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class EntryCursorPagination(CursorPagination):
+    """Stable newest-first pages that stay cheap deep into large result sets"""
+
+    ordering = "-created_at"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class PlacePagination(PageNumberPagination):
+    """Place summaries are small rows, so pages are large"""
+
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 500
@@ -0,0 +1,130 @@
+"""
+Place categories: per-user summaries and their geocoded locations.
+
+A place category's geocoded coordinates live on the category itself, so
+every entry and user mentioning it shares one geocoding result. Coordinates
+a user sets by hand are their own ``PlaceLocation`` and take precedence for
+them only. Summaries are one aggregate query over the user's insights,
+grouped by category.
+
+``geocode_categories`` is the cached path for bulk work: located
+categories are never geocoded again, names nobody could resolve are
+remembered for ``GEOCODING_MISS_CACHE_SECONDS``, and the rest are looked up
+on a small thread pool.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from categories.canonical import match_key
+from categories.models import Category
+
+from .clients import get_geocoding_service
+from .models import PlaceLocation
+
+logger = logging.getLogger(__name__)
+
+
+def summaries(user=None):
+    """Place categories the user mentioned, with entry count, average
+    sentiment, last-mentioned date and location (``place_latitude``,
+    ``place_longitude``, ``place_location_name``), most recently mentioned first"""
+    queryset = Category.objects.filter(category_type="place")
+    if user is not None:
+        queryset = queryset.filter(insights__entry__user=user)
+        own = PlaceLocation.objects.filter(user=user, category=OuterRef("pk"))
+        location = {
+            f"place_{field}": Coalesce(Subquery(own.values(field)[:1]), F(field))
+            for field in ("latitude", "longitude", "location_name")
+        }
+    else:
+        queryset = queryset.filter(insights__isnull=False)
+        location = {f"place_{field}": F(field) for field in ("latitude", "longitude", "location_name")}
+    # The filter above joins the insights the aggregates run over
+    return queryset.annotate(
+        entry_count=Count("insights__entry", distinct=True),
+        avg_sentiment=Avg("insights__sentiment_score"),
+        last_mentioned=Max("insights__entry__created_at"),
+        **location,
+    ).order_by("-last_mentioned", "id")
+
+
+def remember_locations(category_ids: Iterable[int], geocoded_places: List[dict]) -> int:
+    """Store geocoded places on the matching place categories that have no
+    location yet; returns how many were updated"""
+    by_key = {}
+    for place in geocoded_places:
+        for name in (place.get("place_name", ""), place.get("full_name", "").split(",")[0]):
+            if name:
+                by_key.setdefault(match_key(name), place)
+
+    updated = 0
+    unlocated = Category.objects.filter(pk__in=set(category_ids), category_type="place", latitude__isnull=True)
+    for category in unlocated.only("id", "normalized_name"):
+        place = by_key.get(category.normalized_name)
+        if place is not None:
+            updated += Category.objects.filter(pk=category.pk, latitude__isnull=True).update(
+                latitude=place["latitude"],
+                longitude=place["longitude"],
+                location_name=place["full_name"][:255],
+            )
+    return updated
+
+
+def _miss_key(name: str) -> str:
+    return "geocode-miss:" + hashlib.sha256(match_key(name).encode("utf-8")).hexdigest()
+
+
+def _geocode(service, name: str) -> Tuple[Optional[tuple], bool]:
+    """``(result, definitive)``; errors are not definitive and not cached"""
+    try:
+        return service.geocode_place(name), True
+    except Exception as e:
+        logger.warning(f"Geocoding '{name}' failed: {e}")
+        return None, False
+
+
+def geocode_categories(categories: Dict[int, str], workers: int = 4) -> Dict[str, int]:
+    """Geocode unlocated place categories (``{id: name}``) and store the results.
+
+    Returns counts of ``located``, ``cached_misses`` (skipped, known to be
+    unresolvable), ``misses`` and ``errors``.
+    """
+    stats = {"located": 0, "cached_misses": 0, "misses": 0, "errors": 0}
+    known_misses = cache.get_many([_miss_key(name) for name in categories.values()])
+    pending = {}
+    for category_id, name in categories.items():
+        if _miss_key(name) in known_misses:
+            stats["cached_misses"] += 1
+        else:
+            pending[category_id] = name
+    if not pending:
+        return stats
+
+    service = get_geocoding_service()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda name: _geocode(service, name), pending.values())
+        outcomes = list(zip(pending.items(), results))
+
+    misses = {}
+    for (category_id, name), (result, definitive) in outcomes:
+        if result:
+            latitude, longitude, full_name = result
+            stats["located"] += Category.objects.filter(pk=category_id, latitude__isnull=True).update(
+                latitude=latitude, longitude=longitude, location_name=(full_name or name)[:255]
+            )
+        elif definitive:
+            stats["misses"] += 1
+            misses[_miss_key(name)] = True
+        else:
+            stats["errors"] += 1
+    if misses:
+        cache.set_many(misses, getattr(settings, "GEOCODING_MISS_CACHE_SECONDS", 86400))
+    return stats
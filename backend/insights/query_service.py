@@ -0,0 +1,400 @@
+"""
+Natural-language querying of diary entries for ``ai_query``.
+
+The flow is: analyse the question into keywords and filters, retrieve the
+matching entries by keyword and by embedding similarity, then answer the
+question from those entries. Answers can be produced in one call or streamed
+piece by piece.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .chunking import estimate_tokens
+from .context_builder import AnswerContext, build_context
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_ANSWER = (
+    "I found relevant entries but couldn't generate a specific answer. "
+    "Please review the entries below."
+)
+
+
+def build_analysis_prompt(query: str) -> str:
+    """Prompt turning the user's question into search keywords and filters"""
+    return f"""
+            You are an AI assistant helping to find relevant diary entries based on a user's query.
+
+            User Query: "{query}"
+
+            Based on this query, I need you to:
+            1. Understand what the user is looking for
+            2. Identify relevant keywords, topics, or themes
+            3. Suggest search strategies to find matching entries
+
+            Consider these aspects when matching:
+            - Entry titles and content
+            - Extracted insights (places, people, activities, emotions)
+            - Categories and sentiment
+            - Time periods or dates mentioned
+
+            Return a JSON response with:
+            {{
+                "search_keywords": ["keyword1", "keyword2", ...],
+                "search_strategies": ["strategy1", "strategy2", ...],
+                "suggested_filters": {{
+                    "categories": ["category1", "category2"],
+                    "sentiment_range": {{"min": -1.0, "max": 1.0}},
+                    "time_period": "recent|all|specific_date"
+                }}
+            }}
+            """
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a question, so trivially different phrasings share cache entries"""
+    normalized = unicodedata.normalize("NFKC", query).casefold()
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return normalized.rstrip("?!. ")
+
+
+def _cache_key(kind: str, *parts: str) -> str:
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f"insights:query:{kind}:{digest}"
+
+
+def analyze_query(model, query: str) -> Dict[str, Any]:
+    """Ask the model how to search for the question.
+
+    Returns the raw analysis text plus keywords, strategies and filters, with
+    a plain keyword split as fallback when the response cannot be parsed.
+    The analysis does not depend on the user's data and is cached per
+    normalized query; the keyword fallback is not cached, so the next ask
+    gets another chance at a parsed analysis.
+    """
+    key = _cache_key("analysis", normalize_query(query))
+    analysis = cache.get(key)
+    if analysis is None:
+        analysis, parsed = _analyze_query(model, query)
+        if parsed:
+            cache.set(key, analysis, getattr(settings, "INSIGHTS_QUERY_ANALYSIS_CACHE_SECONDS", 86400))
+    return analysis
+
+
+def _analyze_query(model, query: str) -> Tuple[Dict[str, Any], bool]:
+    response = model.generate_content(build_analysis_prompt(query))
+    ai_analysis = getattr(response, "text", "")
+
+    # Parse AI response (simplified - in production you'd want more robust parsing)
+    parsed = False
+    try:
+        # Extract JSON from AI response
+        json_match = re.search(r'\{.*\}', ai_analysis, re.DOTALL)
+        if json_match:
+            ai_data = json.loads(json_match.group())
+            search_keywords = ai_data.get("search_keywords", [])
+            search_strategies = ai_data.get("search_strategies", [])
+            suggested_filters = ai_data.get("suggested_filters", {})
+            parsed = True
+        else:
+            # Fallback to simple keyword extraction
+            search_keywords = query.lower().split()
+            search_strategies = ["content_search", "insight_search"]
+            suggested_filters = {}
+    except Exception:
+        # Fallback parsing
+        search_keywords = query.lower().split()
+        search_strategies = ["content_search", "insight_search"]
+        suggested_filters = {}
+
+    return {
+        "ai_analysis": ai_analysis,
+        "search_keywords": search_keywords,
+        "search_strategies": search_strategies,
+        "suggested_filters": suggested_filters,
+    }, parsed
+
+
+# Relevance weights for the retrieval query
+TITLE_WEIGHT = 3
+CONTENT_WEIGHT = 1
+INSIGHT_WEIGHT = 2
+CATEGORY_WEIGHT = 2
+MAX_KEYWORDS = 10
+
+
+def _clean_keywords(keywords) -> List[str]:
+    cleaned = []
+    seen = set()
+    for keyword in keywords or []:
+        keyword = str(keyword).strip()
+        if keyword and keyword.lower() not in seen:
+            seen.add(keyword.lower())
+            cleaned.append(keyword)
+    return cleaned[:MAX_KEYWORDS]
+
+
+def _count_per_entry(insights_queryset, condition):
+    """Correlated subquery counting an entry's insights matching ``condition``"""
+    counts = (
+        insights_queryset.filter(condition, entry=OuterRef("pk"))
+        .order_by()
+        .values("entry")
+        .annotate(matches=Count("pk"))
+        .values("matches")
+    )
+    return Coalesce(Subquery(counts[:1], output_field=IntegerField()), 0)
+
+
+def find_matching_entries(entries_queryset, insights_queryset, search_keywords, suggested_filters, limit=10):
+    """Top entries for the keywords and suggested categories, in one query.
+
+    Each entry is scored in SQL: keyword hits in the title and content plus
+    the number of its insights whose snippet or category matches a keyword
+    and the number in a suggested category. Entries are ranked by score,
+    newest first on ties.
+    """
+    keywords = _clean_keywords(search_keywords)
+    categories = [str(c) for c in (suggested_filters or {}).get("categories") or [] if c]
+    if not keywords and not categories:
+        return []
+
+    text_score = Value(0)
+    insight_condition = Q()
+    for keyword in keywords:
+        text_score = (
+            text_score
+            + Case(When(title__icontains=keyword, then=Value(TITLE_WEIGHT)), default=Value(0))
+            + Case(When(content__icontains=keyword, then=Value(CONTENT_WEIGHT)), default=Value(0))
+        )
+        insight_condition |= Q(text_snippet__icontains=keyword) | Q(category__name__icontains=keyword)
+
+    ranked = entries_queryset.annotate(
+        text_score=ExpressionWrapper(text_score, output_field=IntegerField()),
+        insight_matches=(
+            _count_per_entry(insights_queryset, insight_condition) if keywords else Value(0)
+        ),
+        category_matches=(
+            _count_per_entry(insights_queryset, Q(category__name__in=categories))
+            if categories
+            else Value(0)
+        ),
+    ).annotate(
+        relevance=F("text_score")
+        + F("insight_matches") * INSIGHT_WEIGHT
+        + F("category_matches") * CATEGORY_WEIGHT
+    )
+
+    return list(
+        ranked.filter(relevance__gt=0)
+        .order_by("-relevance", "-created_at")
+        .select_related("user")
+        .prefetch_related("insights__category", "documents", "faces")[:limit]
+    )
+
+
+# Reciprocal rank fusion constant; higher values flatten the rank weights
+RRF_K = 60
+
+
+def semantic_entry_ids(user_id, query: str, limit: int = 10) -> List[int]:
+    """Entry ids nearest the query in embedding space, best first.
+
+    Entries are matched directly and through their most similar insights.
+    """
+    from . import vector_index
+    from .models import Insight
+
+    entry_hits = vector_index.search_text(vector_index.ENTRIES, user_id, query, k=limit)
+    insight_hits = vector_index.search_text(vector_index.INSIGHTS, user_id, query, k=limit * 2)
+    insight_entries = dict(
+        Insight.objects.filter(pk__in=[pk for pk, _ in insight_hits]).values_list("pk", "entry_id")
+    )
+
+    scores: Dict[int, float] = {}
+    for pk, score in entry_hits:
+        scores[pk] = max(scores.get(pk, 0.0), score)
+    for pk, score in insight_hits:
+        entry_id = insight_entries.get(pk)
+        if entry_id is not None:
+            scores[entry_id] = max(scores.get(entry_id, 0.0), score)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+def find_relevant_entries(
+    entries_queryset, insights_queryset, query, search_keywords, suggested_filters, user_id=None, limit=10
+):
+    """Keyword ranking fused with semantic retrieval.
+
+    Both rankings are merged with reciprocal rank fusion so an entry found by
+    either method can surface, and entries found by both rank highest.
+    """
+    keyword_entries = find_matching_entries(
+        entries_queryset, insights_queryset, search_keywords, suggested_filters, limit=limit
+    )
+    try:
+        semantic_ids = semantic_entry_ids(user_id, query, limit=limit)
+    except Exception as e:
+        logger.warning(f"Semantic retrieval failed: {e}")
+        semantic_ids = []
+    if not semantic_ids:
+        return keyword_entries
+
+    fused: Dict[int, float] = {}
+    for rank, entry in enumerate(keyword_entries):
+        fused[entry.pk] = fused.get(entry.pk, 0.0) + 1.0 / (RRF_K + rank + 1)
+    for rank, pk in enumerate(semantic_ids):
+        fused[pk] = fused.get(pk, 0.0) + 1.0 / (RRF_K + rank + 1)
+    ranked_ids = sorted(fused, key=fused.get, reverse=True)[:limit]
+
+    entries = {entry.pk: entry for entry in keyword_entries}
+    missing = [pk for pk in ranked_ids if pk not in entries]
+    if missing:
+        entries.update(
+            (entry.pk, entry)
+            for entry in entries_queryset.filter(pk__in=missing)
+            .select_related("user")
+            .prefetch_related("insights__category", "documents", "faces")
+        )
+    # Ids outside entries_queryset (e.g. another user's) are dropped here
+    return [entries[pk] for pk in ranked_ids if pk in entries]
+
+
+def build_answer_prompt(query: str, context: AnswerContext) -> str:
+    """Prompt answering the question from the packed entry passages"""
+    return f"""
+                    You are an AI assistant helping to answer questions about a user's diary entries.
+
+                    User Question: "{query}"
+
+                    Based on the following diary excerpts (one block per entry, headed by
+                    number, date, title, sentiment and location), please provide a helpful
+                    and insightful answer:
+
+{context.text}
+
+                    Guidelines for your response:
+                    1. Answer the user's question directly and helpfully
+                    2. Reference specific entries when relevant
+                    3. Provide insights and patterns you notice
+                    4. Be conversational and personal
+                    5. If the question can't be answered from the entries, say so politely
+                    6. Keep the response concise but informative
+
+                    Provide your answer in a natural, conversational tone.
+                    """
+
+
+def _log_usage(context: AnswerContext, prompt: str, response=None) -> None:
+    """Log the tokens an answer used, preferring the model's own counts"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    answer_tokens = getattr(usage, "candidates_token_count", None)
+    logger.info(
+        f"ai_query answer: prompt {prompt_tokens} tokens, context {context.tokens} tokens "
+        f"({context.passages} passages from {context.entries} entries"
+        f"{', truncated' if context.truncated else ''}), answer {answer_tokens or 'unknown'} tokens"
+    )
+
+
+def _entry_version(entry) -> str:
+    # The answer also quotes the entry's insights, which change without the
+    # entry (re-extraction, manual edits, deletions)
+    insights = list(entry.insights.all())
+    latest = max((insight.updated_at for insight in insights), default=None)
+    insights_version = f"{len(insights)}@{latest.isoformat() if latest else ''}"
+    return f"{entry.pk}@{entry.updated_at.isoformat()}:{insights_version}"
+
+
+def answer_cache_key(query: str, entries) -> str:
+    """Cache key for an answer: the normalized query plus the matched entries'
+    ids and modification times and those of their insights, so any edit to
+    those entries or their insights misses"""
+    versions = [_entry_version(entry) for entry in entries]
+    return _cache_key("answer", normalize_query(query), *versions)
+
+
+def _cache_answer(key: str, answer: str) -> None:
+    if answer and answer != FALLBACK_ANSWER:
+        cache.set(key, answer, getattr(settings, "INSIGHTS_QUERY_ANSWER_CACHE_SECONDS", 3600))
+
+
+def generate_answer(model, query: str, entries, keywords=()) -> str:
+    """Answer the question from the entries in a single call"""
+    if not entries:
+        return ""
+    key = answer_cache_key(query, entries)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("ai_query answer served from cache")
+        return cached
+
+    context = build_context(entries, keywords)
+    prompt = build_answer_prompt(query, context)
+    try:
+        answer_response = model.generate_content(prompt)
+        _log_usage(context, prompt, answer_response)
+        answer = getattr(answer_response, "text", "").strip()
+        _cache_answer(key, answer)
+        return answer
+    except Exception as answer_error:
+        logger.warning(f"Failed to generate AI answer: {answer_error}")
+        return FALLBACK_ANSWER
+
+
+def stream_answer(model, query: str, entries, keywords=()) -> Iterator[str]:
+    """Yield the answer text piece by piece as the model produces it"""
+    if not entries:
+        return
+    key = answer_cache_key(query, entries)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info("ai_query answer served from cache")
+        yield cached
+        return
+
+    context = build_context(entries, keywords)
+    prompt = build_answer_prompt(query, context)
+    pieces = []
+    response = None
+    try:
+        response = model.generate_content(prompt, stream=True)
+        for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                pieces.append(text)
+                yield text
+    except Exception as answer_error:
+        logger.warning(f"Failed to stream AI answer: {answer_error}")
+        if not pieces:
+            yield FALLBACK_ANSWER
+        # A partial answer is not cached
+        pieces = []
+    _log_usage(context, prompt, response)
+    _cache_answer(key, "".join(pieces).strip())
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,69 @@
+"""
+Celery queue routing and priorities for insight processing.
+
+Fresh user work (creating or editing an entry) goes to the ``interactive``
+queue, sweeps of unprocessed entries go to the ``bulk`` queue, so a backlog of
+retries never delays a new entry. Text extraction of uploaded documents has
+its own ``documents`` queue. Priorities order tasks inside each queue.
+"""
+
+from typing import Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
+# Text extraction (pdfminer/OCR) of uploaded documents; slow and CPU-bound
+DOCUMENTS_QUEUE = "documents"
+ALL_QUEUES = (INTERACTIVE_QUEUE, BULK_QUEUE, DOCUMENTS_QUEUE)
+
+# Where an extraction request came from
+SOURCE_CREATE = "create"
+SOURCE_UPDATE = "update"
+SOURCE_DOCUMENT = "document"
+SOURCE_REPROCESS = "reprocess"
+SOURCE_RETRY = "retry"
+
+# Redis transport semantics: 0 is consumed first, 9 last
+ROUTING: Dict[str, tuple] = {
+    SOURCE_CREATE: (INTERACTIVE_QUEUE, 0),
+    SOURCE_UPDATE: (INTERACTIVE_QUEUE, 1),
+    SOURCE_DOCUMENT: (INTERACTIVE_QUEUE, 2),
+    SOURCE_REPROCESS: (INTERACTIVE_QUEUE, 3),
+    SOURCE_RETRY: (BULK_QUEUE, 9),
+}
+
+
+def routing_options(source: str) -> Dict[str, object]:
+    """Return ``apply_async`` keyword arguments for an extraction source"""
+    queue, priority = ROUTING.get(source, ROUTING[SOURCE_RETRY])
+    return {"queue": queue, "priority": priority}
+
+
+def queue_depths(queues: Optional[Iterable[str]] = None) -> Dict[str, Optional[int]]:
+    """Return the number of waiting messages per queue.
+
+    A queue that cannot be inspected (broker down, Celery missing) maps to None.
+    """
+    queues = tuple(queues or ALL_QUEUES)
+    depths: Dict[str, Optional[int]] = {name: None for name in queues}
+    try:
+        from mindjourney.celery import app
+    except Exception as e:
+        logger.warning(f"Celery not available for queue inspection: {e}")
+        return depths
+
+    try:
+        with app.connection_for_read() as connection:
+            channel = connection.default_channel
+            for name in queues:
+                try:
+                    declared = channel.queue_declare(queue=name, passive=True)
+                    depths[name] = declared.message_count
+                except Exception:
+                    # Queue has never been declared on the broker
+                    depths[name] = 0
+    except Exception as e:
+        logger.warning(f"Could not inspect queue depths: {e}")
+    return depths
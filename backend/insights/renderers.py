@@ -0,0 +1,41 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets ``text/event-stream`` requests through content negotiation.
+
+    Streaming views return the events themselves; this renderer only has to
+    handle regular responses such as validation errors, sent as one event.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, (bytes, str)):
+            return data
+        return f"event: error\ndata: {json.dumps(data, default=str)}\n\n".encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON, one object per line.
+
+    Like ``EventStreamRenderer`` it is mostly for content negotiation; the
+    streaming views write the lines themselves.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, (bytes, str)):
+            return data
+        items = data if isinstance(data, list) else [data]
+        return "".join(json.dumps(item, default=str) + "\n" for item in items).encode(self.charset)
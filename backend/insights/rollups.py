@@ -0,0 +1,120 @@
+"""
+Maintenance of the per-user ``CategorySentiment`` rollups.
+
+Writers of insights report what they added and removed as
+``(category_id, sentiment_score, seen_at)`` items, where ``seen_at`` is the
+creation date of the insight's entry. Counts and sums are adjusted by delta;
+first/last seen are widened on additions and only recomputed for a category
+when a removal touched one of its bounds. Call ``apply_changes`` inside the
+transaction that wrote the insights so the rollup never drifts from them.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .models import CategorySentiment, Insight
+
+logger = logging.getLogger(__name__)
+
+RollupItem = Tuple[int, float, object]
+
+
+@dataclass
+class _Delta:
+    count: int = 0
+    total: float = 0.0
+    first: Optional[object] = None
+    last: Optional[object] = None
+
+    def add(self, sentiment, seen) -> None:
+        self.count += 1
+        self.total += sentiment
+        if seen is not None:
+            self.first = seen if self.first is None else min(self.first, seen)
+            self.last = seen if self.last is None else max(self.last, seen)
+
+
+def _group(items: Iterable[RollupItem]) -> Dict[int, _Delta]:
+    grouped: Dict[int, _Delta] = {}
+    for category_id, sentiment, seen in items:
+        grouped.setdefault(category_id, _Delta()).add(sentiment, seen)
+    return grouped
+
+
+def rollup_items(insights) -> list:
+    """Rollup items for an insight queryset"""
+    return list(insights.values_list("category_id", "sentiment_score", "entry__created_at"))
+
+
+@transaction.atomic
+def apply_changes(user_id: int, added: Iterable[RollupItem] = (), removed: Iterable[RollupItem] = ()) -> None:
+    """Adjust a user's rollups for insights that were added and removed"""
+    plus = _group(added)
+    minus = _group(removed)
+
+    # Fixed lock order keeps concurrent writers from deadlocking
+    for category_id in sorted(set(plus) | set(minus)):
+        gained = plus.get(category_id, _Delta())
+        lost = minus.get(category_id, _Delta())
+        if gained.count == lost.count == 0:
+            continue
+
+        row, _ = CategorySentiment.objects.select_for_update().get_or_create(
+            user_id=user_id, category_id=category_id
+        )
+        row.insight_count = max(row.insight_count + gained.count - lost.count, 0)
+        row.sentiment_sum += gained.total - lost.total
+        if row.insight_count == 0:
+            row.delete()
+            continue
+
+        if gained.first is not None:
+            row.first_seen = gained.first if row.first_seen is None else min(row.first_seen, gained.first)
+            row.last_seen = gained.last if row.last_seen is None else max(row.last_seen, gained.last)
+        if lost.count and (
+            row.first_seen is None
+            or (lost.first is not None and lost.first <= row.first_seen)
+            or (lost.last is not None and lost.last >= row.last_seen)
+        ):
+            bounds = Insight.objects.filter(entry__user_id=user_id, category_id=category_id).aggregate(
+                first=Min("entry__created_at"), last=Max("entry__created_at")
+            )
+            row.first_seen, row.last_seen = bounds["first"], bounds["last"]
+        row.save()
+
+
+@transaction.atomic
+def rebuild(user_id: Optional[int] = None) -> int:
+    """Recompute rollups from the insights; returns the number of rows written"""
+    insights = Insight.objects.all()
+    rollups = CategorySentiment.objects.all()
+    if user_id is not None:
+        insights = insights.filter(entry__user_id=user_id)
+        rollups = rollups.filter(user_id=user_id)
+
+    rollups.delete()
+    rows = [
+        CategorySentiment(
+            user_id=row["entry__user_id"],
+            category_id=row["category_id"],
+            insight_count=row["count"],
+            sentiment_sum=row["total"] or 0.0,
+            first_seen=row["first"],
+            last_seen=row["last"],
+        )
+        for row in insights.order_by()
+        .values("entry__user_id", "category_id")
+        .annotate(
+            count=Count("id"),
+            total=Sum("sentiment_score"),
+            first=Min("entry__created_at"),
+            last=Max("entry__created_at"),
+        )
+    ]
+    CategorySentiment.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Rebuilt {len(rows)} category sentiment rollups")
+    return len(rows)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Insight
+from categories.models import Category
 from categories.serializers import CategorySerializer
 
 
@@ -23,3 +24,28 @@ class InsightSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+
+
+class PlaceSummarySerializer(serializers.ModelSerializer):
+    """A place category with its aggregates from ``places.summaries``"""
+
+    entry_count = serializers.IntegerField(read_only=True)
+    avg_sentiment = serializers.FloatField(read_only=True)
+    last_mentioned = serializers.DateTimeField(read_only=True)
+    # The user's own location when set, otherwise the shared geocoded one
+    latitude = serializers.FloatField(source="place_latitude", read_only=True)
+    longitude = serializers.FloatField(source="place_longitude", read_only=True)
+    location_name = serializers.CharField(source="place_location_name", read_only=True)
+
+    class Meta:
+        model = Category
+        fields = [
+            "id",
+            "name",
+            "latitude",
+            "longitude",
+            "location_name",
+            "entry_count",
+            "avg_sentiment",
+            "last_mentioned",
+        ]
@@ -0,0 +1,119 @@
+"""
+Exact span resolution for insight snippets.
+
+The model's start/end positions are only hints. All snippets are located in
+the content with a single Aho-Corasick pass over the lowercased text, and each
+insight gets the occurrence closest to its hint.
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def lower_preserving_offsets(text: str) -> str:
+    """Lowercase text without changing its length.
+
+    A few characters (e.g. "İ") lowercase to more than one code point; they are
+    kept as-is so offsets in the result match offsets in the original.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher reporting every occurrence of every pattern"""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append(index)
+
+        # Breadth-first pass to compute failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                if node:
+                    fallback = self._fail[node]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find_all(self, text: str) -> Dict[int, List[int]]:
+        """Return start offsets of all matches, keyed by pattern index"""
+        matches: Dict[int, List[int]] = {}
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in out[node]:
+                matches.setdefault(index, []).append(position - len(self.patterns[index]) + 1)
+        return matches
+
+
+def _nearest(starts: List[int], hint: int) -> int:
+    # starts are in ascending order; ties go to the earlier occurrence
+    best = starts[0]
+    for start in starts:
+        if abs(start - hint) < abs(best - hint):
+            best = start
+        elif start > hint:
+            break
+    return best
+
+
+def resolve_spans(
+    content: str, snippets: Sequence[Tuple[str, int]]
+) -> List[Optional[Tuple[int, int]]]:
+    """Locate each ``(snippet, hinted_start)`` in content, case-insensitively.
+
+    Returns ``(start, end)`` of the occurrence nearest the hint for every
+    snippet, or None when the snippet does not occur.
+    """
+    lowered_content = lower_preserving_offsets(content)
+    pattern_ids: Dict[str, int] = {}
+    patterns: List[str] = []
+    snippet_patterns: List[Optional[int]] = []
+    for snippet, _hint in snippets:
+        pattern = lower_preserving_offsets(snippet or "")
+        if not pattern:
+            snippet_patterns.append(None)
+            continue
+        if pattern not in pattern_ids:
+            pattern_ids[pattern] = len(patterns)
+            patterns.append(pattern)
+        snippet_patterns.append(pattern_ids[pattern])
+
+    matches = AhoCorasick(patterns).find_all(lowered_content) if patterns else {}
+
+    spans: List[Optional[Tuple[int, int]]] = []
+    for (snippet, hint), pattern_index in zip(snippets, snippet_patterns):
+        starts = matches.get(pattern_index) if pattern_index is not None else None
+        if not starts:
+            spans.append(None)
+            continue
+        start = _nearest(starts, hint or 0)
+        spans.append((start, start + len(patterns[pattern_index])))
+    return spans
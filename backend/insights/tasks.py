@@ -9,52 +9,182 @@ except ImportError:
         pass
 
 
+import uuid
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from .models import Insight
 from .ai_service import AIInsightExtractor, InsightData
-from .geocoding_service import AIGeocodingService
+from .clients import get_insight_extractor, get_geocoding_service, get_embedder
+from .embeddings import encode_vector, entry_text
+from . import places, rollups, vector_index
+from .chunking import truncate_text
+from .queues import routing_options, queue_depths, ALL_QUEUES, SOURCE_CREATE, SOURCE_RETRY
 from entries.models import Entry
-from categories.models import Category
+from categories.canonical import resolve_category_id
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _pending_key(entry_id: int, queue: str) -> str:
+    return f"insights:extraction:pending:{queue}:{entry_id}"
+
+
+def _lock_key(entry_id: int) -> str:
+    return f"insights:extraction:lock:{entry_id}"
+
+
+def _debounce_seconds() -> int:
+    return getattr(settings, "INSIGHTS_EXTRACTION_DEBOUNCE_SECONDS", 5)
+
+
+def _acquire_entry_lock(entry_id: int):
+    """Take the per-entry processing lock; returns a release token or None"""
+    token = uuid.uuid4().hex
+    timeout = getattr(settings, "INSIGHTS_EXTRACTION_LOCK_TIMEOUT", 600)
+    if cache.add(_lock_key(entry_id), token, timeout=timeout):
+        return token
+    return None
+
+
+def _release_entry_lock(entry_id: int, token: str) -> None:
+    # Only release a lock we still own (it may have expired and been re-taken)
+    if cache.get(_lock_key(entry_id)) == token:
+        cache.delete(_lock_key(entry_id))
+
+
+def build_combined_content(entry: Entry) -> str:
+    """Entry content followed by its documents' text, within the configured caps"""
+    per_document = getattr(settings, "INSIGHTS_MAX_DOCUMENT_CHARS", 50000)
+    remaining = getattr(settings, "INSIGHTS_MAX_DOCUMENTS_TOTAL_CHARS", 200000)
+
+    documents = []
+    for doc in entry.documents.with_large_fields():
+        if not doc.extracted_text or remaining <= 0:
+            continue
+        text = truncate_text(doc.extracted_text, min(per_document, remaining))
+        if len(text) < len(doc.extracted_text):
+            logger.info(
+                f"Capped text of document {doc.id} on entry {entry.id} "
+                f"from {len(doc.extracted_text)} to {len(text)} characters"
+            )
+        remaining -= len(text)
+        documents.append(text)
+
+    if not documents:
+        return entry.content
+    documents_text = "\n\n".join(documents)
+    return f"{entry.content}\n\n[Attached Documents]\n{documents_text}"
+
+
+def _store_embeddings(entry: Entry, insights, removed_insight_ids) -> None:
+    """Embed the entry and its new insights and refresh the vector indexes.
+
+    ``entry.embedding`` is set in place and saved with the entry; the indexes
+    are updated once the surrounding transaction commits. Embedding failures
+    never fail the extraction.
+    """
+    embedder = get_embedder()
+    if embedder is None:
+        return
+    try:
+        vectors = embedder.embed([entry_text(entry)] + [insight.text_snippet for insight in insights])
+    except Exception as e:
+        logger.warning(f"Embedding failed for entry {entry.id}: {e}")
+        return
+
+    entry.embedding = encode_vector(vectors[0])
+    for insight, vector in zip(insights, vectors[1:]):
+        insight.embedding = encode_vector(vector)
+    if insights:
+        Insight.objects.bulk_update(insights, ["embedding"])
+
+    user_id = entry.user_id
+    entry_upserts = [(entry.id, vectors[0])]
+    insight_upserts = [(insight.id, vector) for insight, vector in zip(insights, vectors[1:])]
+
+    def update_indexes():
+        try:
+            vector_index.update_index(vector_index.ENTRIES, user_id, upserts=entry_upserts)
+            vector_index.update_index(
+                vector_index.INSIGHTS, user_id, upserts=insight_upserts, removals=removed_insight_ids
+            )
+        except Exception as e:
+            logger.warning(f"Vector index update failed for entry {entry.id}: {e}")
+
+    transaction.on_commit(update_indexes)
+
+
+def _fill_pending_title(entry_id: int, extractor: AIInsightExtractor) -> None:
+    """Replace the provisional title of an entry with an AI generated one"""
+    entry = Entry.objects.filter(id=entry_id, title_pending=True).only("id", "content").first()
+    if entry is None:
+        return
+    try:
+        title = extractor.generate_title(entry.content)
+    except Exception as e:
+        logger.warning(f"Title generation failed for entry {entry_id}, keeping provisional title: {e}")
+        title = ""
+    updates = {"title_pending": False}
+    if title:
+        updates["title"] = title[:200]
+    # Conditional update so a title typed by the user in the meantime wins
+    Entry.objects.filter(id=entry_id, title_pending=True).update(**updates)
+
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 5, 'countdown': 60})
-def extract_insights_task(self, entry_id: int) -> bool:
+def extract_insights_task(self, entry_id: int, source: str = SOURCE_CREATE) -> bool:
     """Celery task to extract insights from a diary entry with retry logic"""
+    lock_token = _acquire_entry_lock(entry_id)
+    if lock_token is None:
+        # Another worker is processing this entry; run again once it is done,
+        # on the same queue and with the same priority as this trigger
+        logger.info(f"Entry {entry_id} is locked by another worker, rescheduling")
+        options = routing_options(source)
+        queue = options.pop("queue")
+        # This task's own pending marker would otherwise absorb the reschedule
+        cache.delete(_pending_key(entry_id, queue))
+        _schedule_coalesced(entry_id, queue, options, source)
+        return False
+
+    # Triggers so far are covered by this run, which reads the latest state
+    cache.delete_many([_pending_key(entry_id, queue) for queue in ALL_QUEUES])
     logger.info(f"Starting insight extraction for entry {entry_id} (attempt {self.request.retries + 1})")
-    
+
     try:
+        extractor = get_insight_extractor()
+        _fill_pending_title(entry_id, extractor)
+
         with transaction.atomic():
             entry = Entry.objects.get(id=entry_id)
 
             # Clear existing insights
-            Insight.objects.filter(entry=entry).delete()
+            existing_insights = Insight.objects.filter(entry=entry)
+            removed_insight_ids = list(existing_insights.values_list("id", flat=True))
+            removed_rollup_items = rollups.rollup_items(existing_insights)
+            existing_insights.delete()
 
             # Build full content including any attached documents' extracted text
-            documents_text = "\n\n".join(
-                [doc.extracted_text for doc in entry.documents.all() if doc.extracted_text]
-            )
-            combined_content = entry.content
-            if documents_text:
-                combined_content = f"{entry.content}\n\n[Attached Documents]\n{documents_text}"
+            combined_content = build_combined_content(entry)
 
             # Extract new insights
-            extractor = AIInsightExtractor()
             insights_data = extractor.extract_insights(combined_content)
             
             # Create categories and insights
             created_insights = []
+            seen_spans = set()
             for insight_data in insights_data:
-                category, created = Category.objects.get_or_create(
-                    name=insight_data.category_name,
-                    defaults={"category_type": insight_data.category_type},
-                )
+                category_id = resolve_category_id(insight_data.category_name, insight_data.category_type)
+                # Spellings that canonicalize to one category can repeat a span
+                span = (category_id, insight_data.start_position, insight_data.end_position)
+                if span in seen_spans:
+                    continue
+                seen_spans.add(span)
 
                 insight = Insight.objects.create(
                     entry=entry,
-                    category=category,
+                    category_id=category_id,
                     text_snippet=insight_data.text_snippet,
                     sentiment_score=insight_data.sentiment_score,
                     confidence_score=insight_data.confidence_score,
@@ -63,6 +193,12 @@ def extract_insights_task(self, entry_id: int) -> bool:
                 )
                 created_insights.append(insight)
 
+            rollups.apply_changes(
+                entry.user_id,
+                added=[(i.category_id, i.sentiment_score, entry.created_at) for i in created_insights],
+                removed=removed_rollup_items,
+            )
+
             # Update overall sentiment and mark as processed
             overall_sentiment = extractor.calculate_overall_sentiment(
                 insights_data
@@ -71,10 +207,11 @@ def extract_insights_task(self, entry_id: int) -> bool:
             entry.insights_processed = True
 
             # Try to geocode places mentioned in the entry
-            geocoding_service = AIGeocodingService()
+            geocoding_service = get_geocoding_service()
             geocoded_places = geocoding_service.extract_and_geocode_places(combined_content)
 
             if geocoded_places:
+                places.remember_locations([i.category_id for i in created_insights], geocoded_places)
                 # Use the first (most confident) place as the main location
                 main_place = geocoded_places[0]
                 entry.latitude = main_place["latitude"]
@@ -86,6 +223,7 @@ def extract_insights_task(self, entry_id: int) -> bool:
             else:
                 logger.info(f"No places found to geocode for entry {entry_id}")
 
+            _store_embeddings(entry, created_insights, removed_insight_ids)
             entry.save()
             logger.info(f"Successfully processed entry {entry_id}")
             return True
@@ -97,6 +235,44 @@ def extract_insights_task(self, entry_id: int) -> bool:
         logger.error(f"Error processing entry {entry_id}: {str(e)}")
         # Re-raise the exception to trigger retry
         raise
+    finally:
+        _release_entry_lock(entry_id, lock_token)
+
+
+def _schedule_coalesced(entry_id: int, queue: str, options: dict, source: str):
+    """Schedule one delayed extraction per entry and queue within the window.
+
+    Returns the async result, or None when a pending task already covers it.
+    """
+    window = _debounce_seconds()
+    # Outlives the countdown by a margin for queue delay, and no longer, so a
+    # marker whose task never ran cannot swallow triggers for long
+    pending_ttl = window + getattr(settings, "INSIGHTS_EXTRACTION_PENDING_TTL", 60)
+    if not cache.add(_pending_key(entry_id, queue), True, timeout=pending_ttl):
+        logger.info(f"Coalesced extraction trigger for entry {entry_id} into pending task")
+        return None
+    options = {**options, "queue": queue}
+    return extract_insights_task.apply_async(
+        args=[entry_id], kwargs={"source": source}, countdown=window, **options
+    )
+
+
+def enqueue_extraction(entry_id: int, source: str = SOURCE_CREATE):
+    """Queue insight extraction for an entry on the queue matching its source.
+
+    Triggers for the same entry within ``INSIGHTS_EXTRACTION_DEBOUNCE_SECONDS``
+    collapse into a single task. Falls back to calling the task inline when
+    Celery is not installed.
+    """
+    apply_async = getattr(extract_insights_task, "apply_async", None)
+    if not callable(apply_async):
+        return extract_insights_task(entry_id, source)
+
+    options = routing_options(source)
+    if _debounce_seconds() <= 0:
+        return apply_async(args=[entry_id], kwargs={"source": source}, **options)
+    queue = options.pop("queue")
+    return _schedule_coalesced(entry_id, queue, options, source)
 
 
 def extract_insights_sync(entry_id: int) -> bool:
@@ -104,23 +280,28 @@ def extract_insights_sync(entry_id: int) -> bool:
     logger.info(f"Starting synchronous insight extraction for entry {entry_id}")
     
     try:
+        try:
+            extractor = get_insight_extractor()
+            _fill_pending_title(entry_id, extractor)
+        except Exception as title_error:
+            logger.warning(f"Title generation unavailable for entry {entry_id}: {title_error}")
+            Entry.objects.filter(id=entry_id, title_pending=True).update(title_pending=False)
+
         with transaction.atomic():
             entry = Entry.objects.get(id=entry_id)
 
             # Clear existing insights
-            Insight.objects.filter(entry=entry).delete()
+            existing_insights = Insight.objects.filter(entry=entry)
+            removed_insight_ids = list(existing_insights.values_list("id", flat=True))
+            removed_rollup_items = rollups.rollup_items(existing_insights)
+            existing_insights.delete()
 
             # Build full content including any attached documents' extracted text
-            documents_text = "\n\n".join(
-                [doc.extracted_text for doc in entry.documents.all() if doc.extracted_text]
-            )
-            combined_content = entry.content
-            if documents_text:
-                combined_content = f"{entry.content}\n\n[Attached Documents]\n{documents_text}"
+            combined_content = build_combined_content(entry)
 
             # Extract new insights
             try:
-                extractor = AIInsightExtractor()
+                extractor = get_insight_extractor()
                 insights_data = extractor.extract_insights(combined_content)
             except Exception as ai_error:
                 logger.warning(f"AI insight extraction failed for entry {entry_id}: {ai_error}")
@@ -131,15 +312,18 @@ def extract_insights_sync(entry_id: int) -> bool:
             
             # Create categories and insights
             created_insights = []
+            seen_spans = set()
             for insight_data in insights_data:
-                category, created = Category.objects.get_or_create(
-                    name=insight_data.category_name,
-                    defaults={"category_type": insight_data.category_type},
-                )
+                category_id = resolve_category_id(insight_data.category_name, insight_data.category_type)
+                # Spellings that canonicalize to one category can repeat a span
+                span = (category_id, insight_data.start_position, insight_data.end_position)
+                if span in seen_spans:
+                    continue
+                seen_spans.add(span)
 
                 insight = Insight.objects.create(
                     entry=entry,
-                    category=category,
+                    category_id=category_id,
                     text_snippet=insight_data.text_snippet,
                     sentiment_score=insight_data.sentiment_score,
                     confidence_score=insight_data.confidence_score,
@@ -148,6 +332,12 @@ def extract_insights_sync(entry_id: int) -> bool:
                 )
                 created_insights.append(insight)
 
+            rollups.apply_changes(
+                entry.user_id,
+                added=[(i.category_id, i.sentiment_score, entry.created_at) for i in created_insights],
+                removed=removed_rollup_items,
+            )
+
             # Update overall sentiment and mark as processed
             overall_sentiment = extractor.calculate_overall_sentiment(
                 insights_data
@@ -157,10 +347,11 @@ def extract_insights_sync(entry_id: int) -> bool:
 
             # Try to geocode places mentioned in the entry
             try:
-                geocoding_service = AIGeocodingService()
+                geocoding_service = get_geocoding_service()
                 geocoded_places = geocoding_service.extract_and_geocode_places(combined_content)
 
                 if geocoded_places:
+                    places.remember_locations([i.category_id for i in created_insights], geocoded_places)
                     # Use the first (most confident) place as the main location
                     main_place = geocoded_places[0]
                     entry.latitude = main_place["latitude"]
@@ -174,6 +365,7 @@ def extract_insights_sync(entry_id: int) -> bool:
             except Exception as geocoding_error:
                 logger.warning(f"Geocoding failed for entry {entry_id}: {geocoding_error}")
 
+            _store_embeddings(entry, created_insights, removed_insight_ids)
             entry.save()
             logger.info(f"Successfully processed entry {entry_id} synchronously")
             return True
@@ -211,8 +403,8 @@ def retry_unprocessed_entries(self):
         retry_count = 0
         for entry in unprocessed_entries:
             try:
-                # Retry the insight extraction task
-                extract_insights_task.delay(entry.id)
+                # Retry on the bulk queue so fresh entries are not delayed
+                enqueue_extraction(entry.id, SOURCE_RETRY)
                 retry_count += 1
                 logger.info(f"Queued retry for entry {entry.id}")
             except Exception as e:
@@ -235,6 +427,12 @@ def check_entry_processing_status(self):
         unprocessed_entries = total_entries - processed_entries
         
         logger.info(f"Entry processing status: {processed_entries}/{total_entries} processed ({unprocessed_entries} unprocessed)")
+
+        depths = queue_depths()
+        logger.info(
+            "Queue depths: "
+            + ", ".join(f"{name}={depth if depth is not None else 'n/a'}" for name, depth in depths.items())
+        )
         
         if unprocessed_entries > 0:
             logger.warning(f"Found {unprocessed_entries} unprocessed entries")
@@ -244,7 +442,8 @@ def check_entry_processing_status(self):
         return {
             "total": total_entries,
             "processed": processed_entries,
-            "unprocessed": unprocessed_entries
+            "unprocessed": unprocessed_entries,
+            "queue_depths": depths,
         }
         
     except Exception as e:
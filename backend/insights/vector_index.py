@@ -0,0 +1,457 @@
+"""
+In-process vector index over entry and insight embeddings.
+
+Small collections are searched brute force. Once a collection grows past
+``INSIGHTS_VECTOR_IVF_THRESHOLD`` vectors it is partitioned with k-means and
+only the partitions nearest the query are scanned (IVF). Indexes are kept per
+user and namespace ("entries" or "insights"), plus one over every user for
+demo-mode searches, persisted as ``.npz`` files in ``INSIGHTS_VECTOR_INDEX_DIR``
+and updated incrementally; the embeddings in the database stay the source of
+truth and a missing or dirty index is rebuilt from them. IVF partitions take
+changes in place and are retrained only after ``INSIGHTS_VECTOR_IVF_RETRAIN_DRIFT``
+of the index has changed. Each file has a version counter beside it that
+tells processes when to reload.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .embeddings import np, decode_vector
+
+logger = logging.getLogger(__name__)
+
+ENTRIES = "entries"
+INSIGHTS = "insights"
+
+# Most hits returned by ``mode=semantic`` searches
+SEARCH_LIMIT = 50
+
+
+class BruteForceIndex:
+    """Exact search by scanning every vector"""
+
+    def __init__(self, ids: "np.ndarray", vectors: "np.ndarray"):
+        self.ids = ids
+        self.vectors = vectors
+
+    def search(self, query: "np.ndarray", k: int) -> List[Tuple[int, float]]:
+        return _top_k(self.ids, self.vectors @ query, k)
+
+
+class IVFIndex:
+    """Approximate search over k-means partitions of the vectors.
+
+    Later changes are applied to the partitions in place, new vectors going
+    to their nearest centroid; ``needs_training`` tells when enough has
+    changed since k-means ran that the partitions should be recomputed.
+    """
+
+    def __init__(
+        self,
+        ids: "np.ndarray",
+        vectors: "np.ndarray",
+        nprobe: int = 8,
+        seed: int = 0,
+        centroids: Optional["np.ndarray"] = None,
+        trained_size: int = 0,
+    ):
+        self.nprobe = nprobe
+        if centroids is None:
+            nlist = max(1, int(np.sqrt(len(ids))))
+            centroids = _kmeans(vectors, nlist, seed=seed)
+            trained_size = len(ids)
+        self.centroids = centroids
+        self.trained_size = trained_size or len(ids)
+        self.changes = 0
+        self.lists = [(ids[:0], vectors[:0])] * len(self.centroids)
+        self.add(ids, vectors)
+        self.changes = 0
+
+    def add(self, ids: "np.ndarray", vectors: "np.ndarray") -> None:
+        if not len(ids):
+            return
+        assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+        for i in np.unique(assignments):
+            members = assignments == i
+            list_ids, list_vectors = self.lists[i]
+            self.lists[i] = (np.concatenate([list_ids, ids[members]]), np.vstack([list_vectors, vectors[members]]))
+        self.changes += len(ids)
+
+    def remove(self, ids: "np.ndarray") -> None:
+        for i, (list_ids, list_vectors) in enumerate(self.lists):
+            keep = ~np.isin(list_ids, ids)
+            if not keep.all():
+                self.lists[i] = (list_ids[keep], list_vectors[keep])
+                self.changes += int((~keep).sum())
+
+    def needs_training(self, size: int, drift: float) -> bool:
+        """Whether changes or growth since training exceed ``drift`` of the trained size"""
+        limit = max(1.0, drift * self.trained_size)
+        return self.changes > limit or abs(size - self.trained_size) > limit
+
+    def search(self, query: "np.ndarray", k: int) -> List[Tuple[int, float]]:
+        nearest = np.argsort(-(self.centroids @ query))[: self.nprobe]
+        ids = np.concatenate([self.lists[i][0] for i in nearest])
+        vectors = np.concatenate([self.lists[i][1] for i in nearest])
+        return _top_k(ids, vectors @ query, k)
+
+
+def _top_k(ids: "np.ndarray", scores: "np.ndarray", k: int) -> List[Tuple[int, float]]:
+    if len(ids) == 0 or k <= 0:
+        return []
+    k = min(k, len(ids))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+def _kmeans(vectors: "np.ndarray", k: int, iterations: int = 10, seed: int = 0) -> "np.ndarray":
+    """Spherical k-means returning unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(k):
+            members = vectors[assignments == i]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                if norm:
+                    centroids[i] = centroid / norm
+    return centroids.astype(np.float32)
+
+
+class VectorIndex:
+    """Vectors of one namespace for one user, with incremental updates"""
+
+    def __init__(self, ids: Optional["np.ndarray"] = None, vectors: Optional["np.ndarray"] = None, dimension: int = 0):
+        self.ids = ids if ids is not None else np.zeros(0, dtype=np.int64)
+        self.dimension = vectors.shape[1] if vectors is not None and len(vectors) else dimension
+        self.vectors = vectors if vectors is not None else np.zeros((0, self.dimension), dtype=np.float32)
+        self.version = 0
+        self._searcher = None
+
+    def _changed(self, added_ids=None, added_vectors=None, removed_ids=None) -> None:
+        """Keep an IVF searcher in step, dropping it once it needs training;
+        a brute-force searcher is rebuilt for free"""
+        if not isinstance(self._searcher, IVFIndex):
+            self._searcher = None
+            return
+        if removed_ids is not None:
+            self._searcher.remove(removed_ids)
+        if added_ids is not None:
+            self._searcher.add(added_ids, added_vectors)
+        drift = getattr(settings, "INSIGHTS_VECTOR_IVF_RETRAIN_DRIFT", 0.2)
+        if self._searcher.needs_training(len(self.ids), drift):
+            self._searcher = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def upsert(self, items: Iterable[Tuple[int, "np.ndarray"]]) -> None:
+        items = [(int(i), v) for i, v in items if v is not None]
+        if not items:
+            return
+        self.remove(i for i, _ in items)
+        new_ids = np.array([i for i, _ in items], dtype=np.int64)
+        new_vectors = np.vstack([v for _, v in items]).astype(np.float32)
+        if not self.dimension:
+            self.dimension = new_vectors.shape[1]
+            self.vectors = self.vectors.reshape(0, self.dimension)
+        if new_vectors.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {new_vectors.shape[1]} does not match index dimension {self.dimension}")
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.vectors = np.vstack([self.vectors, new_vectors])
+        self._changed(added_ids=new_ids, added_vectors=new_vectors)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        ids = np.fromiter((int(i) for i in ids), dtype=np.int64)
+        if not len(ids) or not len(self.ids):
+            return
+        keep = ~np.isin(self.ids, ids)
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.vectors = self.vectors[keep]
+            self._changed(removed_ids=ids)
+
+    def search(self, query: "np.ndarray", k: int = 20) -> List[Tuple[int, float]]:
+        """Return up to k ``(id, cosine similarity)`` pairs, best first"""
+        if not len(self.ids) or query is None or query.shape[-1] != self.dimension:
+            return []
+        if self._searcher is None:
+            threshold = getattr(settings, "INSIGHTS_VECTOR_IVF_THRESHOLD", 5000)
+            if len(self.ids) >= threshold:
+                nprobe = getattr(settings, "INSIGHTS_VECTOR_IVF_NPROBE", 8)
+                self._searcher = IVFIndex(self.ids, self.vectors, nprobe=nprobe)
+            else:
+                self._searcher = BruteForceIndex(self.ids, self.vectors)
+        return self._searcher.search(query.astype(np.float32), k)
+
+    def save(self, path: str) -> None:
+        """Write the vectors, and the IVF centroids so loading skips k-means"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        arrays = {"ids": self.ids, "vectors": self.vectors, "version": np.array(self.version)}
+        if isinstance(self._searcher, IVFIndex):
+            arrays["centroids"] = self._searcher.centroids
+            arrays["trained_size"] = np.array(self._searcher.trained_size)
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        with np.load(path) as data:
+            index = cls(ids=data["ids"], vectors=data["vectors"])
+            if "version" in data:
+                index.version = int(data["version"])
+            if "centroids" in data and len(index.ids):
+                nprobe = getattr(settings, "INSIGHTS_VECTOR_IVF_NPROBE", 8)
+                index._searcher = IVFIndex(
+                    index.ids,
+                    index.vectors,
+                    nprobe=nprobe,
+                    centroids=data["centroids"],
+                    trained_size=int(data["trained_size"]),
+                )
+            return index
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, bytes]]) -> "VectorIndex":
+        index = cls()
+        batch = []
+        for pk, data in rows:
+            vector = decode_vector(data)
+            if vector is not None:
+                batch.append((pk, vector))
+        if batch:
+            dimension = len(batch[-1][1])
+            index.upsert((pk, v) for pk, v in batch if len(v) == dimension)
+        return index
+
+
+# Loaded indexes per process: (namespace, user_id) -> (version, index);
+# user_id None is the index over every user
+_loaded: Dict[Tuple[str, Optional[int]], Tuple[int, VectorIndex]] = {}
+_loaded_lock = threading.Lock()
+
+
+def _scope(user_id: Optional[int]) -> str:
+    return "all" if user_id is None else str(user_id)
+
+
+def _index_path(namespace: str, user_id: Optional[int]) -> str:
+    directory = getattr(
+        settings, "INSIGHTS_VECTOR_INDEX_DIR", os.path.join(settings.MEDIA_ROOT, "vector_index")
+    )
+    return os.path.join(directory, f"{namespace}_{_scope(user_id)}.npz")
+
+
+def _version_path(path: str) -> str:
+    return path[: -len(".npz")] + ".version"
+
+
+def _read_version(path: str) -> int:
+    """Version of the index file, bumped on every write.
+
+    It outlives dropped files, so a rebuilt index never reuses a version
+    another process still has loaded.
+    """
+    try:
+        with open(_version_path(path)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 0
+
+
+def _persist(index: VectorIndex, path: str, namespace: str, user_id: Optional[int]) -> None:
+    """Save the index under the next version, then publish that version"""
+    index.version = _read_version(path) + 1
+    index.save(path)
+    version_path = _version_path(path)
+    tmp_path = f"{version_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(index.version))
+    os.replace(tmp_path, version_path)
+    with _loaded_lock:
+        _loaded[(namespace, user_id)] = (index.version, index)
+
+
+def _lock_key(namespace: str, user_id: Optional[int]) -> str:
+    return f"insights:vector_index:lock:{namespace}:{_scope(user_id)}"
+
+
+def _dirty_key(namespace: str, user_id: Optional[int]) -> str:
+    return f"insights:vector_index:dirty:{namespace}:{_scope(user_id)}"
+
+
+def _rows_from_db(namespace: str, user_id: Optional[int]):
+    if namespace == ENTRIES:
+        from entries.models import Entry
+
+        queryset = Entry.objects.filter(embedding__isnull=False)
+        if user_id is not None:
+            queryset = queryset.filter(user_id=user_id)
+    else:
+        from .models import Insight
+
+        queryset = Insight.objects.filter(embedding__isnull=False)
+        if user_id is not None:
+            queryset = queryset.filter(entry__user_id=user_id)
+    return queryset.values_list("id", "embedding").iterator()
+
+
+def _rebuild(namespace: str, user_id: Optional[int]) -> VectorIndex:
+    """Rebuild an index from the database and persist it; the caller holds its lock"""
+    # Cleared first, so changes marked while reading are rebuilt again later
+    cache.delete(_dirty_key(namespace, user_id))
+    index = VectorIndex.from_rows(_rows_from_db(namespace, user_id))
+    path = _index_path(namespace, user_id)
+    if len(index):
+        _persist(index, path, namespace, user_id)
+    else:
+        _drop_file(path, namespace, user_id)
+    return index
+
+
+def _drop_file(path: str, namespace: str, user_id: Optional[int]) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+    with _loaded_lock:
+        _loaded.pop((namespace, user_id), None)
+
+
+def get_index(namespace: str, user_id: Optional[int]) -> Optional[VectorIndex]:
+    """Index for a user (or every user when None), loaded from disk or
+    rebuilt from stored embeddings"""
+    if np is None:
+        return None
+    if cache.get(_dirty_key(namespace, user_id)):
+        # A writer gave up on the lock; rebuild unless a writer holds it now
+        # (it rebuilds before releasing)
+        lock_key = _lock_key(namespace, user_id)
+        if cache.add(lock_key, True, timeout=30):
+            try:
+                return _rebuild(namespace, user_id)
+            finally:
+                cache.delete(lock_key)
+    path = _index_path(namespace, user_id)
+    key = (namespace, user_id)
+    if not os.path.exists(path):
+        index = VectorIndex.from_rows(_rows_from_db(namespace, user_id))
+        if len(index):
+            _persist(index, path, namespace, user_id)
+        return index
+
+    # Read before loading: a file newer than this version is reloaded next time
+    version = _read_version(path)
+    with _loaded_lock:
+        cached = _loaded.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    try:
+        index = VectorIndex.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load vector index {path}, rebuilding: {e}")
+        return VectorIndex.from_rows(_rows_from_db(namespace, user_id))
+    with _loaded_lock:
+        _loaded[key] = (version, index)
+    return index
+
+
+def update_index(namespace: str, user_id: int, upserts=(), removals=()) -> None:
+    """Apply committed vector changes to a user's persisted index, and to the
+    index over every user once that has been built.
+
+    Writers serialise on a short cache lock. One that cannot take it marks the
+    index dirty instead, and the lock holder (or else the next reader)
+    rebuilds it from the database, which already holds the change.
+    """
+    if np is None:
+        return
+    upserts, removals = list(upserts), list(removals)
+    _apply(namespace, user_id, upserts, removals)
+    if os.path.exists(_index_path(namespace, None)):
+        _apply(namespace, None, upserts, removals)
+    else:
+        # Not built yet; a build racing this change is redone on the next read
+        cache.set(_dirty_key(namespace, None), True, None)
+
+
+def _apply(namespace: str, user_id: Optional[int], upserts, removals) -> None:
+    path = _index_path(namespace, user_id)
+    lock_key = _lock_key(namespace, user_id)
+    deadline = time.monotonic() + 5
+    while not cache.add(lock_key, True, timeout=30):
+        if time.monotonic() > deadline:
+            logger.warning(f"Vector index {path} busy, marking it for rebuild")
+            cache.set(_dirty_key(namespace, user_id), True, None)
+            return
+        time.sleep(0.05)
+
+    try:
+        index = get_index(namespace, user_id)
+        index.remove(removals)
+        try:
+            index.upsert(upserts)
+        except ValueError as e:
+            # Embedder changed; rebuild from the database on next read
+            logger.warning(f"Dropping vector index {path}: {e}")
+            _drop_file(path, namespace, user_id)
+            return
+        _persist(index, path, namespace, user_id)
+    finally:
+        if cache.get(_dirty_key(namespace, user_id)):
+            _rebuild(namespace, user_id)
+        cache.delete(lock_key)
+
+
+def drop_index(namespace: str, user_id: Optional[int]) -> None:
+    _drop_file(_index_path(namespace, user_id), namespace, user_id)
+
+
+def remove_on_commit(user_id: int, entry_ids=(), insight_ids=()) -> None:
+    """Drop deleted entries' and insights' vectors once the deletion commits"""
+    entry_ids, insight_ids = list(entry_ids), list(insight_ids)
+
+    def remove():
+        try:
+            if entry_ids:
+                update_index(ENTRIES, user_id, removals=entry_ids)
+            if insight_ids:
+                update_index(INSIGHTS, user_id, removals=insight_ids)
+        except Exception as e:
+            logger.warning(f"Vector index removal failed for user {user_id}: {e}")
+
+    if entry_ids or insight_ids:
+        transaction.on_commit(remove)
+
+
+def search_text(namespace: str, user_id: Optional[int], text: str, k: int = 20) -> List[Tuple[int, float]]:
+    """Embed text and return the k most similar ``(id, similarity)`` pairs.
+
+    Without a user (demo mode) the index over every user is searched.
+    """
+    from .clients import get_embedder
+
+    embedder = get_embedder()
+    if embedder is None or not text:
+        return []
+    query = embedder.embed([text])[0]
+    index = get_index(namespace, user_id)
+    if index is None:
+        return []
+    min_similarity = getattr(settings, "INSIGHTS_SEMANTIC_MIN_SIMILARITY", 0.1)
+    return [(pk, score) for pk, score in index.search(query, k) if score >= min_similarity]
+
+
+def in_rank_order(queryset, ids: List[int]) -> list:
+    """Objects of the queryset with the given ids, in the order of ``ids``"""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
@@ -1,15 +1,35 @@
+import json
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Avg, Count, Q
-import json
-from .models import Insight
-from .serializers import InsightSerializer
-from .geocoding_service import AIGeocodingService
-from .ai_service import AIInsightExtractor
+from rest_framework.renderers import JSONRenderer
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
+from django.http import StreamingHttpResponse
+from . import places, query_service, rollups, vector_index
+from .models import CategorySentiment, Insight, PlaceLocation
+from .serializers import InsightSerializer, PlaceSummarySerializer
+from .pagination import EntryCursorPagination, PlacePagination
+from .renderers import EventStreamRenderer, NDJSONRenderer
+from .filters import filter_insights, parse_bool
+from .clients import get_insight_extractor, get_geocoding_service
 from categories.models import Category
 from entries.models import Entry
-from entries.serializers import EntrySerializer
+from entries.serializers import CategoryMatchEntrySerializer, EntrySerializer
+
+# Rows fetched and serialized per batch by the NDJSON stream
+STREAM_BATCH_SIZE = 500
 
 
 class InsightViewSet(viewsets.ModelViewSet):
@@ -17,34 +37,105 @@ class InsightViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        """Return insights for entries owned by the authenticated user, or all insights if no user"""
+        """Return insights for entries owned by the authenticated user, or all insights if no user.
+
+        Supports ``category_type``, ``category_id`` and ``has_coordinates`` filters.
+        """
         if self.request.user.is_authenticated:
-            return Insight.objects.filter(entry__user=self.request.user)
+            queryset = Insight.objects.filter(entry__user=self.request.user)
         else:
             # For demo purposes, return all insights when not authenticated
-            return Insight.objects.all()
+            queryset = Insight.objects.all()
+        return filter_insights(queryset.select_related("category"), self.request.query_params)
+
+    def _paginated(self, items):
+        page = self.paginate_queryset(items)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(items, many=True)
+        return Response(serializer.data)
+
+    def _rollup_item(self, insight):
+        return (insight.category_id, insight.sentiment_score, insight.entry.created_at)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            insight = serializer.save()
+            rollups.apply_changes(insight.entry.user_id, added=[self._rollup_item(insight)])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            before = self._rollup_item(serializer.instance)
+            insight = serializer.save()
+            rollups.apply_changes(
+                insight.entry.user_id, added=[self._rollup_item(insight)], removed=[before]
+            )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            item = self._rollup_item(instance)
+            insight_id = instance.id
+            instance.delete()
+            rollups.apply_changes(instance.entry.user_id, removed=[item])
+            vector_index.remove_on_commit(instance.entry.user_id, insight_ids=[insight_id])
 
     @action(detail=False, methods=["get"])
     def by_category(self, request):
-        """Get insights grouped by category"""
-        category_id = request.query_params.get("category_id")
-        if category_id:
-            insights = self.get_queryset().filter(category_id=category_id)
-        else:
-            insights = self.get_queryset()
+        """Get insights grouped by category (``category_id`` narrows to one)"""
+        insights = self.get_queryset().order_by("category__name", "-created_at", "id")
+        return self._paginated(insights)
 
-        serializer = self.get_serializer(insights, many=True)
-        return Response(serializer.data)
+    @action(
+        detail=False,
+        methods=["get"],
+        renderer_classes=[JSONRenderer, NDJSONRenderer],
+    )
+    def stream(self, request):
+        """Every matching insight as newline-delimited JSON, without paging.
+
+        Takes the same filters as the list endpoint; rows are read and
+        serialized in batches so memory stays flat for large result sets.
+        """
+        queryset = self.get_queryset().order_by("id")
+        context = self.get_serializer_context()
+
+        def lines():
+            batch = []
+            for insight in queryset.iterator(chunk_size=STREAM_BATCH_SIZE):
+                batch.append(insight)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield self._ndjson(batch, context)
+                    batch = []
+            if batch:
+                yield self._ndjson(batch, context)
+
+        response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def _ndjson(self, insights, context):
+        data = self.get_serializer_class()(insights, many=True, context=context).data
+        return "".join(json.dumps(item, default=str) + "\n" for item in data)
 
     @action(detail=False, methods=["get"])
     def sentiment_summary(self, request):
         """Get sentiment summary by category"""
-        queryset = self.get_queryset()
+        # Read the per-user rollups instead of aggregating every insight
+        rollup_rows = CategorySentiment.objects.all()
+        if request.user.is_authenticated:
+            rollup_rows = rollup_rows.filter(user=request.user)
 
-        # Group by category and calculate average sentiment
         sentiment_data = (
-            queryset.values("category__name", "category__category_type")
-            .annotate(avg_sentiment=Avg("sentiment_score"), count=Count("id"))
+            rollup_rows.values("category__name", "category__category_type")
+            .annotate(total=Sum("sentiment_sum"), count=Sum("insight_count"))
+            .annotate(
+                avg_sentiment=ExpressionWrapper(
+                    F("total") * 1.0 / F("count"), output_field=FloatField()
+                )
+            )
+            .values("category__name", "category__category_type", "avg_sentiment", "count")
             .order_by("category__name")
         )
 
@@ -52,7 +143,7 @@ class InsightViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"])
     def search(self, request):
-        """Search insights by text snippet"""
+        """Search insights by text snippet, or by meaning with ``mode=semantic``"""
         query = request.query_params.get("q", "")
         if not query:
             return Response(
@@ -60,13 +151,17 @@ class InsightViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        insights = self.get_queryset().filter(text_snippet__icontains=query)
-        serializer = self.get_serializer(insights, many=True)
-        return Response(serializer.data)
+        if request.query_params.get("mode") == "semantic":
+            user_id = request.user.id if request.user.is_authenticated else None
+            hits = vector_index.search_text(vector_index.INSIGHTS, user_id, query, k=vector_index.SEARCH_LIMIT)
+            insights = vector_index.in_rank_order(self.get_queryset(), [pk for pk, _ in hits])
+        else:
+            insights = self.get_queryset().filter(text_snippet__icontains=query).order_by("-created_at", "id")
+        return self._paginated(insights)
 
     @action(detail=False, methods=["get"])
     def entries_by_category(self, request):
-        """Get all entries that have insights for a specific category"""
+        """Entries that have insights for a category, newest first, cursor-paginated"""
         category_name = request.query_params.get("category_name")
         category_type = request.query_params.get("category_type")
 
@@ -76,27 +171,97 @@ class InsightViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Get insights for the category
-        insights_queryset = self.get_queryset()
+        # One Entry query: EXISTS filters to entries with a matching insight,
+        # a correlated COUNT annotates how many matched
+        category_filter = Q()
         if category_name:
-            insights_queryset = insights_queryset.filter(
-                category__name__icontains=category_name
-            )
+            category_filter &= Q(category__name__icontains=category_name)
         if category_type:
-            insights_queryset = insights_queryset.filter(
-                category__category_type=category_type
-            )
+            category_filter &= Q(category__category_type=category_type)
+        matching_insights = Insight.objects.filter(category_filter, entry=OuterRef("pk"))
+        matched_counts = (
+            matching_insights.order_by().values("entry").annotate(matches=Count("pk")).values("matches")
+        )
+
+        entries = (
+            self._query_entries_queryset(request)
+            .filter(Exists(matching_insights))
+            .annotate(matched_insight_count=Subquery(matched_counts[:1], output_field=IntegerField()))
+            .select_related("user")
+            .prefetch_related("insights__category", "documents", "faces")
+        )
 
-        # Get unique entries from these insights
-        entries = set()
-        for insight in insights_queryset:
-            entries.add(insight.entry)
+        paginator = EntryCursorPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        serializer = CategoryMatchEntrySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        # Serialize entries
-        from entries.serializers import EntrySerializer
+    @action(detail=False, methods=["get"])
+    def places(self, request):
+        """Place categories mentioned in the user's entries, most recent first.
 
-        serializer = EntrySerializer(list(entries), many=True)
-        return Response(serializer.data)
+        Each carries its entry count, location once geocoded, average
+        sentiment and last-mentioned date, all from one aggregate query.
+        ``has_coordinates`` narrows to located or unlocated places.
+        """
+        user = request.user if request.user.is_authenticated else None
+        queryset = places.summaries(user)
+        has_coordinates = parse_bool(request.query_params.get("has_coordinates"))
+        if has_coordinates is not None:
+            queryset = queryset.filter(place_latitude__isnull=not has_coordinates)
+
+        paginator = PlacePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = PlaceSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["post"], url_path=r"places/(?P<category_id>\d+)/location")
+    def place_location(self, request, category_id=None):
+        """Set the user's own coordinates for a place category.
+
+        They apply to this user only; the category's shared geocoded location
+        is left as it is.
+        """
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Sign in to set place locations"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        try:
+            latitude = float(request.data.get("latitude"))
+            longitude = float(request.data.get("longitude"))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "latitude and longitude are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response(
+                {"error": "latitude or longitude is out of range"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        mentioned = Insight.objects.filter(category_id=category_id, entry__user=request.user)
+        category = Category.objects.filter(
+            pk=category_id, category_type="place", pk__in=mentioned.values("category_id")
+        ).first()
+        if category is None:
+            return Response({"error": "Place not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        location_name = request.data.get("location_name") or category.location_name or category.name
+        PlaceLocation.objects.update_or_create(
+            user=request.user,
+            category=category,
+            defaults={"latitude": latitude, "longitude": longitude, "location_name": location_name[:255]},
+        )
+        return Response(
+            {
+                "id": category.id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "location_name": location_name[:255],
+            }
+        )
 
     @action(detail=False, methods=["post"])
     def geocode_place(self, request):
@@ -111,7 +276,7 @@ class InsightViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            geocoding_service = AIGeocodingService()
+            geocoding_service = get_geocoding_service()
             result = geocoding_service.geocode_place(place_name, context)
             
             if result:
@@ -133,6 +298,16 @@ class InsightViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    def _query_entries_queryset(self, request):
+        # Get all entries for the user (or all entries if not authenticated)
+        if request.user.is_authenticated:
+            return Entry.objects.filter(user=request.user)
+        return Entry.objects.all()
+
+    def _query_user_id(self, request):
+        # None searches every user's embeddings, matching the demo querysets
+        return request.user.id if request.user.is_authenticated else None
+
     @action(detail=False, methods=["post"])
     def ai_query(self, request):
         """Use AI to query the database and return relevant entries"""
@@ -145,162 +320,30 @@ class InsightViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Get all entries for the user (or all entries if not authenticated)
-            if request.user.is_authenticated:
-                entries_queryset = Entry.objects.filter(user=request.user)
-            else:
-                entries_queryset = Entry.objects.all()
-            
-            # Get all insights for these entries
-            insights_queryset = self.get_queryset()
-            
+            ai_extractor = get_insight_extractor()
+
             # Use AI to analyze the query and find relevant entries
-            ai_extractor = AIInsightExtractor()
-            
-            # Create a comprehensive prompt for the AI to understand the query
-            # and find relevant entries based on content, insights, and categories
-            prompt = f"""
-            You are an AI assistant helping to find relevant diary entries based on a user's query.
-            
-            User Query: "{query}"
-            
-            Based on this query, I need you to:
-            1. Understand what the user is looking for
-            2. Identify relevant keywords, topics, or themes
-            3. Suggest search strategies to find matching entries
-            
-            Consider these aspects when matching:
-            - Entry titles and content
-            - Extracted insights (places, people, activities, emotions)
-            - Categories and sentiment
-            - Time periods or dates mentioned
-            
-            Return a JSON response with:
-            {{
-                "search_keywords": ["keyword1", "keyword2", ...],
-                "search_strategies": ["strategy1", "strategy2", ...],
-                "suggested_filters": {{
-                    "categories": ["category1", "category2"],
-                    "sentiment_range": {{"min": -1.0, "max": 1.0}},
-                    "time_period": "recent|all|specific_date"
-                }}
-            }}
-            """
-            
-            # Get AI response
-            response = ai_extractor.model.generate_content(prompt)
-            ai_analysis = getattr(response, "text", "")
-            
-            # Parse AI response (simplified - in production you'd want more robust parsing)
-            import json
-            import re
-            
-            try:
-                # Extract JSON from AI response
-                json_match = re.search(r'\{.*\}', ai_analysis, re.DOTALL)
-                if json_match:
-                    ai_data = json.loads(json_match.group())
-                    search_keywords = ai_data.get("search_keywords", [])
-                    search_strategies = ai_data.get("search_strategies", [])
-                    suggested_filters = ai_data.get("suggested_filters", {})
-                else:
-                    # Fallback to simple keyword extraction
-                    search_keywords = query.lower().split()
-                    search_strategies = ["content_search", "insight_search"]
-                    suggested_filters = {}
-            except:
-                # Fallback parsing
-                search_keywords = query.lower().split()
-                search_strategies = ["content_search", "insight_search"]
-                suggested_filters = {}
-            
-            # Perform the search based on AI analysis
-            matching_entries = set()
-            
-            # Search in entry content and titles
-            for keyword in search_keywords:
-                content_matches = entries_queryset.filter(
-                    Q(title__icontains=keyword) | Q(content__icontains=keyword)
-                )
-                matching_entries.update(content_matches)
-            
-            # Search in insights
-            for keyword in search_keywords:
-                insight_matches = insights_queryset.filter(
-                    Q(text_snippet__icontains=keyword) | 
-                    Q(category__name__icontains=keyword)
-                )
-                for insight in insight_matches:
-                    matching_entries.add(insight.entry)
-            
-            # Apply suggested filters
-            if suggested_filters.get("categories"):
-                category_matches = entries_queryset.filter(
-                    insights__category__name__in=suggested_filters["categories"]
-                ).distinct()
-                matching_entries.update(category_matches)
-            
-            # Convert to list and serialize
-            matching_entries_list = list(matching_entries)
-            
-            # Sort by relevance (you could implement more sophisticated ranking)
-            matching_entries_list.sort(key=lambda x: x.created_at, reverse=True)
-            
-            # Limit results to top 10
-            matching_entries_list = matching_entries_list[:10]
-            
+            analysis = query_service.analyze_query(ai_extractor.model, query)
+            matching_entries_list = query_service.find_relevant_entries(
+                self._query_entries_queryset(request),
+                self.get_queryset(),
+                query,
+                analysis["search_keywords"],
+                analysis["suggested_filters"],
+                user_id=self._query_user_id(request),
+            )
+
             # Generate AI answer using the found entries as context
-            ai_answer = ""
-            if matching_entries_list:
-                try:
-                    # Create context from the found entries
-                    context_entries = []
-                    for entry in matching_entries_list:
-                        context_entries.append({
-                            "title": entry.title or "Untitled Entry",
-                            "content": entry.content,
-                            "date": entry.created_at.strftime("%Y-%m-%d"),
-                            "sentiment": entry.overall_sentiment,
-                            "location": entry.location_name
-                        })
-                    
-                    # Generate AI answer using the context
-                    answer_prompt = f"""
-                    You are an AI assistant helping to answer questions about a user's diary entries.
-                    
-                    User Question: "{query}"
-                    
-                    Based on the following diary entries, please provide a helpful and insightful answer:
-                    
-                    {json.dumps(context_entries, indent=2)}
-                    
-                    Guidelines for your response:
-                    1. Answer the user's question directly and helpfully
-                    2. Reference specific entries when relevant
-                    3. Provide insights and patterns you notice
-                    4. Be conversational and personal
-                    5. If the question can't be answered from the entries, say so politely
-                    6. Keep the response concise but informative
-                    
-                    Provide your answer in a natural, conversational tone.
-                    """
-                    
-                    answer_response = ai_extractor.model.generate_content(answer_prompt)
-                    ai_answer = getattr(answer_response, "text", "").strip()
-                    
-                except Exception as answer_error:
-                    print(f"Failed to generate AI answer: {answer_error}")
-                    ai_answer = "I found relevant entries but couldn't generate a specific answer. Please review the entries below."
-            
+            ai_answer = query_service.generate_answer(
+                ai_extractor.model, query, matching_entries_list, analysis["search_keywords"]
+            )
+
             serializer = EntrySerializer(matching_entries_list, many=True)
             
             return Response({
                 "query": query,
                 "ai_answer": ai_answer,
-                "ai_analysis": ai_analysis,
-                "search_keywords": search_keywords,
-                "search_strategies": search_strategies,
-                "suggested_filters": suggested_filters,
+                **analysis,
                 "results_count": len(matching_entries_list),
                 "entries": serializer.data
             })
@@ -310,3 +353,60 @@ class InsightViewSet(viewsets.ModelViewSet):
                 {"error": f"AI query failed: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+    @action(
+        detail=False,
+        methods=["get", "post"],
+        renderer_classes=[JSONRenderer, EventStreamRenderer],
+    )
+    def ai_query_stream(self, request):
+        """Streaming ai_query over Server-Sent Events.
+
+        Sends an ``analysis`` event, then ``entries`` with the matched entries,
+        then ``token`` events as the answer is generated and a final ``done``.
+        Accepts the query as ``query`` in the body (POST) or query string (GET).
+        """
+        query = request.data.get("query") or request.query_params.get("query", "")
+
+        if not query:
+            return Response(
+                {"error": "Query is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        entries_queryset = self._query_entries_queryset(request)
+        insights_queryset = self.get_queryset()
+        user_id = self._query_user_id(request)
+
+        def events():
+            try:
+                ai_extractor = get_insight_extractor()
+                analysis = query_service.analyze_query(ai_extractor.model, query)
+                yield query_service.format_sse("analysis", {"query": query, **analysis})
+
+                matching_entries_list = query_service.find_relevant_entries(
+                    entries_queryset,
+                    insights_queryset,
+                    query,
+                    analysis["search_keywords"],
+                    analysis["suggested_filters"],
+                    user_id=user_id,
+                )
+                yield query_service.format_sse("entries", {
+                    "results_count": len(matching_entries_list),
+                    "entries": EntrySerializer(matching_entries_list, many=True).data,
+                })
+
+                for text in query_service.stream_answer(
+                    ai_extractor.model, query, matching_entries_list, analysis["search_keywords"]
+                ):
+                    yield query_service.format_sse("token", {"text": text})
+                yield query_service.format_sse("done", {})
+            except Exception as e:
+                yield query_service.format_sse("error", {"error": f"AI query failed: {str(e)}"})
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Let nginx pass events through as they are produced
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -39,3 +40,16 @@ def setup_periodic_tasks(sender, **kwargs):
         logger.warning(f"Could not set up periodic tasks: {e}")
         # Skip if insights app not available
         pass
+
+
+@worker_process_init.connect
+def warm_up_ai_clients(**kwargs):
+    """Build the AI clients once in each worker process before tasks arrive"""
+    try:
+        from insights.clients import warm_up
+
+        warm_up()
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.warning(f"Could not warm up AI clients: {e}")
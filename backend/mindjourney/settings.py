@@ -129,12 +129,134 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache shared by web and worker processes (coalescing, locks, AI caches).
+# Without a configured Redis URL each process uses its own local memory cache.
+REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+CACHE_URL = config("CACHE_URL", default=config("REDIS_URL", default=""))
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": "mindjourney",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "mindjourney",
+        }
+    }
+
+# Insight extraction scheduling
+# Triggers for the same entry within this many seconds run as one task
+INSIGHTS_EXTRACTION_DEBOUNCE_SECONDS = config(
+    "INSIGHTS_EXTRACTION_DEBOUNCE_SECONDS", default=5, cast=int
+)
+# Safety expiry for the per-entry processing lock
+INSIGHTS_EXTRACTION_LOCK_TIMEOUT = config(
+    "INSIGHTS_EXTRACTION_LOCK_TIMEOUT", default=600, cast=int
+)
+# How long past the debounce window a queued-but-not-started extraction
+# still absorbs new triggers (allowance for queue delay)
+INSIGHTS_EXTRACTION_PENDING_TTL = config(
+    "INSIGHTS_EXTRACTION_PENDING_TTL", default=60, cast=int
+)
+
+# Long entries and documents are analysed in chunks of this many tokens
+INSIGHTS_CHUNK_TOKENS = config("INSIGHTS_CHUNK_TOKENS", default=4000, cast=int)
+# Chunks analysed in parallel per entry
+INSIGHTS_CHUNK_CONCURRENCY = config("INSIGHTS_CHUNK_CONCURRENCY", default=4, cast=int)
+# Caps on attached document text included in the analysis
+INSIGHTS_MAX_DOCUMENT_CHARS = config("INSIGHTS_MAX_DOCUMENT_CHARS", default=50000, cast=int)
+INSIGHTS_MAX_DOCUMENTS_TOTAL_CHARS = config(
+    "INSIGHTS_MAX_DOCUMENTS_TOTAL_CHARS", default=200000, cast=int
+)
+
+# Entry list responses carry only this many characters of each entry's content
+ENTRY_LIST_PREVIEW_CHARS = config("ENTRY_LIST_PREVIEW_CHARS", default=300, cast=int)
+
+# Map clustering
+# Approximate on-screen width of a cluster cell; smaller means more, finer clusters
+ENTRY_CLUSTER_CELL_PIXELS = config("ENTRY_CLUSTER_CELL_PIXELS", default=60, cast=int)
+# Cluster tiles are also dropped whenever an entry is geocoded, moved or re-scored
+ENTRY_CLUSTER_CACHE_SECONDS = config("ENTRY_CLUSTER_CACHE_SECONDS", default=86400, cast=int)
+
+# Document uploads
+# Larger uploads are rejected with 413 while they stream in
+DOCUMENT_MAX_UPLOAD_BYTES = config("DOCUMENT_MAX_UPLOAD_BYTES", default=25 * 1024 * 1024, cast=int)
+# Only the first pages of long PDFs are extracted
+DOCUMENT_MAX_PDF_PAGES = config("DOCUMENT_MAX_PDF_PAGES", default=200, cast=int)
+# Images larger than this are refused before their pixels are decoded
+DOCUMENT_MAX_IMAGE_PIXELS = config("DOCUMENT_MAX_IMAGE_PIXELS", default=40000000, cast=int)
+# Extracted text is truncated to this many characters; later PDF pages are skipped
+DOCUMENT_MAX_TEXT_CHARS = config("DOCUMENT_MAX_TEXT_CHARS", default=500000, cast=int)
+# Processes laying out PDF pages in parallel per extraction worker (1 = inline)
+DOCUMENT_EXTRACTION_WORKERS = config(
+    "DOCUMENT_EXTRACTION_WORKERS", default=min(4, os.cpu_count() or 1), cast=int
+)
+# A PDF page taking longer than this is skipped
+DOCUMENT_PAGE_TIMEOUT_SECONDS = config("DOCUMENT_PAGE_TIMEOUT_SECONDS", default=30, cast=int)
+# Images are downscaled to this longest side and converted to grayscale before OCR
+DOCUMENT_OCR_MAX_SIDE = config("DOCUMENT_OCR_MAX_SIDE", default=2000, cast=int)
+# Hash uploads while they stream; files above 2.5MB go to a temporary file, not memory
+FILE_UPLOAD_HANDLERS = [
+    "entries.upload_handlers.HashingUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+# Longest time a document status event stream stays open
+DOCUMENT_EVENTS_TIMEOUT_SECONDS = config("DOCUMENT_EVENTS_TIMEOUT_SECONDS", default=120, cast=int)
+
+# Category canonicalization
+# Fold new category names into an existing one of the same type at least this
+# similar (difflib ratio, e.g. 0.9); 0 disables fuzzy matching
+CATEGORY_FUZZY_MATCH_CUTOFF = config("CATEGORY_FUZZY_MATCH_CUTOFF", default=0.0, cast=float)
+
+# Offline geocoding
+# SQLite gazetteer built by load_gazetteer; checked before the geocoding model
+GEOCODING_GAZETTEER_PATH = config(
+    "GEOCODING_GAZETTEER_PATH", default=os.path.join(MEDIA_ROOT, "gazetteer.sqlite3")
+)
+# Without a country or region, the most populous match must be this many
+# times larger than the next one to be used; otherwise the model decides
+GEOCODING_GAZETTEER_DOMINANCE = config("GEOCODING_GAZETTEER_DOMINANCE", default=10.0, cast=float)
+# Place names that could not be geocoded are not retried in bulk runs for this long
+GEOCODING_MISS_CACHE_SECONDS = config("GEOCODING_MISS_CACHE_SECONDS", default=86400, cast=int)
+
+# Semantic search
+# Dotted path of the text embedder; the default hashing embedder runs offline
+INSIGHTS_EMBEDDER = config("INSIGHTS_EMBEDDER", default="insights.embeddings.HashingEmbedder")
+# Where per-user vector indexes are persisted
+INSIGHTS_VECTOR_INDEX_DIR = config(
+    "INSIGHTS_VECTOR_INDEX_DIR", default=os.path.join(MEDIA_ROOT, "vector_index")
+)
+# Indexes with at least this many vectors switch from brute force to IVF
+INSIGHTS_VECTOR_IVF_THRESHOLD = config("INSIGHTS_VECTOR_IVF_THRESHOLD", default=5000, cast=int)
+# IVF partitions scanned per query
+INSIGHTS_VECTOR_IVF_NPROBE = config("INSIGHTS_VECTOR_IVF_NPROBE", default=8, cast=int)
+# Fraction of an IVF index that may change or grow after k-means before it is retrained
+INSIGHTS_VECTOR_IVF_RETRAIN_DRIFT = config("INSIGHTS_VECTOR_IVF_RETRAIN_DRIFT", default=0.2, cast=float)
+# Hits below this cosine similarity are dropped
+INSIGHTS_SEMANTIC_MIN_SIMILARITY = config("INSIGHTS_SEMANTIC_MIN_SIMILARITY", default=0.1, cast=float)
+# Token budget for the entry excerpts sent with each ai_query answer prompt
+INSIGHTS_QUERY_CONTEXT_TOKENS = config("INSIGHTS_QUERY_CONTEXT_TOKENS", default=3000, cast=int)
+# Cache lifetimes for ai_query question analysis and answers
+INSIGHTS_QUERY_ANALYSIS_CACHE_SECONDS = config(
+    "INSIGHTS_QUERY_ANALYSIS_CACHE_SECONDS", default=86400, cast=int
+)
+INSIGHTS_QUERY_ANSWER_CACHE_SECONDS = config(
+    "INSIGHTS_QUERY_ANSWER_CACHE_SECONDS", default=3600, cast=int
+)
+
 # Celery Configuration (optional)
 try:
     import celery
 
-    CELERY_BROKER_URL = config("REDIS_URL", default="redis://localhost:6379/0")
-    CELERY_RESULT_BACKEND = config("REDIS_URL", default="redis://localhost:6379/0")
+    CELERY_BROKER_URL = REDIS_URL
+    CELERY_RESULT_BACKEND = REDIS_URL
     
     # Task retry configuration
     CELERY_TASK_SERIALIZER = 'json'
@@ -153,6 +275,21 @@ try:
     CELERY_TASK_RESULT_EXPIRES = 3600
     
     # Task routing and execution
+    # Interactive work (new/edited entries, reprocessing) and bulk work
+    # (retry sweeps) use separate queues; see insights/queues.py
+    CELERY_TASK_DEFAULT_QUEUE = "interactive"
+    CELERY_TASK_ROUTES = {
+        "insights.tasks.extract_insights_task": {"queue": "interactive"},
+        "insights.tasks.retry_unprocessed_entries": {"queue": "bulk"},
+        "insights.tasks.check_entry_processing_status": {"queue": "bulk"},
+        "entries.tasks.extract_document_text_task": {"queue": "documents"},
+    }
+    # Per-message priorities inside a queue (Redis: 0 is consumed first)
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        "queue_order_strategy": "priority",
+        "priority_steps": list(range(10)),
+    }
+    CELERY_TASK_DEFAULT_PRIORITY = 5
     CELERY_TASK_ALWAYS_EAGER = False
     CELERY_TASK_EAGER_PROPAGATES = True
     
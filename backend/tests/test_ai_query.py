@@ -0,0 +1,189 @@
+import json
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from entries.models import Entry
+from insights import views
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        FakeModel.calls += 1
+        if stream:
+            return iter([FakeResponse("You went "), FakeResponse("to Vienna.")])
+        if "search_keywords" in prompt:
+            return FakeResponse(json.dumps({"search_keywords": ["vienna"], "suggested_filters": {}}))
+        return FakeResponse("You went to Vienna.")
+
+
+class FakeExtractor:
+    model = FakeModel()
+
+
+@pytest.fixture
+def diary(monkeypatch):
+    cache.clear()
+    monkeypatch.setattr(views, "get_insight_extractor", lambda: FakeExtractor())
+    user = User.objects.create(username="traveller")
+    Entry.objects.create(user=user, title="Trip", content="Cake in Vienna", insights_processed=True)
+    Entry.objects.create(user=user, title="Home", content="Quiet day", insights_processed=True)
+
+
+def _events(response):
+    body = b"".join(response.streaming_content).decode()
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.mark.django_db
+def test_ai_query_returns_answer_and_entries(diary):
+    response = APIClient().post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json')
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ai_answer"] == "You went to Vienna."
+    assert [entry["title"] for entry in data["entries"]] == ["Trip"]
+
+
+@pytest.mark.django_db
+def test_ai_query_caches_analysis_and_answer(diary):
+    client = APIClient()
+    first = client.post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json').json()
+    calls = FakeModel.calls
+
+    again = client.post('/api/insights/ai_query/', {"query": "  where did I GO "}, format='json').json()
+    assert FakeModel.calls == calls
+    assert again["ai_answer"] == first["ai_answer"]
+
+    # Editing a matched entry invalidates the cached answer but not the analysis
+    trip = Entry.objects.get(title="Trip")
+    trip.content = "Cake in Vienna, then coffee"
+    trip.save()
+    client.post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json')
+    assert FakeModel.calls == calls + 1
+
+
+@pytest.mark.django_db
+def test_ai_query_answer_cache_follows_insight_changes(diary):
+    from categories.models import Category
+    from insights.models import Insight
+
+    client = APIClient()
+    client.post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json')
+    calls = FakeModel.calls
+
+    # New insights on a matched entry invalidate the answer, as do edits to them
+    trip = Entry.objects.get(title="Trip")
+    insight = Insight.objects.create(
+        entry=trip, category=Category.objects.create(name="Vienna", category_type="place"),
+        text_snippet="Vienna", sentiment_score=0.5, confidence_score=0.9, start_position=8, end_position=14,
+    )
+    client.post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json')
+    assert FakeModel.calls == calls + 1
+
+    insight.sentiment_score = -0.5
+    insight.save()
+    client.post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json')
+    assert FakeModel.calls == calls + 2
+
+    client.post('/api/insights/ai_query/', {"query": "Where did I go?"}, format='json')
+    assert FakeModel.calls == calls + 2
+
+
+@pytest.mark.django_db
+def test_unparsed_query_analysis_is_not_cached():
+    from insights.query_service import analyze_query
+
+    cache.clear()
+
+    class ProseModel:
+        calls = 0
+
+        def generate_content(self, prompt):
+            ProseModel.calls += 1
+            return FakeResponse("Search for trips")
+
+    first = analyze_query(ProseModel(), "Where did I go?")
+    assert first["search_keywords"] == ["where", "did", "i", "go?"]
+    analyze_query(ProseModel(), "Where did I go?")
+    assert ProseModel.calls == 2
+
+    analyze_query(FakeModel(), "Where did I go?")
+    calls = FakeModel.calls
+    assert analyze_query(FakeModel(), "Where did I go?")["search_keywords"] == ["vienna"]
+    assert FakeModel.calls == calls
+
+
+@pytest.mark.django_db
+def test_ai_query_stream_sends_entries_before_tokens(diary):
+    response = APIClient().get(
+        '/api/insights/ai_query_stream/', {"query": "Where did I go?"}, HTTP_ACCEPT="text/event-stream"
+    )
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/event-stream")
+
+    events = _events(response)
+    names = [name for name, _ in events]
+    assert names == ["analysis", "entries", "token", "token", "done"]
+    assert [entry["title"] for entry in events[1][1]["entries"]] == ["Trip"]
+    assert "".join(data["text"] for name, data in events if name == "token") == "You went to Vienna."
+
+
+@pytest.mark.django_db
+def test_retrieval_ranks_entries_in_a_single_query(django_assert_num_queries):
+    from categories.models import Category
+    from insights.models import Insight
+    from insights.query_service import find_matching_entries
+
+    user = User.objects.create(username="ranker")
+    cafe = Category.objects.create(name="Cafe Central", category_type="place")
+    mention = Entry.objects.create(user=user, title="Morning", content="Coffee then work")
+    titled = Entry.objects.create(user=user, title="Coffee tasting", content="Many beans")
+    tagged = Entry.objects.create(user=user, title="Afternoon", content="Sat down for a while")
+    Insight.objects.create(
+        entry=tagged, category=cafe, text_snippet="Sat down", sentiment_score=0.5,
+        confidence_score=0.9, start_position=0, end_position=8,
+    )
+    Entry.objects.create(user=user, title="Gym", content="Legs day")
+
+    # One ranking query plus fixed prefetches for the serializer
+    with django_assert_num_queries(5):
+        entries = find_matching_entries(
+            Entry.objects.filter(user=user).order_by(),
+            Insight.objects.filter(entry__user=user),
+            ["coffee"],
+            {"categories": ["Cafe Central"]},
+        )
+        ranked = [entry.id for entry in entries]
+    assert ranked == [titled.id, tagged.id, mention.id]
+
+
+@pytest.mark.django_db
+def test_answer_context_packs_relevant_passages_into_budget():
+    from insights.chunking import estimate_tokens
+    from insights.context_builder import build_context
+
+    user = User.objects.create(username="packer")
+    filler = "We walked around and talked about nothing much. " * 40
+    long_entry = Entry.objects.create(
+        user=user, title="Long day", content=filler + "\n\nFinally we had cake in Vienna.\n\n" + filler
+    )
+    other = Entry.objects.create(user=user, title="Other", content="Quiet evening at home.")
+
+    context = build_context([long_entry, other], ["vienna"], token_budget=150)
+
+    assert "cake in Vienna" in context.text
+    assert context.text.startswith("[1] ")
+    assert context.truncated
+    assert estimate_tokens(context.text) <= 150
+    assert context.tokens < estimate_tokens(long_entry.content)
@@ -0,0 +1,86 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from categories import canonical
+from categories.models import Category, CategoryAlias
+from entries.models import Entry
+from insights.models import CategorySentiment, Insight
+
+
+@pytest.fixture(autouse=True)
+def fresh_alias_map():
+    cache.clear()
+    canonical.reset()
+
+
+def test_match_key_folds_case_whitespace_unicode_and_plurals():
+    keys = {canonical.match_key(n) for n in ["Pizza", "pizza ", "ＰＩＺＺＡ", "pizzas", '"Pizza."']}
+    assert keys == {"pizza"}
+    assert canonical.match_key("Berries") == "berry"
+    assert canonical.match_key("Glass") == "glass"
+    assert canonical.clean_name("  New   York ") == "New York"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_resolve_category_reuses_canonical_category(settings):
+    first = canonical.resolve_category_id("Pizza", "meal")
+    assert canonical.resolve_category_id("pizzas ", "meal") == first
+    assert Category.objects.get().name == "Pizza"
+
+    settings.CATEGORY_FUZZY_MATCH_CUTOFF = 0.85
+    assert canonical.resolve_category_id("Pizzza", "meal") == first
+    assert CategoryAlias.objects.filter(alias="pizzza", category_id=first).exists()
+    assert canonical.resolve_category_id("Pasta", "meal") != first
+
+
+@pytest.mark.django_db
+def test_merge_command_folds_duplicates_and_repoints_insights():
+    user = User.objects.create(username="merger")
+    entry = Entry.objects.create(user=user, content="Pizza and more pizzas, pizza again")
+    pizza = Category.objects.create(name="Pizza", category_type="meal")
+    pizzas = Category.objects.create(name="pizzas", category_type="meal")
+    # Equal use, so the older category becomes the target
+    for category, start in ((pizza, 0), (pizza, 15), (pizzas, 0), (pizzas, 22)):
+        Insight.objects.create(
+            entry=entry, category=category, text_snippet="pizza", sentiment_score=0.5,
+            confidence_score=1.0, start_position=start, end_position=start + 5,
+        )
+
+    call_command("merge_categories")
+
+    assert list(Category.objects.values_list("name", flat=True)) == ["Pizza"]
+    # The insight repeating the target's span is dropped, the other one moves
+    assert sorted(Insight.objects.values_list("category_id", "start_position")) == [
+        (pizza.id, 0), (pizza.id, 15), (pizza.id, 22)
+    ]
+    assert CategorySentiment.objects.get(user=user).insight_count == 3
+    assert canonical.resolve_category_id("PIZZAS", "meal") == pizza.id
+
+
+@pytest.mark.django_db
+def test_merge_keeps_coordinates_and_each_users_latest_place_location():
+    from datetime import timedelta
+    from django.utils import timezone
+    from insights.models import PlaceLocation
+
+    alice = User.objects.create(username="alice")
+    bob = User.objects.create(username="bob")
+    prague = Category.objects.create(name="Prague", category_type="place")
+    praha = Category.objects.create(
+        name="Praha", category_type="place", latitude=50.08, longitude=14.43, location_name="Praha, CZ"
+    )
+    now = timezone.now()
+    for user, category, latitude, age in (
+        (alice, prague, 50.1, 2), (alice, praha, 50.2, 1), (bob, prague, 50.3, 1), (bob, praha, 50.4, 2),
+    ):
+        location = PlaceLocation.objects.create(user=user, category=category, latitude=latitude, longitude=14.4)
+        PlaceLocation.objects.filter(pk=location.pk).update(updated_at=now - timedelta(days=age))
+
+    canonical.merge_categories(prague, [praha])
+
+    prague.refresh_from_db()
+    assert (prague.latitude, prague.longitude, prague.location_name) == (50.08, 14.43, "Praha, CZ")
+    assert sorted(PlaceLocation.objects.values_list("user__username", "category_id", "latitude")) == [
+        ("alice", prague.id, 50.2), ("bob", prague.id, 50.3),
+    ]
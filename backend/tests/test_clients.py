@@ -0,0 +1,68 @@
+import pytest
+from insights import clients
+
+
+@pytest.fixture
+def factories(monkeypatch):
+    """Replace the client factories with counting stubs"""
+    built = []
+
+    def factory(name):
+        def build():
+            built.append(name)
+            return object()
+        return build
+
+    for name in clients._FACTORIES:
+        monkeypatch.setitem(clients._FACTORIES, name, factory(name))
+    clients.reset()
+    yield built
+    clients.reset()
+
+
+def test_clients_are_built_once_per_process(factories):
+    extractor = clients.get_insight_extractor()
+    assert clients.get_insight_extractor() is extractor
+    assert clients.get_geocoding_service() is not extractor
+    assert factories == ["insight_extractor", "geocoding_service"]
+
+    timings = clients.client_timings()
+    assert set(timings) == {"insight_extractor", "geocoding_service"}
+    assert all(seconds >= 0 for seconds in timings.values())
+    # A copy, so callers cannot change the registry's record
+    timings.clear()
+    assert len(clients.client_timings()) == 2
+
+
+def test_clients_are_rebuilt_after_a_fork(factories, monkeypatch):
+    extractor = clients.get_insight_extractor()
+    monkeypatch.setattr(clients, "_owner_pid", clients._owner_pid - 1)
+
+    # Clients inherited from the parent process are not reused
+    fresh = clients.get_insight_extractor()
+    assert fresh is not extractor
+    assert clients.get_insight_extractor() is fresh
+    assert factories == ["insight_extractor", "insight_extractor"]
+    assert list(clients.client_timings()) == ["insight_extractor"]
+
+
+def test_warm_up_builds_every_client_and_reports_timings(factories, monkeypatch):
+    def broken():
+        raise RuntimeError("no API key")
+
+    monkeypatch.setitem(clients._FACTORIES, "geocoding_service", broken)
+    timings = clients.warm_up()
+
+    # A client that cannot be built is skipped and built again on first use
+    assert set(timings) == {"sdk_import", "insight_extractor", "embedder"}
+    assert factories == ["insight_extractor", "embedder"]
+    with pytest.raises(RuntimeError):
+        clients.get_geocoding_service()
+
+
+def test_reset_drops_clients_and_timings(factories):
+    extractor = clients.get_insight_extractor()
+    clients.reset()
+    assert clients.client_timings() == {}
+    assert clients.get_insight_extractor() is not extractor
+    assert factories == ["insight_extractor", "insight_extractor"]
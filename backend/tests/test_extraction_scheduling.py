@@ -0,0 +1,74 @@
+import pytest
+from django.core.cache import cache
+from insights import tasks
+from insights.queues import SOURCE_DOCUMENT, SOURCE_UPDATE, SOURCE_RETRY
+
+
+@pytest.fixture
+def scheduled(monkeypatch, settings):
+    settings.INSIGHTS_EXTRACTION_DEBOUNCE_SECONDS = 5
+    cache.clear()
+    calls = []
+    monkeypatch.setattr(
+        tasks.extract_insights_task, "apply_async", lambda *args, **kwargs: calls.append(kwargs)
+    )
+    yield calls
+    cache.clear()
+
+
+def test_triggers_for_same_entry_are_coalesced(scheduled):
+    tasks.enqueue_extraction(1, SOURCE_DOCUMENT)
+    tasks.enqueue_extraction(1, SOURCE_DOCUMENT)
+    tasks.enqueue_extraction(1, SOURCE_UPDATE)
+    tasks.enqueue_extraction(2, SOURCE_UPDATE)
+
+    assert len(scheduled) == 2
+    assert all(call["countdown"] == 5 for call in scheduled)
+    assert [call["args"] for call in scheduled] == [[1], [2]]
+
+
+def test_bulk_trigger_does_not_absorb_interactive_one(scheduled):
+    tasks.enqueue_extraction(1, SOURCE_RETRY)
+    tasks.enqueue_extraction(1, SOURCE_UPDATE)
+
+    assert [call["queue"] for call in scheduled] == ["bulk", "interactive"]
+
+
+def test_entry_lock_is_exclusive():
+    cache.clear()
+    token = tasks._acquire_entry_lock(7)
+    assert token
+    assert tasks._acquire_entry_lock(7) is None
+    tasks._release_entry_lock(7, token)
+    assert tasks._acquire_entry_lock(7)
+    cache.clear()
+
+
+def test_locked_entry_reschedules_past_its_own_pending_marker(scheduled):
+    tasks.enqueue_extraction(1, SOURCE_UPDATE)
+    assert len(scheduled) == 1
+
+    # The task runs while another worker still holds the entry
+    holder = tasks._acquire_entry_lock(1)
+    assert tasks.extract_insights_task(1) is False
+    assert len(scheduled) == 2
+    assert scheduled[1]["args"] == [1] and scheduled[1]["countdown"] == 5
+
+    # Later triggers coalesce into the rescheduled run, not a stale marker
+    tasks.enqueue_extraction(1, SOURCE_UPDATE)
+    assert len(scheduled) == 2
+    tasks._release_entry_lock(1, holder)
+
+
+def test_locked_entry_reschedule_keeps_queue_and_priority(scheduled):
+    holders = [tasks._acquire_entry_lock(1), tasks._acquire_entry_lock(2)]
+    assert tasks.extract_insights_task(1, SOURCE_RETRY) is False
+    assert tasks.extract_insights_task(2, SOURCE_UPDATE) is False
+
+    retry, update = scheduled
+    assert (retry["queue"], retry["priority"]) == ("bulk", 9)
+    assert retry["kwargs"] == {"source": SOURCE_RETRY}
+    assert (update["queue"], update["priority"]) == ("interactive", 1)
+    assert update["kwargs"] == {"source": SOURCE_UPDATE}
+    for entry_id, holder in zip((1, 2), holders):
+        tasks._release_entry_lock(entry_id, holder)
@@ -0,0 +1,409 @@
+import pytest
+from django.core.management import call_command
+from insights import gazetteer
+from insights.geocoding_service import AIGeocodingService
+
+CITIES = [
+    # geonameid, name, asciiname, alternates, lat, lon, class, code, country, cc2, admin1, ..., population
+    ("2988507", "Paris", "Paris", "Parigi,Parijs", "48.85341", "2.3488", "P", "PPLC", "FR", "", "11", "75", "", "", "2138551"),
+    ("4717560", "Paris", "Paris", "", "33.66094", "-95.55551", "P", "PPLA2", "US", "", "TX", "277", "", "", "24782"),
+    ("4250542", "Springfield", "Springfield", "", "39.80172", "-89.64371", "P", "PPLA", "US", "", "IL", "167", "", "", "114394"),
+    ("4409896", "Springfield", "Springfield", "", "37.21533", "-93.29824", "P", "PPLA2", "US", "", "MO", "077", "", "", "169176"),
+    ("2761369", "Wien", "Wien", "Vienna,Vienne", "48.20849", "16.37208", "P", "PPLC", "AT", "", "09", "900", "", "", "1691468"),
+    ("3060972", "Bratislava", "Bratislava", "Pressburg", "48.14816", "17.10674", "P", "PPLC", "SK", "", "02", "", "", "", "423737"),
+]
+
+
+@pytest.fixture
+def gazetteer_file(settings, tmp_path):
+    cities = tmp_path / "cities.txt"
+    cities.write_text("\n".join("\t".join(row + ("", "", "Europe/Paris", "2024-01-01")) for row in CITIES))
+    countries = tmp_path / "countryInfo.txt"
+    countries.write_text(
+        "#ISO\tISO3\tISO-Numeric\tfips\tCountry\n"
+        "FR\tFRA\t250\tFR\tFrance\nUS\tUSA\t840\tUS\tUnited States\nAT\tAUT\t040\tAU\tAustria\n"
+    )
+    admin1 = tmp_path / "admin1.txt"
+    admin1.write_text("US.IL\tIllinois\tIllinois\t4896861\nUS.MO\tMissouri\tMissouri\t4398678\n")
+    settings.GEOCODING_GAZETTEER_PATH = str(tmp_path / "gazetteer.sqlite3")
+    call_command("load_gazetteer", str(cities), countries=str(countries), admin1=str(admin1))
+    return settings.GEOCODING_GAZETTEER_PATH
+
+
+def test_gazetteer_resolves_unambiguous_names_and_defers_the_rest(gazetteer_file):
+    assert gazetteer.lookup("Paris").full_name == "Paris, France"
+    assert gazetteer.lookup("  PARIS  ").country == "FR"
+    assert gazetteer.lookup("Paris, Texas") is None  # region not loaded: the model decides
+    assert gazetteer.lookup("Paris", context="USA").admin1 == "TX"
+    assert gazetteer.lookup("Parigi").id == 2988507
+    assert gazetteer.lookup("vienna").name == "Wien"
+
+    # Two similar-sized Springfields: the model has to decide unless told where
+    assert gazetteer.lookup("Springfield") is None
+    assert gazetteer.lookup("Springfield, Illinois").id == 4250542
+    assert gazetteer.lookup("Springfield", context="Missouri").id == 4409896
+    assert gazetteer.lookup("Springfield, France") is None
+    assert gazetteer.lookup("Atlantis") is None
+
+    assert [p.name for p in gazetteer.suggest("pa")] == ["Paris", "Paris"]
+    assert [p.name for p in gazetteer.suggest("Pres")] == ["Bratislava"]
+
+
+def test_geocoding_service_uses_the_gazetteer_before_the_model(gazetteer_file):
+    class FailingModel:
+        def generate_content(self, prompt):
+            raise AssertionError("model must not be called")
+
+    service = AIGeocodingService.__new__(AIGeocodingService)
+    service.model = FailingModel()
+    assert service.geocode_place("Bratislava") == (48.14816, 17.10674, "Bratislava, SK")
+
+    service.model = None
+    with pytest.raises(RuntimeError):
+        service.geocode_place("Springfield")
+
+
+@pytest.mark.django_db
+def test_within_finds_entries_by_bounding_box_and_radius():
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from entries import geo
+    from entries.models import Entry
+
+    assert geo.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    user = User.objects.create(username="traveller")
+    other = User.objects.create(username="stranger")
+    places = {
+        "Vienna": (48.2082, 16.3738),
+        "Bratislava": (48.1486, 17.1077),
+        "Prague": (50.0755, 14.4378),
+        "Suva": (-18.1416, 178.4419),
+        "Apia": (-13.8333, -171.7667),
+    }
+    for name, (latitude, longitude) in places.items():
+        Entry.objects.create(user=user, title=name, content=f"Day in {name}", latitude=latitude, longitude=longitude)
+    Entry.objects.create(user=other, title="Vienna too", content="x", latitude=48.2, longitude=16.37)
+    Entry.objects.create(user=user, title="Nowhere", content="No place")
+    vienna = Entry.objects.get(title="Vienna")
+    assert vienna.geohash == geo.encode(48.2082, 16.3738)
+
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def titles(params):
+        response = client.get('/api/entries/within/', params)
+        assert response.status_code == 200, response.json()
+        return [item["title"] for item in response.json()]
+
+    assert sorted(titles({"bbox": "16,48,17.5,48.5"})) == ["Bratislava", "Vienna"]
+    assert sorted(titles({"bbox": "170,-25,-165,-10"})) == ["Apia", "Suva"]  # across the antimeridian
+    nearest = client.get('/api/entries/within/', {"lat": 48.2, "lng": 16.37, "radius_km": 100}).json()
+    assert [e["title"] for e in nearest] == ["Vienna", "Bratislava"]
+    assert 50 < nearest[1]["distance_km"] < 60
+    assert titles({"lat": 48.2, "lng": 16.37, "radius_km": 300, "min_sentiment": "0.5"}) == []
+
+    # Moving an entry keeps its geohash in step, also with update_fields
+    vienna.latitude, vienna.longitude = 50.08, 14.43
+    vienna.save(update_fields=["latitude", "longitude"])
+    assert sorted(titles({"lat": 50.08, "lng": 14.43, "radius_km": 5})) == ["Prague", "Vienna"]
+
+    assert client.get('/api/entries/within/', {"bbox": "1,2"}).status_code == 400
+    assert client.get('/api/entries/within/').status_code == 400
+
+
+@pytest.mark.django_db
+def test_map_clusters_group_entries_in_sql_and_cache_tiles(
+    django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from entries import clusters
+    from entries.models import Entry
+
+    cache.clear()
+    user = User.objects.create(username="mapper")
+    for i, (latitude, longitude, sentiment) in enumerate(
+        [(48.2082, 16.3738, 0.8), (48.2100, 16.3700, 0.2), (48.1486, 17.1077, -0.5), (-18.1416, 178.4419, 0.1)]
+    ):
+        Entry.objects.create(
+            user=user, content=f"entry {i}", latitude=latitude, longitude=longitude, overall_sentiment=sentiment
+        )
+    client = APIClient()
+    client.force_authenticate(user)
+    europe = {"zoom": 7, "bbox": "14,47,19,49.5"}
+
+    body = client.get('/api/entries/clusters/', europe).json()
+    assert body["precision"] == clusters.precision_for_zoom(7)
+    by_count = sorted(body["clusters"], key=lambda c: -c["count"])
+    assert [c["count"] for c in by_count] == [2, 1]
+    vienna = by_count[0]
+    assert vienna["avg_sentiment"] == pytest.approx(0.5)
+    assert vienna["latitude"] == pytest.approx(48.2091)
+    assert Entry.objects.get(pk=vienna["sample_entry_id"]).content in {"entry 0", "entry 1"}
+
+    # Zoomed far out, everything in Europe falls into one cell
+    world = client.get('/api/entries/clusters/', {"zoom": 1, "bbox": "-180,-85,180,85"}).json()
+    assert sum(c["count"] for c in world["clusters"]) == 4
+    assert len(world["clusters"]) == 2
+
+    # Served from cached tiles until an entry is geocoded
+    with django_assert_num_queries(0):
+        assert client.get('/api/entries/clusters/', europe).json() == body
+    untouched = Entry.objects.get(content="entry 3")
+    untouched.title = "Suva"
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        untouched.save()
+    assert callbacks == []
+
+    moved = Entry.objects.get(content="entry 2")
+    moved.latitude, moved.longitude = 48.2090, 16.3720
+    with django_capture_on_commit_callbacks(execute=True):
+        moved.save()
+    counts = [c["count"] for c in client.get('/api/entries/clusters/', europe).json()["clusters"]]
+    assert counts == [3]
+
+    # Across the antimeridian
+    pacific = client.get('/api/entries/clusters/', {"zoom": 5, "bbox": "170,-25,-170,-10"}).json()
+    assert [c["count"] for c in pacific["clusters"]] == [1]
+
+    assert client.get('/api/entries/clusters/', {"bbox": "14,47,19,49.5"}).status_code == 400
+    assert client.get('/api/entries/clusters/', {"zoom": 30, "bbox": "14,47,19,49.5"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_map_clusters_for_anonymous_requests_cover_all_entries(django_capture_on_commit_callbacks):
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from entries.models import Entry
+
+    cache.clear()
+    for name in ("one", "two"):
+        user = User.objects.create(username=name)
+        Entry.objects.create(user=user, content=name, latitude=48.2082, longitude=16.3738)
+    client = APIClient()
+    europe = {"zoom": 7, "bbox": "14,47,19,49.5"}
+
+    response = client.get('/api/entries/clusters/', europe)
+    assert response.status_code == 200
+    assert [c["count"] for c in response.json()["clusters"]] == [2]
+
+    # Any user's change drops the shared tiles too
+    with django_capture_on_commit_callbacks(execute=True):
+        Entry.objects.create(user=user, content="three", latitude=48.2, longitude=16.37)
+    assert [c["count"] for c in client.get('/api/entries/clusters/', europe).json()["clusters"]] == [3]
+
+
+@pytest.mark.django_db
+def test_unwrapped_map_bounds_are_brought_into_range():
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from entries.models import Entry
+
+    cache.clear()
+    user = User.objects.create(username="zoomed-out")
+    for name, latitude, longitude in [("Vienna", 48.2082, 16.3738), ("Suva", -18.1416, 178.4419), ("Apia", -13.8333, -171.7667)]:
+        Entry.objects.create(user=user, title=name, content=name, latitude=latitude, longitude=longitude)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def titles(bbox):
+        response = client.get('/api/entries/within/', {"bbox": bbox})
+        assert response.status_code == 200, response.json()
+        return sorted(item["title"] for item in response.json())
+
+    def clustered(bbox, zoom=2):
+        response = client.get('/api/entries/clusters/', {"zoom": zoom, "bbox": bbox})
+        assert response.status_code == 200, response.json()
+        return sum(c["count"] for c in response.json()["clusters"])
+
+    # Leaflet's bounds at zoom 2 in a wide container: more than the whole world
+    assert titles("-174.5,-60,194.5,80") == ["Apia", "Suva", "Vienna"]
+    assert clustered("-174.5,-60,194.5,80") == 3
+    # Panned east across the antimeridian: Fiji to Samoa as 178..188
+    assert titles("175,-25,190,-10") == ["Apia", "Suva"]
+    assert clustered("175,-25,190,-10", zoom=5) == 2
+    # Panned a whole turn west
+    assert titles("-344,47,-343,49.5") == ["Vienna"]
+    assert client.get('/api/entries/within/', {"bbox": "-174.5,-100,194.5,80"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_places_endpoint_aggregates_place_categories_in_one_query(django_assert_num_queries):
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from categories.models import Category
+    from entries.models import Entry
+    from insights import places
+    from insights.models import Insight
+
+    user = User.objects.create(username="wanderer")
+    other = User.objects.create(username="homebody")
+    prague = Category.objects.create(name="Prague", category_type="place")
+    brno = Category.objects.create(name="Brno", category_type="place")
+    coffee = Category.objects.create(name="Coffee", category_type="meal")
+
+    def mention(owner, category, sentiment, position=0):
+        entry = Entry.objects.create(user=owner, content=f"About {category.name}")
+        Insight.objects.create(
+            entry=entry, category=category, text_snippet=category.name, sentiment_score=sentiment,
+            confidence_score=0.9, start_position=position, end_position=position + 5,
+        )
+        return entry
+
+    mention(user, prague, 0.8)
+    second = mention(user, prague, 0.2)
+    Insight.objects.create(
+        entry=second, category=prague, text_snippet="Prague again", sentiment_score=0.5,
+        confidence_score=0.9, start_position=20, end_position=32,
+    )
+    latest = mention(user, brno, -0.4)
+    mention(user, coffee, 0.9)
+    mention(other, prague, -1.0)
+
+    # The extraction task records where geocoded places are
+    assert places.remember_locations(
+        [prague.id, coffee.id], [{"place_name": "prague", "full_name": "Prague, Czechia", "latitude": 50.08, "longitude": 14.43}]
+    ) == 1
+
+    client = APIClient()
+    client.force_authenticate(user)
+    with django_assert_num_queries(2):  # the page and its count
+        body = client.get('/api/insights/places/').json()
+    assert body["count"] == 2
+    brno_row, prague_row = body["results"]
+    assert brno_row["name"] == "Brno" and brno_row["last_mentioned"] == latest.created_at.isoformat().replace("+00:00", "Z")
+    assert brno_row["latitude"] is None
+    assert prague_row["entry_count"] == 2
+    assert prague_row["avg_sentiment"] == pytest.approx(0.5)
+    assert (prague_row["latitude"], prague_row["location_name"]) == (50.08, "Prague, Czechia")
+
+    unlocated = client.get('/api/insights/places/', {"has_coordinates": "false"}).json()["results"]
+    assert [p["name"] for p in unlocated] == ["Brno"]
+
+    response = client.post(
+        f'/api/insights/places/{brno.id}/location/', {"latitude": 49.19, "longitude": 16.61}, format='json'
+    )
+    assert response.status_code == 200
+    assert client.get('/api/insights/places/', {"has_coordinates": "false"}).json()["count"] == 0
+    assert client.post(f'/api/insights/places/{coffee.id}/location/', {"latitude": 1, "longitude": 1}).status_code == 404
+
+    # A user's own location overrides the shared one for them alone
+    client.post(f'/api/insights/places/{prague.id}/location/', {"latitude": 1.5, "longitude": 2.5}, format='json')
+    assert client.get('/api/insights/places/').json()["results"][1]["latitude"] == 1.5
+    assert Category.objects.get(pk=prague.pk).latitude == 50.08
+    client.force_authenticate(other)
+    assert client.get('/api/insights/places/').json()["results"][0]["latitude"] == 50.08
+    assert client.post(f'/api/insights/places/{brno.id}/location/', {"latitude": 1, "longitude": 1}).status_code == 404
+    client.force_authenticate(None)
+    assert client.post(f'/api/insights/places/{prague.id}/location/', {"latitude": 1, "longitude": 1}).status_code == 403
+    client.force_authenticate(user)
+
+    # The page's entry sections filter on the server too
+    placeless = client.get('/api/entries/', {"without_category_type": "place"}).json()
+    assert [e["content"] for e in placeless] == ["About Coffee"]
+    assert client.post(f'/api/insights/places/{brno.id}/location/', {"latitude": 91, "longitude": 1}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_backfill_geocodes_place_categories_once_and_resumes(tmp_path, monkeypatch):
+    import json
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from categories.models import Category
+    from entries.models import Entry
+    from insights import places
+    from insights.models import Insight
+
+    cache.clear()
+    calls = []
+
+    class FakeGeocoder:
+        def geocode_place(self, name, context=""):
+            calls.append(name)
+            if name == "Erroria":
+                raise RuntimeError("model unavailable")
+            return (50.08, 14.43, "Prague, Czechia") if name == "Prague" else None
+
+    monkeypatch.setattr(places, "get_geocoding_service", lambda: FakeGeocoder())
+    user = User.objects.create(username="backfill")
+    categories = {
+        name: Category.objects.create(name=name, category_type="place")
+        for name in ("Prague", "Atlantis", "Erroria")
+    }
+
+    def entry_mentioning(*names, **fields):
+        entry = Entry.objects.create(user=user, content=" ".join(names), **fields)
+        for position, name in enumerate(names):
+            Insight.objects.create(
+                entry=entry, category=categories[name], text_snippet=name, sentiment_score=0.0,
+                confidence_score=0.9 - position * 0.1, start_position=position, end_position=position + 1,
+            )
+        return entry
+
+    both = entry_mentioning("Atlantis", "Prague")
+    lost = entry_mentioning("Atlantis")
+    again = entry_mentioning("Prague", "Erroria")
+    located = entry_mentioning("Prague", latitude=1.0, longitude=2.0)
+    Entry.objects.create(user=user, content="No places")
+
+    checkpoint = tmp_path / "backfill.json"
+    call_command("backfill_geocoding", "--checkpoint", str(checkpoint), "--batch-size", "1", "--limit", "1")
+    assert json.loads(checkpoint.read_text())["last_entry_id"] == both.id
+    call_command("backfill_geocoding", "--checkpoint", str(checkpoint), "--batch-size", "2", "--workers", "2")
+
+    # Each name is geocoded once; Prague is then reused from the category
+    assert sorted(calls) == ["Atlantis", "Erroria", "Prague"]
+    both.refresh_from_db()
+    again.refresh_from_db()
+    assert (both.latitude, both.location_name) == (50.08, "Prague, Czechia")
+    assert both.geohash and again.latitude == 50.08
+    assert Entry.objects.get(pk=lost.pk).latitude is None
+    assert Entry.objects.get(pk=located.pk).latitude == 1.0
+    assert json.loads(checkpoint.read_text())["located"] == 2
+
+    # Starting over skips located entries, and Atlantis is a remembered miss
+    calls.clear()
+    call_command("backfill_geocoding", "--checkpoint", str(checkpoint), "--restart")
+    assert calls == []
+
+
+@pytest.mark.django_db
+def test_place_locations_are_seeded_per_user_from_their_geocoded_entries():
+    import importlib
+    from django.apps import apps
+    from django.contrib.auth.models import User
+    from categories.models import Category
+    from entries.models import Entry
+    from insights.models import Insight, PlaceLocation
+
+    migration = importlib.import_module("insights.migrations.0004_placelocation")
+    user = User.objects.create(username="seed")
+    other = User.objects.create(username="other-seed")
+    prague, brno, vienna = (
+        Category.objects.create(name=name, category_type="place") for name in ("Prague", "Brno", "Vienna")
+    )
+
+    def entry(location_name, latitude, *categories, owner=user):
+        created = Entry.objects.create(
+            user=owner, content="x", location_name=location_name, latitude=latitude, longitude=latitude
+        )
+        for position, category in enumerate(categories):
+            Insight.objects.create(
+                entry=created, category=category, text_snippet=category.name, sentiment_score=0.0,
+                confidence_score=0.9, start_position=position, end_position=position + 1,
+            )
+
+    entry("Prague, Czechia", 50.0, prague, brno)  # the main place names Prague
+    entry("Somewhere", 10.0, vienna)  # Vienna is its only place
+    entry("Prague", 20.0, prague, owner=other)
+    migration.seed_locations(apps, None)
+
+    seeded = {(row.user_id, row.category_id): row for row in PlaceLocation.objects.all()}
+    assert seeded[(user.id, prague.id)].latitude == 50.0
+    assert (user.id, brno.id) not in seeded  # not Brno's coordinates
+    assert seeded[(user.id, vienna.id)].location_name == "Somewhere"
+    assert seeded[(other.id, prague.id)].latitude == 20.0  # each user's own
+    assert Category.objects.get(pk=prague.pk).latitude is None
@@ -0,0 +1,123 @@
+import json
+import pytest
+from insights.ai_service import AIInsightExtractor, InsightData
+from insights.chunking import chunk_text
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Returns an insight for every known entity found in the prompt"""
+
+    entities = {"Prague": "place", "pizza": "meal"}
+
+    def generate_content(self, prompt):
+        chunk = prompt.split('Diary entry:\n"', 1)[1].rsplit('"\n\nReturn the results', 1)[0]
+        insights = []
+        for name, kind in self.entities.items():
+            position = chunk.find(name)
+            if position >= 0:
+                insights.append({
+                    "text_snippet": name,
+                    "category_name": name,
+                    "category_type": kind,
+                    "sentiment_score": 0.5,
+                    "confidence_score": 0.9,
+                    "start_position": position,
+                    "end_position": position + len(name),
+                })
+        return FakeResponse(json.dumps(insights))
+
+
+@pytest.fixture
+def extractor(settings):
+    settings.GEMINI_API_KEY = "test-key"
+    settings.INSIGHTS_CHUNK_TOKENS = 10
+    extractor = AIInsightExtractor()
+    extractor.model = FakeModel()
+    return extractor
+
+
+def test_chunks_cover_text_and_keep_offsets():
+    text = "First paragraph about Prague.\n\nSecond one.\n\n" + "word " * 50
+    chunks = chunk_text(text, 10)
+    assert len(chunks) > 1
+    assert "".join(chunk.text for chunk in chunks) == text
+    for chunk in chunks:
+        assert text[chunk.start:chunk.start + len(chunk.text)] == chunk.text
+
+
+def test_chunked_extraction_remaps_positions_and_dedupes(extractor):
+    content = (
+        "We landed in Prague late.\n\n"
+        "Dinner was pizza by the river.\n\n"
+        "Prague again the next morning."
+    )
+    insights = extractor.extract_insights(content)
+
+    names = [insight.category_name for insight in insights]
+    # Each mention of Prague is its own insight
+    assert names == ["Prague", "pizza", "Prague"]
+    for insight in insights:
+        assert content[insight.start_position:insight.end_position] == insight.text_snippet
+
+
+def test_merge_drops_only_overlapping_duplicates(extractor):
+    def insight(snippet, start, confidence=0.9, category="Prague"):
+        return InsightData(
+            text_snippet=snippet, category_name=category, category_type="place", sentiment_score=0.5,
+            confidence_score=confidence, start_position=start, end_position=start + len(snippet),
+        )
+
+    # The first mention is reported by two chunks with slightly different
+    # spans; the later mention is the same text at another offset
+    merged = extractor._merge_insights([
+        [insight("Prague", 10, 0.7), insight("Prague", 40)],
+        [insight("prague ", 10, 0.8), insight("Vltava", 10, category="Vltava")],
+    ])
+
+    assert [(i.category_name, i.start_position, i.confidence_score) for i in merged] == [
+        ("Vltava", 10, 0.9), ("Prague", 10, 0.8), ("Prague", 40, 0.9),
+    ]
+
+
+def test_span_resolver_corrects_model_positions(extractor):
+    content = "Coffee in the morning. Later, more coffee with Anna."
+    response = json.dumps([
+        {
+            "text_snippet": "coffee with Anna",
+            "category_name": "Coffee",
+            "category_type": "meal",
+            "sentiment_score": 0.4,
+            "confidence_score": 0.8,
+            "start_position": 0,
+            "end_position": 5,
+        },
+        {
+            "text_snippet": "COFFEE",
+            "category_name": "Coffee",
+            "category_type": "meal",
+            "sentiment_score": 0.4,
+            "confidence_score": 0.8,
+            "start_position": 33,
+            "end_position": 39,
+        },
+        {
+            "text_snippet": "tea",
+            "category_name": "Tea",
+            "category_type": "meal",
+            "sentiment_score": 0.1,
+            "confidence_score": 0.8,
+            "start_position": 0,
+            "end_position": 3,
+        },
+    ])
+    insights = extractor._parse_insights(response, content)
+
+    assert [(i.text_snippet, i.start_position, i.end_position) for i in insights] == [
+        ("coffee with Anna", 35, 51),
+        ("coffee", 35, 41),
+    ]
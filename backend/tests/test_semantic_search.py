@@ -0,0 +1,190 @@
+import numpy as np
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from entries.models import Entry
+from insights import vector_index
+from insights.embeddings import HashingEmbedder, encode_vector
+
+
+@pytest.fixture(autouse=True)
+def index_dir(settings, tmp_path):
+    settings.INSIGHTS_VECTOR_INDEX_DIR = str(tmp_path)
+    vector_index._loaded.clear()
+
+
+def test_hashing_embedder_prefers_shared_words():
+    embedder = HashingEmbedder()
+    query, related, unrelated = embedder.embed(
+        ["coffee in vienna", "we had coffee in a vienna cafe", "repaired the bike chain"]
+    )
+    assert np.isclose(np.linalg.norm(query), 1.0)
+    assert query @ related > query @ unrelated
+
+
+def test_ivf_index_finds_the_exact_match(settings):
+    settings.INSIGHTS_VECTOR_IVF_THRESHOLD = 100
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(400, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = vector_index.VectorIndex()
+    index.upsert(zip(range(400), vectors))
+
+    hits = index.search(vectors[123], k=3)
+    assert isinstance(index._searcher, vector_index.IVFIndex)
+    assert hits[0][0] == 123
+
+    index.remove([123])
+    assert 123 not in [pk for pk, _ in index.search(vectors[123], k=3)]
+
+
+@pytest.mark.django_db
+def test_semantic_entry_search():
+    user = User.objects.create(username="searcher")
+    trip = Entry.objects.create(user=user, title="Trip", content="Strudel and coffee at a Vienna cafe")
+    Entry.objects.create(user=user, title="Garage", content="Fixed the bike chain")
+    call_command("build_vector_index")
+
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.get('/api/entries/search/', {"q": "vienna coffee", "mode": "semantic"})
+    assert response.status_code == 200
+    assert [entry["id"] for entry in response.json()][:1] == [trip.id]
+
+
+@pytest.mark.django_db
+def test_demo_search_reuses_the_index_over_every_user(monkeypatch):
+    cache.clear()
+    user = User.objects.create(username="demo")
+    trip = Entry.objects.create(user=user, title="Trip", content="Strudel and coffee at a Vienna cafe")
+    call_command("build_vector_index")
+
+    builds = []
+    rows_from_db = vector_index._rows_from_db
+    monkeypatch.setattr(vector_index, "_rows_from_db", lambda *args: builds.append(args) or rows_from_db(*args))
+    for _ in range(2):
+        hits = vector_index.search_text(vector_index.ENTRIES, None, "vienna coffee")
+        assert hits[0][0] == trip.id
+    assert builds == [(vector_index.ENTRIES, None)]
+
+    # Later changes reach the shared index without another rebuild
+    garage = Entry.objects.create(user=user, title="Garage", content="Fixed the bike chain")
+    vector = HashingEmbedder().embed(["bike chain"])[0]
+    vector_index.update_index(vector_index.ENTRIES, user.id, upserts=[(garage.id, vector)])
+    assert vector_index.search_text(vector_index.ENTRIES, None, "bike chain")[0][0] == garage.id
+    assert len(builds) == 1
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_busy_index_is_rebuilt_with_the_lost_change(monkeypatch):
+    cache.clear()
+    user = User.objects.create(username="busy")
+    Entry.objects.create(user=user, title="Trip", content="Strudel and coffee at a Vienna cafe")
+    call_command("build_vector_index")
+    garage = Entry.objects.create(user=user, title="Garage", content="Fixed the bike chain")
+    vector = HashingEmbedder().embed(["bike chain"])[0]
+    Entry.objects.filter(pk=garage.pk).update(embedding=encode_vector(vector))
+
+    class Clock:
+        now = 0.0
+
+        def monotonic(self):
+            self.now += 10
+            return self.now
+
+        def sleep(self, seconds):
+            pass
+
+    # Another writer holds the lock with the index as it was before the change
+    lock_key = vector_index._lock_key(vector_index.ENTRIES, user.id)
+    cache.add(lock_key, True)
+    held = vector_index.get_index(vector_index.ENTRIES, user.id)
+    monkeypatch.setattr(vector_index, "time", Clock())
+    vector_index.update_index(vector_index.ENTRIES, user.id, upserts=[(garage.id, vector)])
+    held.save(vector_index._index_path(vector_index.ENTRIES, user.id))
+    cache.delete(lock_key)
+
+    assert garage.id in vector_index.get_index(vector_index.ENTRIES, user.id).ids
+    cache.clear()
+
+
+def test_ivf_index_absorbs_small_changes_without_retraining(settings, monkeypatch, tmp_path):
+    settings.INSIGHTS_VECTOR_IVF_THRESHOLD = 100
+    settings.INSIGHTS_VECTOR_IVF_RETRAIN_DRIFT = 0.2
+    trainings = []
+    real_kmeans = vector_index._kmeans
+    monkeypatch.setattr(vector_index, "_kmeans", lambda *a, **k: trainings.append(1) or real_kmeans(*a, **k))
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(520, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = vector_index.VectorIndex()
+    index.upsert(zip(range(400), vectors[:400]))
+    index.search(vectors[0], k=1)
+    assert len(trainings) == 1
+
+    # New vectors join their nearest partition; removed ones leave it
+    index.upsert([(400, vectors[400])])
+    index.remove([7])
+    assert index.search(vectors[400], k=1)[0][0] == 400
+    assert 7 not in [pk for pk, _ in index.search(vectors[7], k=3)]
+    assert len(trainings) == 1
+
+    # Saved centroids spare the next process its k-means
+    path = str(tmp_path / "entries_1.npz")
+    index.save(path)
+    loaded = vector_index.VectorIndex.load(path)
+    assert loaded.search(vectors[400], k=1)[0][0] == 400
+    assert len(trainings) == 1
+
+    # Retrained once the changes outgrow the drift allowance
+    index.upsert(zip(range(401, 520), vectors[401:520]))
+    index.search(vectors[0], k=1)
+    assert len(trainings) == 2
+
+
+@pytest.mark.django_db
+def test_index_versions_catch_writes_within_one_timestamp():
+    import os
+
+    path = vector_index._index_path(vector_index.ENTRIES, 1)
+    first = vector_index.VectorIndex()
+    first.upsert([(1, np.ones(4, dtype=np.float32) / 2)])
+    vector_index._persist(first, path, vector_index.ENTRIES, 1)
+    mtime = os.stat(path).st_mtime_ns
+
+    # Another process writes within the same timestamp
+    second = vector_index.VectorIndex()
+    second.upsert([(2, np.ones(4, dtype=np.float32) / 2)])
+    vector_index._persist(second, path, vector_index.ENTRIES, 1)
+    os.utime(path, ns=(mtime, mtime))
+    vector_index._loaded[(vector_index.ENTRIES, 1)] = (first.version, first)
+
+    assert list(vector_index.get_index(vector_index.ENTRIES, 1).ids) == [2]
+
+
+@pytest.mark.django_db
+def test_deleted_entries_leave_the_vector_indexes(django_capture_on_commit_callbacks):
+    from insights.models import Insight
+    from categories.models import Category
+
+    cache.clear()
+    user = User.objects.create(username="forgetful")
+    trip = Entry.objects.create(user=user, title="Trip", content="Strudel and coffee at a Vienna cafe")
+    category = Category.objects.create(name="Vienna", category_type="place")
+    insight = Insight.objects.create(
+        entry=trip, category=category, text_snippet="Vienna cafe", sentiment_score=0.5,
+        confidence_score=0.9, start_position=0, end_position=11,
+    )
+    call_command("build_vector_index")
+    assert trip.id in vector_index.get_index(vector_index.ENTRIES, user.id).ids
+
+    client = APIClient()
+    client.force_authenticate(user)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.delete(f'/api/entries/{trip.id}/').status_code == 204
+    assert trip.id not in vector_index.get_index(vector_index.ENTRIES, user.id).ids
+    assert insight.id not in vector_index.get_index(vector_index.INSIGHTS, user.id).ids
+    cache.clear()
@@ -24,3 +24,499 @@ def test_public_entries_endpoint_filters():
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list) or 'results' in data
+
+
+def test_extraction_routing_separates_interactive_from_bulk():
+    from insights.queues import routing_options, SOURCE_CREATE, SOURCE_RETRY
+
+    create = routing_options(SOURCE_CREATE)
+    retry = routing_options(SOURCE_RETRY)
+    assert create["queue"] == "interactive"
+    assert retry["queue"] == "bulk"
+    # Redis priorities: lower is consumed first
+    assert create["priority"] < retry["priority"]
+
+
+@pytest.mark.django_db
+def test_create_entry_without_title_uses_provisional_title(monkeypatch):
+    # Queued for the background pipeline, which fills in the title later
+    monkeypatch.setattr("entries.views.enqueue_extraction", lambda entry_id, source: None)
+    client = APIClient()
+    payload = {"content": "Walked along the river in Prague at sunset today", "is_public": False}
+    response = client.post('/api/entries/', payload, format='json')
+    assert response.status_code == 201
+    data = response.json()
+    assert data["title"] == "Walked along the river in..."
+    assert data["title_pending"] is True
+
+
+@pytest.mark.django_db
+def test_title_pending_is_settled_when_extraction_cannot_be_queued(monkeypatch):
+    from insights import tasks
+
+    def unavailable(entry_id, source):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr("entries.views.enqueue_extraction", unavailable)
+    client = APIClient()
+    payload = {"content": "Walked along the river in Prague at sunset today"}
+
+    # The synchronous fallback names the entry
+    def titled(entry_id):
+        Entry.objects.filter(id=entry_id, title_pending=True).update(title="Prague sunset", title_pending=False)
+        raise RuntimeError("extraction failed")
+
+    monkeypatch.setattr(tasks, "extract_insights_sync", titled)
+    data = client.post('/api/entries/', payload, format='json').json()
+    assert (data["title"], data["title_pending"]) == ("Prague sunset", False)
+    assert Entry.objects.get(id=data["id"]).insights_processed
+
+    # Without any title from the fallback the provisional one is kept
+    monkeypatch.setattr(tasks, "extract_insights_sync", lambda entry_id: False)
+    data = client.post('/api/entries/', payload, format='json').json()
+    assert (data["title"], data["title_pending"]) == ("Walked along the river in...", False)
+
+
+@pytest.mark.django_db
+def test_sentiment_summary_reads_rollups_kept_in_sync_with_edits():
+    from categories.models import Category
+    from insights import rollups
+    from insights.models import CategorySentiment, Insight
+
+    user = User.objects.create(username="rollup")
+    park = Category.objects.create(name="Park", category_type="place")
+    entry = Entry.objects.create(user=user, title="Walk", content="Walk in the park, then more park")
+    first = Insight.objects.create(
+        entry=entry, category=park, text_snippet="Walk in the park", sentiment_score=0.8,
+        confidence_score=0.9, start_position=0, end_position=16,
+    )
+    second = Insight.objects.create(
+        entry=entry, category=park, text_snippet="more park", sentiment_score=0.2,
+        confidence_score=0.9, start_position=23, end_position=32,
+    )
+    rollups.rebuild()
+
+    client = APIClient()
+    client.force_authenticate(user)
+    summary = client.get('/api/insights/sentiment_summary/').json()
+    assert summary == [{
+        "category__name": "Park", "category__category_type": "place",
+        "avg_sentiment": pytest.approx(0.5), "count": 2,
+    }]
+
+    client.patch(f'/api/insights/{first.id}/', {"sentiment_score": -0.2}, format='json')
+    client.delete(f'/api/insights/{second.id}/')
+    row = CategorySentiment.objects.get(user=user, category=park)
+    assert (row.insight_count, row.sentiment_sum) == (1, pytest.approx(-0.2))
+
+    client.delete(f'/api/entries/{entry.id}/')
+    assert not CategorySentiment.objects.filter(user=user).exists()
+    assert Insight.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_entries_by_category_is_cursor_paginated_with_match_counts(django_assert_max_num_queries):
+    from categories.models import Category
+    from insights.models import Insight
+
+    user = User.objects.create(username="paged")
+    cafe = Category.objects.create(name="Cafe", category_type="place")
+    for i in range(25):
+        entry = Entry.objects.create(user=user, title=f"Visit {i}", content="Coffee and cake")
+        for start in range(1 + i % 2):
+            Insight.objects.create(
+                entry=entry, category=cafe, text_snippet="Coffee", sentiment_score=0.1,
+                confidence_score=0.9, start_position=start, end_position=start + 6,
+            )
+    Entry.objects.create(user=user, title="Other", content="No match")
+
+    client = APIClient()
+    client.force_authenticate(user)
+    with django_assert_max_num_queries(6):
+        first = client.get('/api/insights/entries_by_category/', {"category_name": "caf"}).json()
+    assert len(first["results"]) == 20
+    assert first["results"][0]["title"] == "Visit 24"
+    assert {e["matched_insight_count"] for e in first["results"]} == {1, 2}
+
+    rest = client.get(first["next"]).json()
+    assert len(rest["results"]) == 5 and rest["next"] is None
+
+
+@pytest.mark.django_db
+def test_insight_endpoints_filter_paginate_and_stream(monkeypatch):
+    import json
+    from categories.models import Category
+    from insights.models import Insight
+
+    user = User.objects.create(username="mapper")
+    place = Category.objects.create(name="Prague", category_type="place")
+    meal = Category.objects.create(name="Goulash", category_type="meal")
+    located = Entry.objects.create(user=user, content="Goulash in Prague", latitude=50.08, longitude=14.43)
+    unlocated = Entry.objects.create(user=user, content="Prague again")
+    for entry, category in ((located, place), (located, meal), (unlocated, place)):
+        Insight.objects.create(
+            entry=entry, category=category, text_snippet=category.name, sentiment_score=0.0,
+            confidence_score=1.0, start_position=0, end_position=len(category.name),
+        )
+
+    client = APIClient()
+    client.force_authenticate(user)
+    # The minimal test settings have no default paginator, so pages are plain lists
+    places = client.get('/api/insights/', {"category_type": "place", "has_coordinates": "true"}).json()
+    assert [i["category"]["name"] for i in places] == ["Prague"]
+
+    by_category = client.get('/api/insights/by_category/', {"category_id": place.id}).json()
+    assert len(by_category) == 2
+
+    response = client.get('/api/insights/stream/', {"category_type": "place"}, HTTP_ACCEPT="application/x-ndjson")
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)["category"]["name"] for line in lines] == ["Prague", "Prague"]
+
+    located_entries = client.get('/api/entries/', {"has_coordinates": "1"}).json()
+    assert [e["id"] for e in located_entries] == [located.id]
+
+    from rest_framework.pagination import PageNumberPagination
+    from categories.views import CategoryViewSet
+    from insights.views import InsightViewSet
+
+    class SinglePage(PageNumberPagination):
+        page_size = 1
+
+    monkeypatch.setattr(InsightViewSet, "pagination_class", SinglePage)
+    monkeypatch.setattr(CategoryViewSet, "pagination_class", SinglePage)
+    for url, params in (
+        ('/api/insights/by_category/', {"category_id": place.id}),
+        ('/api/insights/search/', {"q": "Prague"}),
+        ('/api/categories/by_type/', {}),
+    ):
+        page = client.get(url, params).json()
+        assert len(page["results"]) == 1 and page["next"], url
+
+
+@pytest.mark.django_db(transaction=True)
+def test_document_upload_is_stored_pending_and_extracted_in_background(settings, tmp_path, monkeypatch):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from entries import tasks
+    from entries.models import EntryDocument
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    queued = []
+    monkeypatch.setattr("entries.views.enqueue_document_extraction", queued.append)
+    triggered = []
+    monkeypatch.setattr("insights.tasks.enqueue_extraction", lambda entry_id, source: triggered.append(entry_id))
+
+    user = User.objects.create(username="uploader")
+    entry = Entry.objects.create(user=user, content="Trip notes", insights_processed=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    upload = SimpleUploadedFile("notes.txt", b"Museum visit in Vienna", content_type="text/plain")
+    response = client.post(f'/api/entries/{entry.id}/upload_document/', {"file": upload}, format='multipart')
+
+    assert response.status_code == 201
+    assert response.json()["extraction_status"] == "pending"
+    assert queued == [response.json()["id"]] and triggered == []
+
+    assert tasks.extract_document_text(queued[0])
+    document = EntryDocument.objects.get()
+    assert (document.extraction_status, document.extracted_text) == ("ready", "Museum visit in Vienna")
+    assert triggered == [entry.id]
+
+    status = client.get(f'/api/entries/{entry.id}/documents/{document.id}/').json()
+    assert status["extraction_status"] == "ready"
+
+
+@pytest.mark.django_db
+def test_document_upload_is_hashed_while_streaming_and_size_limited(settings, tmp_path, monkeypatch):
+    import hashlib
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from entries.document_service import DocumentTooLarge, extract_text_from_file
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.DOCUMENT_MAX_UPLOAD_BYTES = 64
+    monkeypatch.setattr("entries.views.enqueue_document_extraction", lambda document_id: None)
+    user = User.objects.create(username="streamer")
+    entry = Entry.objects.create(user=user, content="Trip notes", insights_processed=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = f'/api/entries/{entry.id}/upload_document/'
+
+    body = b"Tram to the old town"
+    response = client.post(url, {"file": SimpleUploadedFile("a.txt", body, content_type="text/plain")}, format='multipart')
+    assert response.status_code == 201
+    assert response.json()["sha256"] == hashlib.sha256(body).hexdigest()
+
+    big = SimpleUploadedFile("big.txt", b"x" * 65, content_type="text/plain")
+    response = client.post(url, {"file": big}, format='multipart')
+    assert response.status_code == 413
+    assert entry.documents.count() == 1
+
+    # Files read back from storage are spooled in chunks and checked the same way
+    with pytest.raises(DocumentTooLarge):
+        extract_text_from_file(SimpleUploadedFile("big.txt", b"x" * 65, content_type="text/plain"))
+    settings.DOCUMENT_MAX_TEXT_CHARS = 5
+    assert extract_text_from_file(SimpleUploadedFile("a.txt", body, content_type="text/plain")) == "Tram"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_duplicate_uploads_share_a_blob_and_reuse_extracted_text(settings, tmp_path, monkeypatch):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from entries import document_service, tasks
+    from entries.models import DocumentBlob, EntryDocument
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    queued = []
+    monkeypatch.setattr("entries.views.enqueue_document_extraction", queued.append)
+    triggered = []
+    monkeypatch.setattr("insights.tasks.enqueue_extraction", lambda entry_id, source: triggered.append(entry_id))
+    monkeypatch.setattr("entries.views.enqueue_extraction", lambda entry_id, source: triggered.append(entry_id))
+    extractions = []
+    real_extract = document_service.extract_text_from_file
+    monkeypatch.setattr(tasks, "extract_text_from_file", lambda *a: extractions.append(a) or real_extract(*a))
+
+    user = User.objects.create(username="deduper")
+    first = Entry.objects.create(user=user, content="Day one", insights_processed=True)
+    second = Entry.objects.create(user=user, content="Day two", insights_processed=True)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def upload(entry, name):
+        body = SimpleUploadedFile(name, b"Ticket for the Vienna museum", content_type="text/plain")
+        return client.post(f'/api/entries/{entry.id}/upload_document/', {"file": body}, format='multipart').json()
+
+    original = upload(first, "ticket.txt")
+    assert tasks.extract_document_text(queued.pop())
+    duplicate = upload(second, "copy.txt")
+
+    assert queued == [] and len(extractions) == 1
+    assert duplicate["extraction_status"] == "ready"
+    assert EntryDocument.objects.get(id=duplicate["id"]).extracted_text == "Ticket for the Vienna museum"
+    assert triggered == [first.id, second.id]
+    blob = DocumentBlob.objects.get()
+    assert blob.ref_count == 2
+    assert len(list((tmp_path / "document_blobs").rglob("*"))) == 2  # one directory, one file
+
+    client.delete(f'/api/entries/{first.id}/documents/{original["id"]}/')
+    assert DocumentBlob.objects.get().ref_count == 1
+    client.delete(f'/api/entries/{second.id}/')
+    assert not DocumentBlob.objects.exists()
+    assert not any(p.is_file() for p in (tmp_path / "document_blobs").rglob("*"))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_uploads_during_extraction_wait_for_it_and_deletes_release_blobs(settings, tmp_path, monkeypatch):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from entries import tasks
+    from entries.models import DocumentBlob, EntryDocument
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    queued = []
+    monkeypatch.setattr("entries.views.enqueue_document_extraction", queued.append)
+    monkeypatch.setattr("entries.tasks.enqueue_document_extraction", queued.append)
+    triggered = []
+    monkeypatch.setattr("insights.tasks.enqueue_extraction", lambda entry_id, source: triggered.append(entry_id))
+
+    user = User.objects.create(username="racer")
+    entries = [Entry.objects.create(user=user, content=f"Day {i}", insights_processed=True) for i in range(3)]
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def upload(entry):
+        body = SimpleUploadedFile("ticket.txt", b"Ticket for the Vienna museum", content_type="text/plain")
+        return client.post(f'/api/entries/{entry.id}/upload_document/', {"file": body}, format='multipart').json()
+
+    # Uploads arriving before the first extraction ran only wait for it
+    first, second, third = (upload(entry) for entry in entries)
+    assert queued == [first["id"]]
+
+    # Deleting the upload whose extraction was queued hands it to a waiting one
+    EntryDocument.objects.filter(id=first["id"]).delete()
+    assert queued == [first["id"], second["id"]]
+    assert DocumentBlob.objects.get().ref_count == 2
+
+    assert not tasks.extract_document_text(first["id"])
+    assert tasks.extract_document_text(second["id"])
+    assert set(EntryDocument.objects.values_list("extraction_status", flat=True)) == {"ready"}
+    assert EntryDocument.objects.get(id=third["id"]).extracted_text == "Ticket for the Vienna museum"
+    assert triggered == [entries[1].id, entries[2].id]
+
+    # Deletes outside the API release blobs too
+    entries[1].delete()
+    assert DocumentBlob.objects.get().ref_count == 1
+    user.delete()
+    assert not DocumentBlob.objects.exists()
+    assert not any(p.is_file() for p in (tmp_path / "document_blobs").rglob("*"))
+
+
+@pytest.mark.django_db
+def test_reacquired_blob_survives_the_pending_delete_of_its_old_file(settings, tmp_path):
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from entries import blobs
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    content = b"Ticket for the Vienna museum"
+    sha256 = "ab" * 32
+    blob = blobs.acquire(ContentFile(content), sha256, len(content))
+    old_name = blob.file.name
+
+    # A release deleted the row; its file delete runs after a new upload
+    blob.delete()
+    again = blobs.acquire(ContentFile(content), sha256, len(content))
+    blobs._delete_file(old_name)
+
+    assert again.file.name != old_name
+    with default_storage.open(again.file.name) as f:
+        assert f.read() == content
+
+
+def test_pdf_pages_are_extracted_in_order_with_cap_and_failures(tmp_path, monkeypatch):
+    from PIL import Image
+    from entries import page_extraction
+    from entries.management.commands.benchmark_document_extraction import write_fixture_pdf
+
+    path = str(tmp_path / "diary.pdf")
+    write_fixture_pdf(path, pages=4, lines_per_page=2)
+
+    result = page_extraction.extract_pdf(path)
+    assert (result.page_count, result.pages_done, result.truncated) == (4, 4, False)
+    assert result.text.index("Page 1 line 1") < result.text.index("Page 4 line 2")
+
+    capped = page_extraction.extract_pdf(path, text_cap=50)
+    assert capped.pages_done == 1 and capped.truncated and len(capped.text) == 50
+
+    real_extract_page = page_extraction.extract_page
+
+    def flaky(path, page_number, *args):
+        if page_number == 1:
+            raise page_extraction.PageTimeout("too slow")
+        return real_extract_page(path, page_number, *args)
+
+    monkeypatch.setattr(page_extraction, "extract_page", flaky)
+    partial = page_extraction.extract_pdf(path, page_timeout=1)
+    assert partial.failed_pages == 1 and partial.pages_done == 4
+    assert "Page 2 line" not in partial.text and "Page 3 line 1" in partial.text
+
+    scan = page_extraction.prepare_for_ocr(Image.new("RGB", (4000, 1000)), 1000)
+    assert (scan.mode, scan.size) == ("L", (1000, 250))
+
+
+def test_pdf_pages_go_to_the_pool_for_parallelism_and_off_main_thread_timeouts(tmp_path, monkeypatch):
+    import threading
+    from entries import page_extraction
+    from entries.management.commands.benchmark_document_extraction import write_fixture_pdf
+
+    path = str(tmp_path / "diary.pdf")
+    write_fixture_pdf(path, pages=4, lines_per_page=2)
+    pools = []
+    real_get_pool = page_extraction._get_pool
+    monkeypatch.setattr(page_extraction, "_get_pool", lambda workers: pools.append(workers) or real_get_pool(workers))
+    try:
+        parallel = page_extraction.extract_pdf(path, workers=2, page_timeout=5)
+        assert pools == [2]
+        assert (parallel.pages_done, parallel.failed_pages) == (4, 0)
+        assert parallel.text.index("Page 1 line 1") < parallel.text.index("Page 4 line 2")
+
+        # A worker thread cannot time pages itself, so even one page is sent to the pool
+        single = {}
+        write_fixture_pdf(str(tmp_path / "note.pdf"), pages=1, lines_per_page=2)
+        thread = threading.Thread(
+            target=lambda: single.update(result=page_extraction.extract_pdf(str(tmp_path / "note.pdf"), page_timeout=5))
+        )
+        thread.start()
+        thread.join()
+        assert pools == [2, 1]
+        assert "Page 1 line 1" in single["result"].text
+
+        page_extraction.extract_pdf(path, page_timeout=5)
+        assert pools == [2, 1]  # timed inline on the main thread
+    finally:
+        page_extraction.shutdown_pool()
+
+
+def test_broken_pdf_pool_is_replaced_once_without_stopping_its_successor(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    from entries import page_extraction
+    from entries.management.commands.benchmark_document_extraction import write_fixture_pdf
+
+    class FakePool:
+        created = []
+
+        def __init__(self, max_workers):
+            self.stopped = False
+            FakePool.created.append(self)
+
+        def submit(self, fn, *args):
+            if self.stopped:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future = Future()
+            if len(FakePool.created) == 1 and args[1] == 0:
+                future.set_exception(BrokenProcessPool("worker died"))
+            else:
+                future.set_result(fn(*args))
+            return future
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.stopped = True
+
+    path = str(tmp_path / "diary.pdf")
+    write_fixture_pdf(path, pages=3, lines_per_page=2)
+    monkeypatch.setattr(page_extraction, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(page_extraction, "_pool", None)
+
+    # The page whose worker died fails; the rest go to a new pool
+    result = page_extraction.extract_pdf(path, workers=2)
+    assert (result.pages_done, result.failed_pages) == (3, 1)
+    broken, replacement = FakePool.created
+    assert broken.stopped and page_extraction._pool is replacement
+
+    # A thread still holding the broken pool leaves the replacement running
+    page_extraction._discard_pool(broken)
+    assert page_extraction._pool is replacement and not replacement.stopped
+
+    # A pool shut down under a running extraction is swapped, not failed on
+    replacement.stopped = True
+    again = page_extraction.extract_pdf(path, workers=2)
+    assert (again.pages_done, again.failed_pages) == (3, 0)
+    assert len(FakePool.created) == 3 and page_extraction._pool is FakePool.created[2]
+
+
+@pytest.mark.django_db
+def test_entry_list_sends_previews_and_never_loads_large_columns(settings):
+    import re
+    from django.db import connection
+    from entries.models import EntryDocument
+
+    settings.ENTRY_LIST_PREVIEW_CHARS = 10
+    user = User.objects.create(username="lister")
+    entry = Entry.objects.create(user=user, content="A long walk along the river", insights_processed=True)
+    EntryDocument.objects.create(
+        entry=entry, file="entry_documents/map.txt", filename="map.txt", file_size=1,
+        extracted_text="x" * 100000, extraction_status="ready",
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        item = client.get('/api/entries/').json()[0]
+    assert (item["content"], item["content_truncated"]) == ("A long wal", True)
+    assert item["documents"][0]["filename"] == "map.txt"
+    loaded = " ".join(statements)
+    assert "extracted_text" not in loaded and "embedding" not in loaded
+    # content only appears inside SUBSTR()/LENGTH(), never as a selected column
+    assert not re.search(r'[^(]"entries_entry"\."content"', loaded)
+
+    full = client.get('/api/entries/', {"full_content": "true"}).json()[0]
+    assert full["content"] == "A long walk along the river" and "content_truncated" not in full
+    assert client.get(f'/api/entries/{entry.id}/').json()["content"] == "A long walk along the river"
+
+    # The extraction pipeline opts in to the text
+    from insights.tasks import build_combined_content
+    assert build_combined_content(Entry.objects.get(id=entry.id)).endswith("x" * 100)
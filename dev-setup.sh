@@ -31,7 +31,7 @@ echo ""
 echo "To start development:"
 echo "1. Backend: cd backend && source venv/bin/activate && python manage.py runserver"
 echo "2. Frontend: cd frontend && npm start"
-echo "3. Celery: cd backend && source venv/bin/activate && celery -A mindjourney worker --loglevel=info"
+echo "3. Celery: cd backend && source venv/bin/activate && celery -A mindjourney worker -Q interactive,bulk,documents --loglevel=info"
 echo ""
 echo "Don't forget to:"
 echo "- Add your Gemini API key to backend/.env"
@@ -448,8 +448,11 @@ const EntryDetail = () => {
     { 
       retry: false,
       refetchInterval: (data) => {
-        // Auto-refresh every 3 seconds if processing is not complete
-        return data?.insights_processed === false ? 3000 : false;
+        // Auto-refresh every 3 seconds while insights or document text are still being processed
+        const extracting = data?.documents?.some(
+          (doc) => doc.extraction_status === 'pending' || doc.extraction_status === 'processing'
+        );
+        return data?.insights_processed === false || extracting ? 3000 : false;
       },
       refetchIntervalInBackground: true,
     }
@@ -875,6 +878,9 @@ const EntryDetail = () => {
                   <DocumentName>{doc.filename}</DocumentName>
                   <DocumentSize>
                     {(doc.file_size / 1024 / 1024).toFixed(2)} MB
+                    {doc.extraction_status === 'pending' || doc.extraction_status === 'processing'
+                      ? ' · Extracting text...'
+                      : doc.extraction_status === 'failed' ? ' · Text extraction failed' : ''}
                   </DocumentSize>
                 </DocumentInfo>
                 <div style={{ display: 'flex', gap: 8 }}>
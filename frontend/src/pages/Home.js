@@ -4,7 +4,7 @@ import React, { useState } from 'react';
 import { useQuery } from 'react-query';
 import { useNavigate } from 'react-router-dom';
 import styled from 'styled-components';
-import { aiQuery, getEntries, getPublicEntries } from '../services/api';
+import { aiQuery, aiQueryStream, getEntries, getPublicEntries } from '../services/api';
 
 const Container = styled.div`
   min-height: calc(100vh - 64px);
@@ -392,10 +392,21 @@ const Home = () => {
     setQueryResults(null);
 
     try {
-      const results = await aiQuery(query.trim());
-      setQueryResults(results);
-    } catch (error) {
-      setQueryError(error.response?.data?.error || 'Failed to process AI query');
+      // Show matched entries as soon as they are known and the answer as it streams in
+      await aiQueryStream(query.trim(), {
+        onAnalysis: (analysis) => setQueryResults({ ...analysis, ai_answer: '', entries: [], results_count: 0 }),
+        onEntries: ({ entries, results_count }) =>
+          setQueryResults((current) => ({ ...current, entries, results_count })),
+        onToken: (text) =>
+          setQueryResults((current) => ({ ...current, ai_answer: (current?.ai_answer || '') + text })),
+      });
+    } catch (streamError) {
+      try {
+        const results = await aiQuery(query.trim());
+        setQueryResults(results);
+      } catch (error) {
+        setQueryError(error.response?.data?.error || 'Failed to process AI query');
+      }
     } finally {
       setIsQuerying(false);
     }
@@ -1,11 +1,12 @@
 import { motion } from 'framer-motion';
 import L from 'leaflet';
-import { Filter, Layers, MapPin, Map as MapIcon } from 'lucide-react';
-import React, { useEffect, useState } from 'react';
-import { MapContainer, Marker, Popup, TileLayer, useMap } from 'react-leaflet';
+import { Filter, Layers, MapPin } from 'lucide-react';
+import React, { useCallback, useEffect, useState } from 'react';
+import { MapContainer, Marker, TileLayer, useMap, useMapEvents } from 'react-leaflet';
 import { useQuery } from 'react-query';
+import { useNavigate } from 'react-router-dom';
 import styled from 'styled-components';
-import { getInsights, getSentimentSummary } from '../services/api';
+import { getEntryClusters } from '../services/api';
 
 // Fix for default markers in react-leaflet
 delete L.Icon.Default.prototype._getIconUrl;
@@ -64,23 +65,6 @@ const FilterButton = styled(motion.button)`
   }
 `;
 
-const SetLocationsButton = styled(motion.button)`
-  background: rgba(60, 179, 113, 0.18);
-  border: 1px solid rgba(60, 179, 113, 0.3);
-  border-radius: 10px;
-  padding: 10px 14px;
-  color: #9be7c4;
-  cursor: pointer;
-  display: flex;
-  align-items: center;
-  gap: 6px;
-  font-size: 0.9rem;
-  
-  &:hover {
-    background: rgba(60, 179, 113, 0.24);
-  }
-`;
-
 const MapWrapper = styled.div`
   height: calc(100vh - 220px);
   border-radius: 14px;
@@ -161,7 +145,10 @@ const NoPlacesMessage = styled.div`
   flex-direction: column;
   align-items: center;
   justify-content: center;
-  height: 400px;
+  position: absolute;
+  inset: 0;
+  pointer-events: none;
+  z-index: 900;
   text-align: center;
   color: rgba(255, 255, 255, 0.7);
   
@@ -177,112 +164,116 @@ const NoPlacesMessage = styled.div`
   }
 `;
 
-// Custom marker component with sentiment-based colors
-const SentimentMarker = ({ insight, position }) => {
-  const getMarkerColor = (sentiment) => {
-    if (sentiment > 0.3) return '#4caf50'; // Green for positive
-    if (sentiment < -0.3) return '#f44336'; // Red for negative
-    return '#ffc107'; // Yellow for neutral
-  };
+const sentimentColor = (sentiment) => {
+  if (sentiment > 0.3) return '#4caf50'; // Green for positive
+  if (sentiment < -0.3) return '#f44336'; // Red for negative
+  return '#ffc107'; // Yellow for neutral
+};
+
+// One marker per server-side cluster; single entries link to the entry
+const ClusterMarker = ({ cluster }) => {
+  const map = useMap();
+  const navigate = useNavigate();
+  const color = sentimentColor(cluster.avg_sentiment);
+  const position = [cluster.latitude, cluster.longitude];
+
+  if (cluster.count === 1) {
+    const icon = L.divIcon({
+      className: 'custom-marker',
+      html: `<div style="
+        width: 20px;
+        height: 20px;
+        background: ${color};
+        border: 2px solid #ffffff;
+        border-radius: 50%;
+        box-shadow: 0 0 10px rgba(0,0,0,0.3);
+      "></div>`,
+      iconSize: [20, 20],
+      iconAnchor: [10, 10],
+    });
+    return (
+      <Marker
+        position={position}
+        icon={icon}
+        eventHandlers={{ click: () => navigate(`/entry/${cluster.sample_entry_id}`) }}
+      />
+    );
+  }
 
-  const customIcon = L.divIcon({
-    className: 'custom-marker',
+  const size = Math.round(28 + 8 * Math.log10(cluster.count));
+  const icon = L.divIcon({
+    className: 'cluster-marker',
     html: `<div style="
-      width: 20px;
-      height: 20px;
-      background: ${getMarkerColor(insight.sentiment_score)};
+      width: ${size}px;
+      height: ${size}px;
+      line-height: ${size}px;
+      text-align: center;
+      color: #111;
+      font-weight: 700;
+      font-size: 0.8rem;
+      background: ${color};
       border: 2px solid #ffffff;
       border-radius: 50%;
       box-shadow: 0 0 10px rgba(0,0,0,0.3);
-    "></div>`,
-    iconSize: [20, 20],
-    iconAnchor: [10, 10],
+    ">${cluster.count}</div>`,
+    iconSize: [size, size],
+    iconAnchor: [size / 2, size / 2],
   });
-
   return (
-    <Marker position={position} icon={customIcon}>
-      <Popup>
-        <div style={{ color: '#333', minWidth: '200px' }}>
-          <h4 style={{ margin: '0 0 8px 0', color: '#8a2be2' }}>
-            {insight.category.name}
-          </h4>
-          <p style={{ margin: '0 0 8px 0', fontSize: '0.9rem' }}>
-            {insight.text_snippet}
-          </p>
-          <div style={{ display: 'flex', justifyContent: 'space-between', fontSize: '0.8rem' }}>
-            <span>Sentiment: {insight.sentiment_score > 0.3 ? 'Positive' : 
-                              insight.sentiment_score < -0.3 ? 'Negative' : 'Neutral'}</span>
-            <span>Confidence: {Math.round(insight.confidence_score * 100)}%</span>
-          </div>
-        </div>
-      </Popup>
-    </Marker>
+    <Marker
+      position={position}
+      icon={icon}
+      eventHandlers={{ click: () => map.flyTo(position, Math.min(map.getZoom() + 2, map.getMaxZoom())) }}
+    />
   );
 };
 
-// Component to fit map bounds to markers
-const FitBounds = ({ insights }) => {
-  const map = useMap();
-  
+// Leaflet's bounds are unwrapped when zoomed out or panned across the
+// antimeridian; send them as west,south,east,north within range (west > east
+// when the box crosses the antimeridian)
+const viewportBBox = (bounds) => {
+  const south = Math.max(bounds.getSouth(), -90);
+  const north = Math.min(bounds.getNorth(), 90);
+  let west = bounds.getWest();
+  let east = bounds.getEast();
+  if (east - west >= 360) {
+    west = -180;
+    east = 180;
+  } else {
+    const span = east - west;
+    west = ((((west + 180) % 360) + 360) % 360) - 180;
+    east = west + span;
+    if (east > 180) east -= 360;
+  }
+  return [west, south, east, north].join(',');
+};
+
+// Reports the visible area whenever the map settles
+const ViewportTracker = ({ onChange }) => {
+  const map = useMapEvents({
+    moveend: () => onChange({ zoom: map.getZoom(), bbox: viewportBBox(map.getBounds()) }),
+  });
+
   useEffect(() => {
-    if (insights && insights.length > 0) {
-      const bounds = L.latLngBounds(
-        insights.map(insight => [insight.latitude, insight.longitude])
-      );
-      map.fitBounds(bounds, { padding: [20, 20] });
-    }
-  }, [insights, map]);
-  
+    onChange({ zoom: map.getZoom(), bbox: viewportBBox(map.getBounds()) });
+  }, [map, onChange]);
+
   return null;
 };
 
 const Map = () => {
-  const [selectedCategory, setSelectedCategory] = useState('all');
-  const [useDemoLocations, setUseDemoLocations] = useState(false);
-  
-  const { data: insights, isLoading } = useQuery(
-    'insights',
-    getInsights,
-    { retry: false }
-  );
+  const [viewport, setViewport] = useState(null);
+  const handleViewport = useCallback((next) => setViewport(next), []);
 
-  const { data: sentimentSummary } = useQuery(
-    'sentimentSummary',
-    getSentimentSummary,
-    { retry: false }
+  const { data } = useQuery(
+    ['entryClusters', viewport],
+    () => getEntryClusters(viewport),
+    { enabled: !!viewport, keepPreviousData: true, retry: false }
   );
 
-  // Filter insights to only show places
-  const placeInsights = insights?.filter(insight => 
-    insight.category.category_type === 'place'
-  ) || [];
-
-  // Filter insights by category (only for places)
-  const filteredInsights = placeInsights.filter(insight => 
-    selectedCategory === 'all' || insight.category.category_type === selectedCategory
-  );
-
-  // For now, we'll show a message that geo-location needs to be set manually
-  // In a real app, you'd geocode the place names or store coordinates
-  const locationInsights = filteredInsights.map(insight => {
-    if (!useDemoLocations) {
-      return { ...insight, latitude: null, longitude: null };
-    }
-    const place = (insight.category?.name || '').toLowerCase();
-    let coords = null;
-    if (place.includes('prague')) coords = { lat: 50.0755, lng: 14.4378 };
-    if (place.includes('bratislava')) coords = { lat: 48.1486, lng: 17.1077 };
-    if (!coords) return { ...insight, latitude: null, longitude: null };
-    return { ...insight, latitude: coords.lat, longitude: coords.lng };
-  });
-
-  const categoryTypes = [
-    { value: 'all', label: 'All Places' },
-    { value: 'place', label: 'Places' },
-    { value: 'product', label: 'Products' },
-    { value: 'meal', label: 'Meals' },
-    { value: 'activity', label: 'Activities' },
-  ];
+  const clusters = data?.clusters || [];
+  const entriesIn = (predicate) =>
+    clusters.filter(c => predicate(c.avg_sentiment ?? 0)).reduce((total, c) => total + c.count, 0);
 
   return (
     <Container>
@@ -296,48 +287,35 @@ const Map = () => {
             <Filter size={16} />
             Filter
           </FilterButton>
-          <SetLocationsButton
-            whileHover={{ scale: 1.05 }}
-            whileTap={{ scale: 0.95 }}
-            onClick={() => setUseDemoLocations(true)}
-            data-testid="set-demo-locations"
-          >
-            <MapIcon size={16} />
-            Set demo locations
-          </SetLocationsButton>
         </Controls>
       </Header>
 
       <div style={{ position: 'relative' }}>
-        {filteredInsights.length === 0 ? (
+        <MapWrapper>
+          <MapContainer
+            center={[30, 10]}
+            zoom={2}
+            style={{ height: '100%', width: '100%' }}
+          >
+            <TileLayer
+              url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
+              attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+            />
+
+            <ViewportTracker onChange={handleViewport} />
+
+            {clusters.map(cluster => (
+              <ClusterMarker key={cluster.geohash} cluster={cluster} />
+            ))}
+          </MapContainer>
+        </MapWrapper>
+
+        {data && clusters.length === 0 && (
           <NoPlacesMessage>
             <MapPin size={48} />
-            <h3>No Places Found</h3>
-            <p>No places have been identified in your entries yet. Places will appear here once they are detected and geo-located.</p>
+            <h3>No Places Here</h3>
+            <p>No entries in this area have a location yet. Entries appear here once the places they mention are geo-located.</p>
           </NoPlacesMessage>
-        ) : (
-          <MapWrapper>
-            <MapContainer
-              center={[51.5074, -0.1278]} // London coordinates
-              zoom={10}
-              style={{ height: '100%', width: '100%' }}
-            >
-              <TileLayer
-                url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
-                attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
-              />
-              
-              <FitBounds insights={locationInsights} />
-              
-              {locationInsights.map((insight, index) => (
-                <SentimentMarker
-                  key={`${insight.id}-${index}`}
-                  insight={insight}
-                  position={[insight.latitude, insight.longitude]}
-                />
-              ))}
-            </MapContainer>
-          </MapWrapper>
         )}
 
         <Legend
@@ -369,26 +347,20 @@ const Map = () => {
           transition={{ duration: 0.6, delay: 0.4 }}
         >
           <StatItem>
-            <span>Total Insights:</span>
-            <StatValue>{locationInsights.length}</StatValue>
+            <span>Entries in view:</span>
+            <StatValue>{entriesIn(() => true)}</StatValue>
           </StatItem>
           <StatItem>
             <span>Positive:</span>
-            <StatValue>
-              {locationInsights.filter(i => i.sentiment_score > 0.3).length}
-            </StatValue>
+            <StatValue>{entriesIn(s => s > 0.3)}</StatValue>
           </StatItem>
           <StatItem>
             <span>Neutral:</span>
-            <StatValue>
-              {locationInsights.filter(i => i.sentiment_score >= -0.3 && i.sentiment_score <= 0.3).length}
-            </StatValue>
+            <StatValue>{entriesIn(s => s >= -0.3 && s <= 0.3)}</StatValue>
           </StatItem>
           <StatItem>
             <span>Negative:</span>
-            <StatValue>
-              {locationInsights.filter(i => i.sentiment_score < -0.3).length}
-            </StatValue>
+            <StatValue>{entriesIn(s => s < -0.3)}</StatValue>
           </StatItem>
         </StatsPanel>
       </div>
@@ -1,12 +1,12 @@
 import { motion } from 'framer-motion';
 import { Icon } from 'leaflet';
 import 'leaflet/dist/leaflet.css';
-import { Edit3, List, Map, MapPin, Navigation, Plus, X } from 'lucide-react';
+import { ChevronDown, ChevronRight, Edit3, List, Map, MapPin, Navigation, Plus, X } from 'lucide-react';
 import React, { useState } from 'react';
 import { MapContainer, Marker, Popup, TileLayer } from 'react-leaflet';
-import { useMutation, useQuery, useQueryClient } from 'react-query';
+import { useInfiniteQuery, useMutation, useQuery, useQueryClient } from 'react-query';
 import styled from 'styled-components';
-import { geocodePlace, getEntries, getInsights, updateEntry } from '../services/api';
+import { geocodePlace, getEntriesPage, getPlaces, setPlaceLocation, updateEntry } from '../services/api';
 
 const Container = styled.div`
   min-height: calc(100vh - 80px); /* Account for bottom navigation */
@@ -143,6 +143,22 @@ const ActionButton = styled.button`
   }
 `;
 
+const SectionToggle = styled.button`
+  display: flex;
+  align-items: center;
+  gap: 8px;
+  width: 100%;
+  background: none;
+  border: none;
+  padding: 0;
+  margin: 30px 0 15px;
+  font-size: 1.17em;
+  font-weight: bold;
+  color: inherit;
+  cursor: pointer;
+  text-align: left;
+`;
+
 const EmptyState = styled.div`
   text-align: center;
   color: rgba(255, 255, 255, 0.7);
@@ -359,7 +375,8 @@ const HelpText = styled.p`
 const Places = () => {
   const [view, setView] = useState('split'); // 'map', 'list', 'split'
   const [modalOpen, setModalOpen] = useState(false);
-  const [modalType, setModalType] = useState(null); // 'setLocation' or 'addPlace'
+  const [modalType, setModalType] = useState(null); // 'placeLocation', 'setLocation' or 'addPlace'
+  const [selectedPlace, setSelectedPlace] = useState(null);
   const [selectedEntry, setSelectedEntry] = useState(null);
   const [formData, setFormData] = useState({
     locationName: '',
@@ -368,41 +385,75 @@ const Places = () => {
   });
   const [isGeocoding, setIsGeocoding] = useState(false);
   const [manualCoordinates, setManualCoordinates] = useState(false);
+  const [expandedSections, setExpandedSections] = useState({});
 
   const queryClient = useQueryClient();
 
-  const { data: insights, isLoading: insightsLoading } = useQuery(
-    'insights',
-    getInsights,
-    { retry: false }
+  // Place summaries are aggregated on the server, a page at a time
+  const {
+    data,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery(
+    'places',
+    ({ pageParam = 1 }) => getPlaces({ page: pageParam }),
+    {
+      retry: false,
+      getNextPageParam: (lastPage, pages) => (lastPage?.next ? pages.length + 1 : undefined),
+    }
   );
 
-  const { data: entries, isLoading: entriesLoading } = useQuery(
-    'entries',
-    getEntries,
-    { retry: false }
+  // Entry sections are filtered on the server and only fetched once expanded
+  const toggleSection = (key) => setExpandedSections(prev => ({ ...prev, [key]: !prev[key] }));
+  const entryPage = (params) => () => getEntriesPage(params);
+  const { data: locatedEntriesPage, isLoading: locatedLoading } = useQuery(
+    ['entries', 'located'],
+    entryPage({ has_coordinates: true }),
+    { retry: false, enabled: !!expandedSections.located }
+  );
+  const { data: unlocatedEntriesPage, isLoading: unlocatedLoading } = useQuery(
+    ['entries', 'places-unlocated'],
+    entryPage({ has_coordinates: false, category_type: 'place' }),
+    { retry: false, enabled: !!expandedSections.unlocated }
+  );
+  const { data: placelessEntriesPage, isLoading: placelessLoading } = useQuery(
+    ['entries', 'without-places'],
+    entryPage({ without_category_type: 'place' }),
+    { retry: false, enabled: !!expandedSections.placeless }
   );
 
-  // Filter insights to only show places
-  const placeInsights = insights?.filter(insight => 
-    insight.category.category_type === 'place'
-  ) || [];
-
-  // Get entries with coordinates (geocoded)
-  const entriesWithCoordinates = entries?.filter(entry => 
-    entry.latitude && entry.longitude
-  ) || [];
+  const pageResults = (page) => page?.results || (Array.isArray(page) ? page : []);
+  const pageCount = (page) => page?.count ?? pageResults(page).length;
+  const entriesWithCoordinates = pageResults(locatedEntriesPage);
+  const entriesWithPlacesNoCoords = pageResults(unlocatedEntriesPage);
+  const entriesWithoutPlaces = pageResults(placelessEntriesPage);
+
+  const sectionHeader = (key, label, page, color) => (
+    <SectionToggle
+      type="button"
+      style={{ color }}
+      aria-expanded={!!expandedSections[key]}
+      onClick={() => toggleSection(key)}
+    >
+      {expandedSections[key] ? <ChevronDown size={18} /> : <ChevronRight size={18} />}
+      {label}{page ? ` (${pageCount(page)})` : ''}
+    </SectionToggle>
+  );
+  const sectionStatus = (key, loading, entries) => {
+    if (!expandedSections[key]) return null;
+    if (loading) return <PlaceDetails>Loading...</PlaceDetails>;
+    return entries.length === 0 ? <PlaceDetails>No entries.</PlaceDetails> : null;
+  };
 
-  // Get entries that have place insights but no coordinates
-  const entriesWithPlacesNoCoords = entries?.filter(entry => 
-    entry.insights?.some(insight => insight.category.category_type === 'place') &&
-    (!entry.latitude || !entry.longitude)
-  ) || [];
+  const places = data?.pages.flatMap(page => page?.results || []) || [];
+  const totalPlaces = data?.pages[0]?.count ?? places.length;
+  const locatedPlaces = places.filter(place => place.latitude != null && place.longitude != null);
+  const unlocatedPlaces = places.filter(place => place.latitude == null || place.longitude == null);
 
-  // Get entries without places
-  const entriesWithoutPlaces = entries?.filter(entry => 
-    !entry.insights?.some(insight => insight.category.category_type === 'place')
-  ) || [];
+  const sentimentLabel = (sentiment) => (
+    sentiment > 0.3 ? '😊 Positive' : sentiment < -0.3 ? '😞 Negative' : '😐 Neutral'
+  );
 
   // Create custom marker icon
   const createCustomIcon = (color = '#8a2be2') => {
@@ -418,13 +469,29 @@ const Places = () => {
     });
   };
 
-  // Mutation for updating entry location
+  // Mutation for updating a place's location
+  const updatePlaceMutation = useMutation(
+    ({ id, location }) => setPlaceLocation(id, location),
+    {
+      onSuccess: () => {
+        queryClient.invalidateQueries('places');
+        setModalOpen(false);
+        setFormData({ locationName: '', latitude: '', longitude: '' });
+      },
+      onError: (error) => {
+        console.error('Failed to update place:', error);
+        alert('Failed to update place. Please try again.');
+      }
+    }
+  );
+
+  // Mutation for updating an entry's own location
   const updateEntryMutation = useMutation(
     ({ id, data }) => updateEntry(id, data),
     {
       onSuccess: () => {
         queryClient.invalidateQueries('entries');
-        queryClient.invalidateQueries('insights');
+        queryClient.invalidateQueries('places');
         setModalOpen(false);
         setFormData({ locationName: '', latitude: '', longitude: '' });
       },
@@ -435,6 +502,27 @@ const Places = () => {
     }
   );
 
+  const saveLocation = (location) => {
+    if (modalType === 'placeLocation') {
+      updatePlaceMutation.mutate({ id: selectedPlace.id, location });
+    } else {
+      updateEntryMutation.mutate({ id: selectedEntry.id, data: location });
+    }
+  };
+
+  const isSaving = updatePlaceMutation.isLoading || updateEntryMutation.isLoading;
+
+  const handlePlaceLocation = (place) => {
+    setSelectedPlace(place);
+    setModalType('placeLocation');
+    setFormData({
+      locationName: place.location_name || place.name,
+      latitude: place.latitude?.toString() || '',
+      longitude: place.longitude?.toString() || ''
+    });
+    setModalOpen(true);
+  };
+
   const handleSetLocation = (entry) => {
     setSelectedEntry(entry);
     setModalType('setLocation');
@@ -457,30 +545,19 @@ const Places = () => {
     setModalOpen(true);
   };
 
-  const handleEditPlace = (entry) => {
-    setSelectedEntry(entry);
-    setModalType('setLocation');
-    setFormData({
-      locationName: entry.location_name || '',
-      latitude: entry.latitude?.toString() || '',
-      longitude: entry.longitude?.toString() || ''
-    });
-    setModalOpen(true);
-  };
-
   const handleSubmit = async (e) => {
     e.preventDefault();
     
-    if (!selectedEntry) return;
+    if (!selectedPlace && !selectedEntry) return;
     
     // If coordinates are already provided, use them directly
     if (formData.latitude && formData.longitude) {
-      const updateData = {
+      const location = {
         location_name: formData.locationName,
         latitude: parseFloat(formData.latitude),
         longitude: parseFloat(formData.longitude)
       };
-      updateEntryMutation.mutate({ id: selectedEntry.id, data: updateData });
+      saveLocation(location);
       return;
     }
     
@@ -493,12 +570,12 @@ const Places = () => {
     setIsGeocoding(true);
     try {
       const geocodeResult = await geocodePlace(formData.locationName);
-      const updateData = {
+      const location = {
         location_name: geocodeResult.full_name,
         latitude: geocodeResult.latitude,
         longitude: geocodeResult.longitude
       };
-      updateEntryMutation.mutate({ id: selectedEntry.id, data: updateData });
+      saveLocation(location);
     } catch (error) {
       console.error('Geocoding failed:', error);
       alert('Could not find coordinates for this place. Please try a different name or enter coordinates manually.');
@@ -510,6 +587,7 @@ const Places = () => {
   const handleCloseModal = () => {
     setModalOpen(false);
     setFormData({ locationName: '', latitude: '', longitude: '' });
+    setSelectedPlace(null);
     setSelectedEntry(null);
     setModalType(null);
     setManualCoordinates(false);
@@ -555,45 +633,45 @@ const Places = () => {
               <Map size={20} />
               Map View
             </SectionTitle>
-            {entriesWithCoordinates.length === 0 ? (
+            {locatedPlaces.length === 0 ? (
               <MapPlaceholder>
                 <div>
                   <MapPin size={48} />
                   <h3>No Geo-located Places</h3>
                   <p>Places will appear here once they are geo-located by AI</p>
-                  <p>Found {placeInsights.length} places, {entriesWithPlacesNoCoords.length} need coordinates</p>
+                  <p>Found {totalPlaces} places, {unlocatedPlaces.length} need coordinates</p>
                 </div>
               </MapPlaceholder>
             ) : (
               <MapWrapper>
                 <MapContainer
-                  center={[entriesWithCoordinates[0]?.latitude || 0, entriesWithCoordinates[0]?.longitude || 0]}
-                  zoom={entriesWithCoordinates.length === 1 ? 10 : 3}
+                  center={[locatedPlaces[0].latitude, locatedPlaces[0].longitude]}
+                  zoom={locatedPlaces.length === 1 ? 10 : 3}
                   style={{ height: '100%', width: '100%' }}
                 >
                   <TileLayer
                     url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
                     attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
                   />
-                  {entriesWithCoordinates.map((entry) => (
+                  {locatedPlaces.map((place) => (
                     <Marker
-                      key={entry.id}
-                      position={[entry.latitude, entry.longitude]}
-                      icon={createCustomIcon(entry.overall_sentiment > 0.3 ? '#4caf50' : entry.overall_sentiment < -0.3 ? '#f44336' : '#8a2be2')}
+                      key={place.id}
+                      position={[place.latitude, place.longitude]}
+                      icon={createCustomIcon(place.avg_sentiment > 0.3 ? '#4caf50' : place.avg_sentiment < -0.3 ? '#f44336' : '#8a2be2')}
                     >
                       <Popup>
                         <div style={{ color: '#000', minWidth: '200px' }}>
                           <h3 style={{ margin: '0 0 8px 0', fontSize: '14px' }}>
-                            {entry.title || 'Untitled Entry'}
+                            {place.name}
                           </h3>
                           <p style={{ margin: '0 0 8px 0', fontSize: '12px', color: '#666' }}>
-                            {entry.location_name}
+                            {place.location_name}
                           </p>
                           <p style={{ margin: '0 0 8px 0', fontSize: '11px' }}>
-                            {entry.content.substring(0, 100)}...
+                            {place.entry_count} {place.entry_count === 1 ? 'entry' : 'entries'} · {sentimentLabel(place.avg_sentiment)}
                           </p>
                           <div style={{ fontSize: '10px', color: '#888' }}>
-                            {new Date(entry.created_at).toLocaleDateString()}
+                            Last mentioned {new Date(place.last_mentioned).toLocaleDateString()}
                           </div>
                         </div>
                       </Popup>
@@ -612,36 +690,35 @@ const Places = () => {
               Places Management
             </SectionTitle>
             
-            {entriesWithCoordinates.length > 0 && (
+            {locatedPlaces.length > 0 && (
               <>
                 <h3 style={{ color: '#4caf50', marginBottom: '15px' }}>
-                  Geo-located Places ({entriesWithCoordinates.length})
+                  Geo-located Places ({locatedPlaces.length})
                 </h3>
                 <PlaceList>
-                  {entriesWithCoordinates.map((entry, index) => (
+                  {locatedPlaces.map((place, index) => (
                     <PlaceItem
-                      key={entry.id}
+                      key={place.id}
                       initial={{ opacity: 0, y: 20 }}
                       animate={{ opacity: 1, y: 0 }}
-                      transition={{ duration: 0.3, delay: index * 0.1 }}
+                      transition={{ duration: 0.3, delay: Math.min(index, 10) * 0.05 }}
                     >
-                      <PlaceName>{entry.location_name || entry.title || 'Untitled Entry'}</PlaceName>
+                      <PlaceName>{place.name}</PlaceName>
                       <LocationStatus className="located">
                         <Navigation size={16} />
-                        Located by AI
+                        {place.location_name || 'Located'}
                       </LocationStatus>
                       <PlaceDetails>
-                        Entry: "{entry.title || 'Untitled Entry'}"
+                        Mentioned in {place.entry_count} {place.entry_count === 1 ? 'entry' : 'entries'}, last on {new Date(place.last_mentioned).toLocaleDateString()}
                       </PlaceDetails>
                       <PlaceDetails>
-                        Sentiment: {entry.overall_sentiment > 0.3 ? '😊 Positive' : 
-                                   entry.overall_sentiment < -0.3 ? '😞 Negative' : '😐 Neutral'}
+                        Sentiment: {sentimentLabel(place.avg_sentiment)}
                       </PlaceDetails>
                       <CoordinatesInfo>
-                        📍 {entry.latitude.toFixed(6)}, {entry.longitude.toFixed(6)}
+                        📍 {place.latitude.toFixed(6)}, {place.longitude.toFixed(6)}
                       </CoordinatesInfo>
                       <PlaceActions>
-                        <ActionButton onClick={() => handleEditPlace(entry)}>
+                        <ActionButton onClick={() => handlePlaceLocation(place)}>
                           <Edit3 size={14} />
                           Edit Location
                         </ActionButton>
@@ -652,50 +729,116 @@ const Places = () => {
               </>
             )}
 
-            {entriesWithPlacesNoCoords.length > 0 && (
+            {unlocatedPlaces.length > 0 && (
               <>
                 <h3 style={{ color: '#ff9800', marginBottom: '15px', marginTop: '30px' }}>
-                  Places Needing Coordinates ({entriesWithPlacesNoCoords.length})
+                  Places Needing Coordinates ({unlocatedPlaces.length})
                 </h3>
                 <PlaceList>
-                  {entriesWithPlacesNoCoords.map((entry, index) => {
-                    const placeInsight = entry.insights?.find(insight => insight.category.category_type === 'place');
-                    return (
-                      <PlaceItem
-                        key={entry.id}
-                        initial={{ opacity: 0, y: 20 }}
-                        animate={{ opacity: 1, y: 0 }}
-                        transition={{ duration: 0.3, delay: index * 0.1 }}
-                      >
-                        <PlaceName>{placeInsight?.category.name || entry.title || 'Untitled Entry'}</PlaceName>
-                        <LocationStatus className="not-located">
-                          <MapPin size={16} />
-                          Needs Geo-location
-                        </LocationStatus>
-                        <PlaceDetails>
-                          From: "{placeInsight?.text_snippet || entry.content.substring(0, 50)}..."
-                        </PlaceDetails>
-                        <PlaceDetails>
-                          Entry: "{entry.title || 'Untitled Entry'}"
-                        </PlaceDetails>
-                        <PlaceActions>
-                          <ActionButton onClick={() => handleSetLocation(entry)}>
-                            <MapPin size={14} />
-                            Set Location
-                          </ActionButton>
-                        </PlaceActions>
-                      </PlaceItem>
-                    );
-                  })}
+                  {unlocatedPlaces.map((place, index) => (
+                    <PlaceItem
+                      key={place.id}
+                      initial={{ opacity: 0, y: 20 }}
+                      animate={{ opacity: 1, y: 0 }}
+                      transition={{ duration: 0.3, delay: Math.min(index, 10) * 0.05 }}
+                    >
+                      <PlaceName>{place.name}</PlaceName>
+                      <LocationStatus className="not-located">
+                        <MapPin size={16} />
+                        Needs Geo-location
+                      </LocationStatus>
+                      <PlaceDetails>
+                        Mentioned in {place.entry_count} {place.entry_count === 1 ? 'entry' : 'entries'}, last on {new Date(place.last_mentioned).toLocaleDateString()}
+                      </PlaceDetails>
+                      <PlaceActions>
+                        <ActionButton onClick={() => handlePlaceLocation(place)}>
+                          <MapPin size={14} />
+                          Set Location
+                        </ActionButton>
+                      </PlaceActions>
+                    </PlaceItem>
+                  ))}
                 </PlaceList>
               </>
             )}
 
-            {entriesWithoutPlaces.length > 0 && (
+            {hasNextPage && (
+              <ActionButton
+                style={{ marginTop: '20px' }}
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+              >
+                {isFetchingNextPage ? 'Loading...' : `Load more (${places.length} of ${totalPlaces})`}
+              </ActionButton>
+            )}
+
+            {sectionHeader('located', 'Geo-located Entries', locatedEntriesPage, '#4caf50')}
+            {sectionStatus('located', locatedLoading, entriesWithCoordinates)}
+            {expandedSections.located && entriesWithCoordinates.length > 0 && (
+              <>
+                <PlaceList>
+                  {entriesWithCoordinates.map((entry, index) => (
+                    <PlaceItem
+                      key={entry.id}
+                      initial={{ opacity: 0, y: 20 }}
+                      animate={{ opacity: 1, y: 0 }}
+                      transition={{ duration: 0.3, delay: Math.min(index, 10) * 0.05 }}
+                    >
+                      <PlaceName>{entry.location_name || entry.title || 'Untitled Entry'}</PlaceName>
+                      <PlaceDetails>
+                        Entry: "{entry.title || 'Untitled Entry'}"
+                      </PlaceDetails>
+                      <CoordinatesInfo>
+                        📍 {entry.latitude.toFixed(6)}, {entry.longitude.toFixed(6)}
+                      </CoordinatesInfo>
+                      <PlaceActions>
+                        <ActionButton onClick={() => handleSetLocation(entry)}>
+                          <Edit3 size={14} />
+                          Edit Location
+                        </ActionButton>
+                      </PlaceActions>
+                    </PlaceItem>
+                  ))}
+                </PlaceList>
+              </>
+            )}
+
+            {sectionHeader('unlocated', 'Entries Needing Coordinates', unlocatedEntriesPage, '#ff9800')}
+            {sectionStatus('unlocated', unlocatedLoading, entriesWithPlacesNoCoords)}
+            {expandedSections.unlocated && entriesWithPlacesNoCoords.length > 0 && (
+              <>
+                <PlaceList>
+                  {entriesWithPlacesNoCoords.map((entry, index) => (
+                    <PlaceItem
+                      key={entry.id}
+                      initial={{ opacity: 0, y: 20 }}
+                      animate={{ opacity: 1, y: 0 }}
+                      transition={{ duration: 0.3, delay: Math.min(index, 10) * 0.05 }}
+                    >
+                      <PlaceName>{entry.title || 'Untitled Entry'}</PlaceName>
+                      <LocationStatus className="not-located">
+                        <MapPin size={16} />
+                        Needs Geo-location
+                      </LocationStatus>
+                      <PlaceDetails>
+                        {entry.content.substring(0, 100)}...
+                      </PlaceDetails>
+                      <PlaceActions>
+                        <ActionButton onClick={() => handleSetLocation(entry)}>
+                          <MapPin size={14} />
+                          Set Location
+                        </ActionButton>
+                      </PlaceActions>
+                    </PlaceItem>
+                  ))}
+                </PlaceList>
+              </>
+            )}
+
+            {sectionHeader('placeless', 'Entries Without Places', placelessEntriesPage, '#ffc107')}
+            {sectionStatus('placeless', placelessLoading, entriesWithoutPlaces)}
+            {expandedSections.placeless && entriesWithoutPlaces.length > 0 && (
               <>
-                <h3 style={{ color: '#ffc107', marginBottom: '15px', marginTop: '30px' }}>
-                  Entries Without Places ({entriesWithoutPlaces.length})
-                </h3>
                 <PlaceList>
                   {entriesWithoutPlaces.slice(0, 5).map((entry, index) => (
                     <PlaceItem
@@ -720,7 +863,7 @@ const Places = () => {
               </>
             )}
 
-            {entriesWithCoordinates.length === 0 && entriesWithPlacesNoCoords.length === 0 && entriesWithoutPlaces.length === 0 && (
+            {places.length === 0 && (
               <EmptyState>
                 <MapPin size={48} />
                 <h3>No Places Found</h3>
@@ -731,13 +874,14 @@ const Places = () => {
         )}
       </ContentArea>
 
-      {/* Modal for setting location or adding place */}
+      {/* Modal for setting a place's or an entry's location, or adding a place */}
       {modalOpen && (
         <Modal onClick={handleCloseModal}>
           <ModalContent onClick={(e) => e.stopPropagation()}>
             <ModalHeader>
               <ModalTitle>
-                {modalType === 'setLocation' ? 'Set Location' : 'Add Place'}
+                {modalType === 'addPlace' ? 'Add Place' : 'Set Location'}
+                {modalType === 'placeLocation' && selectedPlace ? ` for ${selectedPlace.name}` : ''}
               </ModalTitle>
               <CloseButton onClick={handleCloseModal}>
                 <X size={20} />
@@ -815,10 +959,10 @@ const Places = () => {
                 <Button 
                   type="submit" 
                   className="primary"
-                  disabled={updateEntryMutation.isLoading || isGeocoding || !formData.locationName}
+                  disabled={isSaving || isGeocoding || !formData.locationName}
                 >
                   {isGeocoding ? 'Finding Location...' : 
-                   updateEntryMutation.isLoading ? 'Saving...' : 'Save Location'}
+                   isSaving ? 'Saving...' : 'Save Location'}
                 </Button>
               </ButtonGroup>
             </form>
@@ -1,6 +1,7 @@
 import React from 'react';
 import { QueryClient, QueryClientProvider } from 'react-query';
-import { render, screen } from '@testing-library/react';
+import { fireEvent, render, screen } from '@testing-library/react';
+import { getEntriesPage } from '../../services/api';
 
 // Mock react-leaflet ESM module to avoid Jest transform issues
 jest.mock('react-leaflet', () => ({
@@ -13,16 +14,27 @@ jest.mock('react-leaflet', () => ({
 
 // Mock services to avoid real HTTP
 jest.mock('../../services/api', () => ({
-  getEntries: jest.fn().mockResolvedValue([]),
-  getInsights: jest.fn().mockResolvedValue([
-    {
-      id: 1,
-      text_snippet: 'Lovely trip to Prague',
-      category: { name: 'Prague', category_type: 'place' },
-      sentiment_score: 0.8,
-      confidence_score: 0.92,
-    },
-  ]),
+  geocodePlace: jest.fn(),
+  setPlaceLocation: jest.fn(),
+  updateEntry: jest.fn(),
+  getEntriesPage: jest.fn().mockResolvedValue({ count: 0, next: null, previous: null, results: [] }),
+  getPlaces: jest.fn().mockResolvedValue({
+    count: 1,
+    next: null,
+    previous: null,
+    results: [
+      {
+        id: 1,
+        name: 'Prague',
+        latitude: null,
+        longitude: null,
+        location_name: '',
+        entry_count: 2,
+        avg_sentiment: 0.8,
+        last_mentioned: '2024-05-01T10:00:00Z',
+      },
+    ],
+  }),
 }));
 
 function renderWithQueryClient() {
@@ -42,5 +54,22 @@ describe('Places page', () => {
     renderWithQueryClient();
     expect(await screen.findByText('Places & Locations')).toBeInTheDocument();
   });
-});
 
+  test('lists places from the summary endpoint', async () => {
+    renderWithQueryClient();
+    expect(await screen.findByText('Prague')).toBeInTheDocument();
+    expect(screen.getByText('Places Needing Coordinates (1)')).toBeInTheDocument();
+  });
+
+  test('loads entry sections only when expanded', async () => {
+    getEntriesPage.mockClear();
+    renderWithQueryClient();
+    expect(await screen.findByText('Prague')).toBeInTheDocument();
+    expect(getEntriesPage).not.toHaveBeenCalled();
+
+    fireEvent.click(screen.getByText('Entries Without Places'));
+    expect(await screen.findByText('No entries.')).toBeInTheDocument();
+    expect(getEntriesPage).toHaveBeenCalledTimes(1);
+    expect(getEntriesPage).toHaveBeenCalledWith({ without_category_type: 'place' });
+  });
+});
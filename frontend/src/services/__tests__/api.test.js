@@ -19,7 +19,7 @@ jest.mock('axios', () => {
   };
 }, { virtual: true });
 
-const { default: api, getEntries, getEntry, createEntry, updateEntry, deleteEntry } = require('../api');
+const { default: api, getEntries, getEntry, createEntry, updateEntry, deleteEntry, getSubscribedFaces } = require('../api');
 
 describe('api service - entries', () => {
   afterEach(() => {
@@ -63,3 +63,18 @@ describe('api service - entries', () => {
   });
 });
 
+describe('api service - faces', () => {
+  afterEach(() => {
+    jest.restoreAllMocks();
+  });
+
+  test('getSubscribedFaces follows every page', async () => {
+    const next = 'http://localhost/api/faces/subscribed/?page=2';
+    jest.spyOn(api, 'get')
+      .mockResolvedValueOnce({ data: { count: 3, next, results: [{ id: 1 }, { id: 2 }] } })
+      .mockResolvedValueOnce({ data: { count: 3, next: null, results: [{ id: 3 }] } });
+    await expect(getSubscribedFaces()).resolves.toEqual([{ id: 1 }, { id: 2 }, { id: 3 }]);
+    expect(api.get).toHaveBeenNthCalledWith(1, '/faces/subscribed/');
+    expect(api.get).toHaveBeenNthCalledWith(2, next);
+  });
+});
@@ -42,6 +42,12 @@ export const getEntries = async () => {
   return response.data.results || response.data;
 };
 
+// Paginated response ({ count, next, results }) of the entry list; params are entry filters
+export const getEntriesPage = async (params = {}) => {
+  const response = await api.get('/entries/', { params });
+  return response.data;
+};
+
 export const getEntry = async (id) => {
   const response = await api.get(`/entries/${id}/`);
   return response.data;
@@ -82,6 +88,18 @@ export const getEntriesByCategory = async (categoryId) => {
   return response.data.results || response.data;
 };
 
+// params: { bbox: 'west,south,east,north' } or { lat, lng, radius_km }, plus entry filters
+export const getEntriesWithin = async (params) => {
+  const response = await api.get('/entries/within/', { params });
+  return response.data.results || response.data;
+};
+
+// params: { zoom, bbox: 'west,south,east,north' }; returns { zoom, precision, clusters }
+export const getEntryClusters = async (params) => {
+  const response = await api.get('/entries/clusters/', { params });
+  return response.data;
+};
+
 export const uploadDocument = async (entryId, file) => {
   const formData = new FormData();
   formData.append('file', file);
@@ -124,7 +142,7 @@ export const getInsightsByCategory = async (categoryId) => {
   const response = await api.get('/insights/by_category/', { 
     params: { category_id: categoryId } 
   });
-  return response.data;
+  return response.data.results || response.data;
 };
 
 export const getSentimentSummary = async () => {
@@ -132,17 +150,59 @@ export const getSentimentSummary = async () => {
   return response.data;
 };
 
-export const getEntriesByCategoryName = async (categoryName, categoryType = null) => {
+// Returns one cursor page: { next, previous, results }; pass the cursor from `next` for more
+export const getEntriesByCategoryName = async (categoryName, categoryType = null, cursor = null) => {
   const params = { category_name: categoryName };
   if (categoryType) {
     params.category_type = categoryType;
   }
+  if (cursor) {
+    params.cursor = cursor;
+  }
   const response = await api.get('/insights/entries_by_category/', { params });
   return response.data;
 };
 
 export const searchInsights = async (query) => {
   const response = await api.get('/insights/search/', { params: { q: query } });
+  return response.data.results || response.data;
+};
+
+// Every insight matching the filters (e.g. { category_type: 'place' }), read as NDJSON
+export const streamInsights = async (params = {}) => {
+  const search = new URLSearchParams(params).toString();
+  const response = await fetch(`${API_BASE_URL}/insights/stream/${search ? `?${search}` : ''}`, {
+    headers: { Accept: 'application/x-ndjson' },
+    credentials: 'include',
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Loading insights failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const insights = [];
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.filter(Boolean).forEach((line) => insights.push(JSON.parse(line)));
+  }
+  if (buffer.trim()) insights.push(JSON.parse(buffer));
+  return insights;
+};
+
+// One page of place summaries: { count, next, previous, results }
+export const getPlaces = async (params = {}) => {
+  const response = await api.get('/insights/places/', { params });
+  return response.data;
+};
+
+export const setPlaceLocation = async (categoryId, location) => {
+  const response = await api.post(`/insights/places/${categoryId}/location/`, location);
   return response.data;
 };
 
@@ -161,6 +221,47 @@ export const aiQuery = async (query) => {
   return response.data;
 };
 
+// Streams an AI query over Server-Sent Events. Handlers receive the matched
+// entries first and then the answer text as it is generated.
+export const aiQueryStream = async (query, { onAnalysis, onEntries, onToken } = {}) => {
+  const response = await fetch(`${API_BASE_URL}/insights/ai_query_stream/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    credentials: 'include',
+    body: JSON.stringify({ query }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`AI query failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'analysis') onAnalysis?.(data);
+      else if (event === 'entries') onEntries?.(data);
+      else if (event === 'token') onToken?.(data.text);
+      else if (event === 'error') throw new Error(data.error);
+      else if (event === 'done') return;
+    }
+  }
+};
+
 // Categories API
 export const getCategories = async () => {
   const response = await api.get('/categories/');
@@ -191,7 +292,7 @@ export const getCategoriesByType = async (type) => {
   const response = await api.get('/categories/by_type/', { 
     params: { type } 
   });
-  return response.data;
+  return response.data.results || response.data;
 };
 
 // Faces API
@@ -200,9 +301,19 @@ export const getFaces = async () => {
   return response.data.results || response.data;
 };
 
+// Every subscribed face; the endpoint is paginated, so follow `next` to the end
 export const getSubscribedFaces = async () => {
-  const response = await api.get('/faces/subscribed/');
-  return response.data.results || response.data;
+  const faces = [];
+  let url = '/faces/subscribed/';
+  while (url) {
+    const response = await api.get(url);
+    if (!response.data.results) {
+      return response.data;
+    }
+    faces.push(...response.data.results);
+    url = response.data.next;
+  }
+  return faces;
 };
 
 export const createFace = async (faceData) => {
@@ -19,6 +19,6 @@ echo ""
 echo "To start the application:"
 echo "1. Backend: cd backend && python manage.py runserver"
 echo "2. Frontend: cd frontend && npm start"
-echo "3. Celery: cd backend && celery -A mindjourney worker --loglevel=info"
+echo "3. Celery: cd backend && celery -A mindjourney worker -Q interactive,bulk,documents --loglevel=info"
 echo ""
 echo "Or use Docker: ./start.sh"